@@ -0,0 +1,160 @@
+from collections import namedtuple
+
+from sensor_pack_2.irtc import (int_to_bcd, bcd_to_int, IRTC, rtc_time, get_day_of_year,
+                                FlagSet, StatusDecoder)
+from sensor_pack_2 import bus_service
+from sensor_pack_2.base_sensor import DeviceEx, Iterator
+from sensor_pack_2.base_sensor import check_value
+
+# состояние RTC. У BQ32000 нет отдельного регистра состояния, флаги находятся в старших битах регистров
+# секунд и минут. Сырое значение состояния: бит 7 - STOP, бит 6 - OF.
+#   * STOP  -   Генератор остановлен (запись 1 останавливает генератор).
+#   * OF    -   Флаг сбоя генератора (oscillator fail). Устанавливается при остановке генератора, сбрасывается записью 0.
+status_bq32000 = namedtuple("status_bq32000", "STOP OF")
+
+
+class BQ32000(DeviceEx, IRTC, Iterator):
+    """Class for work with BQ32000 clock from Texas Instruments. Please read BQ32000 datasheet!
+    Без будильников. Цифровая калибровка частоты и зарядка резервного источника питания (trickle charge)."""
+    # номера битов полей status_bq32000 в сыром значении состояния
+    _status_bits = 7, 6
+    # кэш разобранных значений состояния, общий для всех экземпляров класса
+    _status_decoder = StatusDecoder(status_bq32000, _status_bits)
+    # маски изменения флагов регистра состояния, общие для всех экземпляров класса
+    _status_flags = FlagSet(_status_bits)
+    # флаги для сброса OF
+    _clear_of = status_bq32000(STOP=None, OF=False)
+    # изменение частоты, ppm, на единицу калибровки. Положительная калибровка ускоряет счет времени!
+    calibration_step_ppm = 4.068, -2.034
+
+    def __init__(self, adapter: bus_service.I2cAdapter, address: int = 0x68):
+        DeviceEx.__init__(self, adapter, address, False)
+        self._tbuf = bytearray(7)   # для чтения/записи времени
+        self._sbuf = bytearray(2)   # для чтения регистров секунд и минут (флаги STOP, OF)
+        self._tch_buf = bytearray(2)    # для записи регистров TCH2, CFG2
+
+    # --- IRTC ---
+    def read_raw_time(self) -> bytearray:
+        """Считывает время по шине, из чипа RTC, в буфер. Возвращает буфер с данными."""
+        buf = self._tbuf
+        self.read_buf_from_mem(0x00, buf)
+        return buf
+
+    def write_raw_time(self, buf: bytes) -> int:
+        """Записывает время из буфера src по шине, в чип RTC. Возвращает длину буфера в байтах."""
+        self.write_buf_to_mem(0x00, buf)
+        return len(buf)
+
+    def raw_to_time(self, buf: bytearray) -> rtc_time:
+        """Преобразует содержимое буфера buf, заполненного методом read_raw_time, в именованный кортеж rtc_time.
+        Содержимое buf в процессе работы метода изменяется!"""
+        buf[0] = bcd_to_int(0x7F & buf[0])     # секунды, без бита STOP
+        buf[1] = bcd_to_int(0x7F & buf[1])     # минуты, без бита OF
+        buf[2] = bcd_to_int(0x3F & buf[2])     # часы, без битов CENT_EN, CENT
+        buf[4] = bcd_to_int(0x3F & buf[4])     # день месяца
+        buf[5] = bcd_to_int(0x1F & buf[5])     # месяц
+        y, m, d = 2_000 + bcd_to_int(buf[6]), buf[5], buf[4]
+        doy = get_day_of_year(y, m, d)  # RTC не считает day of year
+        return rtc_time(year=y, month=m, day=d, hour=buf[2],
+                        min=buf[1], sec=buf[0], day_of_week=(0x07 & buf[3]) - 1, day_of_year=doy)
+
+    def time_to_raw(self, src: rtc_time) -> bytes:
+        """Преобразует именованный кортеж src в содержимое буфера, для записи в чип RTC методом write_raw_time.
+        Генератор запускается (STOP = 0), флаг OF сбрасывается!"""
+        _buf = self._tbuf
+        _buf[0] = int_to_bcd(src[5])
+        _buf[1] = int_to_bcd(src[4])
+        _buf[2] = int_to_bcd(src[3])
+        _buf[3] = 1 + src[6]    # день недели в RTC начинается с 1!
+        _buf[4] = int_to_bcd(src[2])
+        _buf[5] = int_to_bcd(src[1])
+        _buf[6] = int_to_bcd(src[0] - 2_000)
+        return _buf
+
+    def get_stop_event(self, clear: bool = True) -> bool:
+        """Возвращает Истина, если произошел сбой генератора (флаг OF) или генератор остановлен (бит STOP),
+        что может говорить о неверном времени и необходимости его установки в верное значение!"""
+        sts = self.get_status(raw=True)
+        if clear and 0x40 & sts:
+            self.set_status(BQ32000._clear_of)
+        return self._report_stop(bool(sts))
+
+    def get_status(self, raw: bool = True) -> [int, status_bq32000]:
+        """Возвращает сырое значение состояния (бит 7 - STOP, бит 6 - OF), если raw is True,
+        иначе именованный кортеж status_bq32000"""
+        buf = self._sbuf
+        self.read_buf_from_mem(0x00, buf)
+        sts = (0x80 & buf[0]) | ((0x80 & buf[1]) >> 1)
+        if raw:
+            return sts
+        return BQ32000._status_decoder.decode(sts)
+
+    def set_status(self, value: [int, status_bq32000]):
+        """Изменяет флаги STOP (установка/сброс, регистр 00h) и OF (только сброс в 0, регистр 01h).
+        Регистр читается и записывается, только если поле value для его флага не None (для int - всегда),
+        и запись выполняется, только если флаг изменяется. Чтение и запись регистра следуют друг за другом,
+        другой регистр времени не записывается."""
+        if isinstance(value, int):
+            or_mask, and_mask = 0xC0 & value, value | ~0xC0
+        else:
+            or_mask, and_mask = BQ32000._status_flags.get_masks(value)
+        # номер регистра, сдвиг бита флага в сыром значении состояния к биту 7 регистра
+        for reg_addr, shift in ((0x00, 0), (0x01, 1)):
+            bit = 0x80 >> shift
+            if not (or_mask | ~and_mask) & bit:
+                continue    # флаг не изменяется
+            reg_val = self.read_reg(reg_addr, 1)[0]
+            new_val = (reg_val | (0x80 & (or_mask << shift))) & (0x7F | (and_mask << shift))
+            if new_val != reg_val:
+                self.write_reg(reg_addr, new_val, 1)
+
+    def get_control(self, raw: bool = True) -> [int, tuple]:
+        """Возвращает байт из регистра CAL_CFG1 (07h): OUT, FT, S, CAL"""
+        if raw:
+            return self.read_reg(0x07, 1)[0]
+        raise NotImplemented
+
+    def set_control(self, value: [int, tuple]):
+        """Записывает байт value в регистр CAL_CFG1 (07h).
+        Читайте документацию на микросхему!"""
+        if isinstance(value, int):
+            return self.write_reg(0x07, value, 1)
+        raise NotImplemented
+
+    # --- калибровка ---
+    def get_calibration(self) -> int:
+        """Возвращает значение калибровки частоты -31..31 (поля S, CAL регистра CAL_CFG1).
+        Положительные значения ускоряют счет времени (шаг около 4.068 ppm),
+        отрицательные замедляют (шаг около 2.034 ppm). Смотри calibration_step_ppm."""
+        val = self.get_control(raw=True)
+        cal = 0x1F & val
+        return cal if 0x20 & val else -cal
+
+    def set_calibration(self, value: int):
+        """Устанавливает значение калибровки частоты -31..31. Биты OUT и FT сохраняются. Смотри get_calibration."""
+        check_value(value, range(-31, 32), f"Неверное значение калибровки частоты: {value}")
+        cal = (0x20 | value) if value > 0 else -value     # S + CAL
+        self.set_control((0xC0 & self.get_control(raw=True)) | cal)
+
+    # --- зарядка резервного источника питания ---
+    def set_trickle_charge(self, enable: bool, bypass_diode: bool = False):
+        """Включает (enable в Истина) зарядку резервного источника питания (ионистор, аккумулятор) от VCC.
+        Если bypass_diode в Истина, то диод в цепи зарядки шунтируется (TCFE), напряжение заряда выше!
+        Не включайте зарядку при использовании обычной(!) батареи!"""
+        buf = self._tch_buf
+        buf[0] = 0x20 if enable else 0x00   # TCH2
+        buf[1] = 0x05 if enable else 0x00   # TCHE
+        if enable and bypass_diode:
+            buf[1] |= 0x40  # TCFE
+        self.write_buf_to_mem(0x08, buf)
+
+    def get_trickle_charge(self) -> tuple[bool, bool]:
+        """Возвращает кортеж (зарядка включена, диод зашунтирован)"""
+        buf = self._tch_buf
+        self.read_buf_from_mem(0x08, buf)
+        enabled = bool(0x20 & buf[0]) and 0x05 == 0x0F & buf[1]
+        return enabled, enabled and bool(0x40 & buf[1])
+
+    def __next__(self) -> tuple:
+        """For support iterating."""
+        return self.get_time()
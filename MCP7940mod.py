@@ -0,0 +1,324 @@
+from collections import namedtuple
+
+from sensor_pack_2.irtc import (int_to_bcd, bcd_to_int, IRTCwAlarms, rtc_time,
+                                get_day_of_year, rtc_alarm_time, check_alarm_time, FlagSet,
+                                StatusDecoder, seconds_to_rtc_time)
+from sensor_pack_2.alarmcalc import get_next_fire_time
+from sensor_pack_2 import bus_service
+from sensor_pack_2.base_sensor import DeviceEx, Iterator
+from sensor_pack_2.base_sensor import check_value
+
+# состояние RTC (старшие биты регистра RTCWKDAY (03h)):
+#   * OSCRUN    -   Генератор работает и тактирует счет времени. Только для чтения!
+#   * PWRFAIL   -   Был сбой основного питания. Метки времени сбоя и восстановления питания сохранены.
+#                   Сбрасывается записью 0!
+#   * VBATEN    -   При пропадании основного питания, RTC переключается на питание от батареи.
+status_mcp7940 = namedtuple("status_mcp7940", "OSCRUN PWRFAIL VBATEN")
+# метка времени сбоя(power-down)/восстановления(power-up) питания. Год и секунды микросхема не сохраняет!
+# month - месяц 1..12, day - день месяца 1..31, hour - час 0..23, min - минута 0..59, day_of_week - день недели 0..6
+power_fail_time = namedtuple("power_fail_time", "month day hour min day_of_week")
+
+
+class MCP7940(DeviceEx, IRTCwAlarms, Iterator):
+    """Class for work with MCP7940N/MCP7940M clock from Microchip Technology. Please read MCP7940 datasheet!
+    Два будильника, цифровая подстройка частоты генератора, метки времени сбоя питания
+    и 64 байта ОЗУ (SRAM) с питанием от батареи."""
+    # номера битов полей status_mcp7940 в регистре RTCWKDAY
+    _status_bits = 5, 4, 3
+    # кэш разобранных значений регистра состояния, общий для всех экземпляров класса
+    _status_decoder = StatusDecoder(status_mcp7940, _status_bits)
+    # маски изменения флагов регистра состояния, общие для всех экземпляров класса
+    _status_flags = FlagSet(_status_bits)
+    # адрес и размер ОЗУ с питанием от батареи
+    _sram_addr = 0x20
+    sram_size = 64
+
+    @staticmethod
+    def _convert_hours(hour_byte: int) -> int:
+        if hour_byte & 0x40:    # 12-часовой формат
+            hour = bcd_to_int(hour_byte & 0x1F) % 12
+            if hour_byte & 0x20:    # PM
+                hour += 12
+            return hour
+        return bcd_to_int(hour_byte & 0x3F)
+
+    @staticmethod
+    def _get_alarm_addr_by_id(alarm_id: int) -> int:
+        check_value(alarm_id, range(2), f"Неверный номер тревоги: {alarm_id}")
+        return 0x0A if 0 == alarm_id else 0x11
+
+    def __init__(self, adapter: bus_service.I2cAdapter, address: int = 0x6F):
+        IRTCwAlarms.__init__(self)
+        DeviceEx.__init__(self, adapter, address, False)
+        self._tbuf = bytearray(7)   # для чтения/записи времени
+        # для чтения/записи тревоги: ALMxSEC, ALMxMIN, ALMxHOUR, ALMxWKDAY, ALMxDATE, ALMxMTH
+        self._alarm_buf = bytearray(6)
+        self._pwr_buf = bytearray(8)    # для чтения меток времени сбоя/восстановления питания
+        # копия ОЗУ микросхемы. Смотри методы load_sram, store_sram
+        self._sram = bytearray(MCP7940.sram_size)
+        self._sram_mv = memoryview(self._sram)
+
+    # --- IRTC ---
+    def read_raw_time(self) -> bytearray:
+        """Считывает время по шине, из чипа RTC, в буфер. Возвращает буфер с данными."""
+        buf = self._tbuf
+        self.read_buf_from_mem(0x00, buf)
+        return buf
+
+    def write_raw_time(self, buf: bytes) -> int:
+        """Записывает время из буфера src по шине, в чип RTC. Возвращает длину буфера в байтах."""
+        self.write_buf_to_mem(0x00, buf)
+        return len(buf)
+
+    def raw_to_time(self, buf: bytearray) -> rtc_time:
+        """Преобразует содержимое буфера buf, заполненного методом read_raw_time, в именованный кортеж rtc_time.
+        Содержимое buf в процессе работы метода изменяется!"""
+        buf[0] = bcd_to_int(0x7F & buf[0])     # секунды, без бита ST
+        buf[1] = bcd_to_int(0x7F & buf[1])     # минуты
+        buf[2] = MCP7940._convert_hours(buf[2])
+        buf[3] = 0x07 & buf[3]                  # день недели 1..7, без битов состояния
+        buf[4] = bcd_to_int(0x3F & buf[4])     # день месяца
+        buf[5] = bcd_to_int(0x1F & buf[5])     # месяц, без бита LPYR
+        y, m, d = 2_000 + bcd_to_int(buf[6]), buf[5], buf[4]
+        doy = get_day_of_year(y, m, d)  # RTC не считает day of year
+        return rtc_time(year=y, month=m, day=d, hour=buf[2],
+                        min=buf[1], sec=buf[0], day_of_week=buf[3] - 1, day_of_year=doy)
+
+    def time_to_raw(self, src: rtc_time) -> bytes:
+        """Преобразует именованный кортеж src в содержимое буфера, для записи в чип RTC методом write_raw_time.
+        Генератор запускается (бит ST), питание от батареи включается (бит VBATEN)!"""
+        _buf = self._tbuf
+        _buf[0] = 0x80 | int_to_bcd(src[5])    # ST = 1
+        _buf[1] = int_to_bcd(src[4])
+        _buf[2] = int_to_bcd(src[3])            # 24-часовой формат
+        _buf[3] = 0x08 | (1 + src[6])           # VBATEN = 1, день недели в RTC начинается с 1!
+        _buf[4] = int_to_bcd(src[2])
+        _buf[5] = int_to_bcd(src[1])
+        _buf[6] = int_to_bcd(src[0] - 2_000)
+        return _buf
+
+    def get_stop_event(self, clear: bool = True) -> bool:
+        """Возвращает Истина, если генератор не работает или был сбой основного питания, что может говорить
+        о неверном времени и необходимости его установки в верное значение!
+        Если clear в Истина, то флаг PWRFAIL сбрасывается."""
+        reg_val = self.read_reg(0x03, 1)[0]
+        if clear and 0x10 & reg_val:
+            self.write_reg(0x03, 0xEF & reg_val, 1)
+        return self._report_stop(not 0x20 & reg_val or bool(0x10 & reg_val))
+
+    def get_status(self, raw: bool = True) -> [int, status_mcp7940]:
+        """Возвращает биты состояния регистра RTCWKDAY, если raw is True, иначе именованный кортеж status_mcp7940"""
+        sreg = 0x38 & self.read_reg(0x03, 1)[0]
+        if raw:
+            return sreg
+        return MCP7940._status_decoder.decode(sreg)
+
+    def set_status(self, value: [int, status_mcp7940]):
+        """В регистре состояния, для записи, доступны флаги PWRFAIL (только сброс в 0) и VBATEN.
+        День недели, хранящийся в этом же регистре, сохраняется!"""
+        reg_val = self.read_reg(0x03, 1)[0]
+        if isinstance(value, int):
+            reg_val = (0x07 & reg_val) | (0x18 & value)
+        else:
+            reg_val = MCP7940._status_flags.apply(reg_val, value)
+        self.write_reg(0x03, reg_val, 1)
+
+    def get_control(self, raw: bool = True) -> [int, tuple]:
+        """Возвращает байт из регистра управления CONTROL (07h)"""
+        if raw:
+            return self.read_reg(0x07, 1)[0]
+        raise NotImplemented
+
+    def set_control(self, value: [int, tuple]):
+        """Записывает байт value в регистр управления CONTROL (07h).
+        Читайте документацию на микросхему!"""
+        if isinstance(value, int):
+            return self.write_reg(0x07, value, 1)
+        raise NotImplemented
+
+    def start_oscillator(self, start: bool = True):
+        """Запускает (start в Истина) или останавливает генератор (бит ST). Секунды сохраняются."""
+        reg_val = self.read_reg(0x00, 1)[0]
+        self.write_reg(0x00, (0x80 | reg_val) if start else (0x7F & reg_val), 1)
+
+    # --- цифровая подстройка частоты ---
+    def get_trim(self) -> int:
+        """Возвращает значение цифровой подстройки частоты генератора -127..127 (регистр OSCTRIM).
+        Каждая единица добавляет (больше нуля) или убирает (меньше нуля) два такта генератора в минуту,
+        около 1.017 ppm. Положительные значения ускоряют счет времени!"""
+        val = self.read_reg(0x08, 1)[0]
+        trim = 0x7F & val
+        return trim if 0x80 & val else -trim
+
+    def set_trim(self, value: int):
+        """Устанавливает значение цифровой подстройки частоты генератора -127..127. Смотри get_trim."""
+        check_value(value, range(-127, 128), f"Неверное значение подстройки частоты: {value}")
+        self.write_reg(0x08, (0x80 | value) if value > 0 else -value, 1)     # SIGN + TRIMVAL
+
+    # --- метки времени сбоя питания ---
+    def get_power_fail_times(self) -> tuple[power_fail_time, power_fail_time]:
+        """Возвращает кортеж из двух меток времени: пропадания основного питания и его восстановления.
+        Метки сохраняются микросхемой при включенном VBATEN, если флаг PWRFAIL в 0. Смотри get_stop_event."""
+        buf = self._pwr_buf
+        self.read_buf_from_mem(0x18, buf)
+        return self._raw_to_pwr_time(buf, 0), self._raw_to_pwr_time(buf, 4)
+
+    @staticmethod
+    def _raw_to_pwr_time(buf, offs: int) -> power_fail_time:
+        wk_mth = buf[offs + 3]
+        return power_fail_time(month=bcd_to_int(0x1F & wk_mth), day=bcd_to_int(0x3F & buf[offs + 2]),
+                               hour=MCP7940._convert_hours(buf[offs + 1]), min=bcd_to_int(0x7F & buf[offs]),
+                               day_of_week=(wk_mth >> 5) - 1)
+
+    # --- ОЗУ с питанием от батареи ---
+    def _check_sram_range(self, offset: int, length: int):
+        if offset < 0 or length < 0 or offset + length > MCP7940.sram_size:
+            raise ValueError(f"Выход за пределы ОЗУ! Смещение: {offset}; длина: {length}")
+
+    def read_sram(self, offset: int, buf):
+        """Читает из ОЗУ микросхемы, начиная со смещения offset (0..63), len(buf) байт в buf.
+        buf может быть срезом memoryview, тогда данные читаются прямо в память владельца среза, без копирования!"""
+        self._check_sram_range(offset, len(buf))
+        self.read_buf_from_mem(MCP7940._sram_addr + offset, buf)
+        return buf
+
+    def write_sram(self, offset: int, buf):
+        """Записывает в ОЗУ микросхемы, начиная со смещения offset (0..63), все байты из buf
+        (bytes, bytearray, срез memoryview)."""
+        self._check_sram_range(offset, len(buf))
+        self.write_buf_to_mem(MCP7940._sram_addr + offset, buf)
+
+    def load_sram(self, offset: int = 0, count: int = 64) -> memoryview:
+        """Читает count байт ОЗУ микросхемы в копию ОЗУ (смотри sram) и возвращает срез копии, без выделения
+        памяти под данные. Изменения среза записываются в микросхему методом store_sram."""
+        mv = self._sram_mv[offset:offset + count]
+        self.read_sram(offset, mv)
+        return mv
+
+    def store_sram(self, offset: int = 0, count: int = 64):
+        """Записывает count байт копии ОЗУ (смотри sram), начиная со смещения offset, в ОЗУ микросхемы"""
+        self.write_sram(offset, self._sram_mv[offset:offset + count])
+
+    @property
+    def sram(self) -> memoryview:
+        """Копия ОЗУ микросхемы (64 байта). Смотри методы load_sram, store_sram"""
+        return self._sram_mv
+
+    # --- IRTCwAlarms ---
+    def read_raw_alarm(self, alarm_id: int = 0) -> bytearray:
+        """Считывает время тревоги по шине, из чипа RTC, в буфер. Возвращает буфер с данными."""
+        _abuf = self._alarm_buf
+        self.read_buf_from_mem(MCP7940._get_alarm_addr_by_id(alarm_id), _abuf)
+        return _abuf
+
+    def write_raw_alarm(self, buf: bytes, alarm_id: int = 0) -> int:
+        """Записывает время тревоги из буфера buf по шине, в чип RTC. Возвращает длину буфера в байтах.
+        Флаг тревоги ALMxIF при этом сбрасывается!"""
+        self.write_buf_to_mem(MCP7940._get_alarm_addr_by_id(alarm_id), buf)
+        return len(buf)
+
+    def raw_alarm_to_time(self, src: bytes) -> rtc_alarm_time:
+        """Преобразует сырые данные тревоги из RTC в rtc_alarm_time.
+        Микросхема сравнивает с текущим временем только одно поле (маска ALMxMSK), либо все поля сразу!"""
+        mask = 0x07 & (src[3] >> 4)
+        _min = _hour = _date_day = None
+        if mask in (0b001, 0b111):
+            _min = bcd_to_int(0x7F & src[1])
+        if mask in (0b010, 0b111):
+            _hour = MCP7940._convert_hours(src[2])
+        if 0b011 == mask:
+            _date_day = (0x07 & src[3]) - 1     # день недели 0..6
+        if mask in (0b100, 0b111):
+            _date_day = 0x80 | bcd_to_int(0x3F & src[4])   # день месяца
+        return rtc_alarm_time(date_day=_date_day, hour=_hour, min=_min)
+
+    def time_to_raw_alarm(self, src: rtc_alarm_time) -> bytes:
+        """Преобразует rtc_alarm_time в сырые данные тревоги.
+        Микросхема умеет сравнивать с текущим временем только одно поле: минуты, часы, день недели или день месяца.
+        Если в src заданы (не None) несколько полей, то вычисляется ближайшее время срабатывания тревоги
+        от текущего времени RTC и тревога программируется на полное совпадение (секунды..месяц). Такая тревога
+        срабатывает однократно! Если все поля в None, то тревога срабатывает каждую минуту (в 00 секунд)."""
+        check_alarm_time(src)
+        _abuf = self._alarm_buf
+        for index in range(6):
+            _abuf[index] = 0
+        _abuf[3] = 0x01     # день недели 1..7
+        _abuf[4] = _abuf[5] = 0x01
+        fields = (src.date_day is not None) + (src.hour is not None) + (src.min is not None)
+        mask = 0b000    # секунды, каждую минуту
+        if 1 == fields:
+            if src.min is not None:
+                mask = 0b001
+                _abuf[1] = int_to_bcd(src.min)
+            if src.hour is not None:
+                mask = 0b010
+                _abuf[2] = int_to_bcd(src.hour)
+            if src.date_day is not None:
+                if src.date_day < 0x80:     # день недели 0..6
+                    mask = 0b011
+                    _abuf[3] = 1 + src.date_day
+                else:   # день месяца 1..31
+                    mask = 0b100
+                    _abuf[4] = int_to_bcd(src.date_day - 0x80)
+        if fields > 1:
+            now = self.get_time()
+            _next = get_next_fire_time(src, now)
+            if _next is None:
+                raise ValueError(f"Тревога {src} не сработает!")
+            t = seconds_to_rtc_time(_next)
+            mask = 0b111
+            _abuf[1], _abuf[2] = int_to_bcd(t.min), int_to_bcd(t.hour)
+            _abuf[3] = 1 + t.day_of_week
+            _abuf[4], _abuf[5] = int_to_bcd(t.day), int_to_bcd(t.month)
+        _abuf[3] |= mask << 4   # ALMPOL = 0, ALMxIF = 0
+        return _abuf
+
+    def control_alarm_interrupt(self, irq_alarm_1_enable: bool = False, irq_alarm_0_enable: bool = False):
+        """Включает или отключает будильники (два) и выход их сигнала на вывод MFP микросхемы.
+        У MCP7940 флаг срабатывания будильника устанавливается только у включенного будильника!
+        Enable or disable two clock alarms and its interrupt on chip pin MFP."""
+        cr = 0x8F & self.get_control()  # SQWEN = ALM1EN = ALM0EN = 0
+        if irq_alarm_1_enable:
+            cr |= 0x20
+        if irq_alarm_0_enable:
+            cr |= 0x10
+        self.set_control(cr)
+
+    def enable_alarm(self, alarm_id: int = 0, enable: bool = True):
+        """Включает (ALMxEN = 1, SQWEN = 0) или отключает (ALMxEN = 0) будильник alarm_id.
+        Другой будильник не изменяется."""
+        creg = self.get_control()
+        mask = 0x10 << alarm_id     # ALM0EN, ALM1EN
+        cr = (mask | (0xBF & creg)) if enable else (~mask & creg)
+        if cr != creg:
+            self.set_control(cr)
+
+    def get_alarms_count(self) -> int:
+        return 2
+
+    def get_alarm_flags(self, raw: bool = True, clear: bool = True) -> [int, tuple[bool, ...]]:
+        """Возвращает флаги срабатывания двух будильников (alarm_id_1, alarm_id_0) и очищает их, если clear равен true!
+        Return two clock alarms flag (alarm_id_1, alarm_id_0) and clear it, if clear is true!"""
+        result = 0
+        for alarm_id in range(2):
+            reg_addr = 3 + MCP7940._get_alarm_addr_by_id(alarm_id)    # ALMxWKDAY
+            reg_val = self.read_reg(reg_addr, 1)[0]
+            if 0x08 & reg_val:
+                result |= 1 << alarm_id
+                if clear:
+                    self.write_reg(reg_addr, 0xF7 & reg_val, 1)
+        if raw:
+            return result
+        return bool(result & 0x02), bool(result & 0x01)
+
+    def get_alarm_flag(self, alarm_id: int = 0, clear: bool = True) -> bool:
+        """Возвращает флаг срабатывания будильника alarm_id (ALMxIF) и очищает только его, если clear равен true!"""
+        reg_addr = 3 + MCP7940._get_alarm_addr_by_id(alarm_id)    # ALMxWKDAY
+        reg_val = self.read_reg(reg_addr, 1)[0]
+        if clear and 0x08 & reg_val:
+            self.write_reg(reg_addr, 0xF7 & reg_val, 1)
+        return bool(0x08 & reg_val)
+
+    def __next__(self) -> tuple:
+        """For support iterating."""
+        return self.get_time()
@@ -1,11 +1,14 @@
 # import sys
+import micropython
 from collections import namedtuple
+from machine import Pin
 
 from sensor_pack_2.irtc import (int_to_bcd, bcd_to_int, IRTCwAlarms, rtc_time,
-                                get_day_of_year, rtc_alarm_time, check_alarm_time, change_bit_by_flags)
+                                get_day_of_year, rtc_alarm_time, check_alarm_time, FlagSet,
+                                StatusDecoder)
 from sensor_pack_2 import bus_service
 from sensor_pack_2.base_sensor import DeviceEx, Iterator
-# from sensor_pack_2.base_sensor import check_value
+from sensor_pack_2.base_sensor import check_value
 
 '''Биты TF и AF: При возникновении сигнала тревоги, AF устанавливается в логическую 1. Аналогично, в конце обратного 
 отсчета таймера, бит TF устанавливается в логическую 1. Эти биты сохраняют свое значение до тех пор, пока не будут 
@@ -33,15 +36,74 @@ status_pcf8563 = namedtuple("status_pcf8563", status_fields)
 
 class PCF8563(DeviceEx, IRTCwAlarms, Iterator):
     """Class for work with PCF8563 clock from NXP Semiconductors. Please read PCF8563 datasheet!"""
-
+    # номера битов полей status_pcf8563 в регистре Control_status_2
+    _status_bits = 4, 3, 2, 1, 0
+    # кэш разобранных значений регистра состояния, общий для всех экземпляров класса
+    _status_decoder = StatusDecoder(status_pcf8563, _status_bits)
+    # маски изменения флагов регистра состояния, общие для всех экземпляров класса
+    _status_flags = FlagSet(_status_bits)
+    # частоты тактирования таймера обратного отсчета, Гц, по значению поля TD регистра Timer_control (0x0E)
+    _timer_freqs = 4096, 64, 1, 1/60
+    # частоты на выводе CLKOUT, Гц, по значению поля FD регистра CLKOUT_control (0x0D)
+    _clkout_freqs = 32768, 1024, 32, 1
+    # после сброса бита STOP первое приращение секунд происходит через 0.507813..0.507935 с (делитель частоты
+    # не сбрасывается полностью), поэтому STOP сбрасывается позже границы секунды, смотри set_time_aligned
+    aligned_commit_delay_us = 1_000_000 - 507_813
+
+    @staticmethod
+    def get_timer_source(period: float, source_freq: [int, float, None] = None) -> tuple[int, int]:
+        """Возвращает кортеж (значение поля TD, значение счетчика таймера 1..255) для периода period секунд.
+        Если source_freq is None, то выбирается наибольшая частота тактирования таймера, при которой период
+        помещается в счетчик. Это дает наилучшее разрешение!
+        Иначе используется частота source_freq, которая должна быть одной из: 4096, 64, 1, 1/60 Гц."""
+        freqs = PCF8563._timer_freqs
+        if source_freq is not None:
+            check_value(source_freq, freqs, f"Неверная частота тактирования таймера: {source_freq}")
+        for td, freq in enumerate(freqs):
+            if source_freq is not None and freq != source_freq:
+                continue
+            count = round(period * freq)
+            if 1 <= count <= 255:
+                return td, count
+        raise ValueError(f"Период таймера вне допустимого диапазона: {period} сек.")
 
     def __init__(self, adapter: bus_service.I2cAdapter, address: int = 0x51):
         IRTCwAlarms.__init__(self)
         DeviceEx.__init__(self, adapter, address, False)
         self._tbuf = bytearray(7)   # для чтения/записи времени
         self._alarm_buf = bytearray(4)  # для чтения/записи тревоги
+        self._timer_buf = bytearray(2)  # для записи регистров Timer_control, Timer
+        # функция обратного вызова, которая вызывается по окончании отсчета таймера
+        self._timer_callback = None
+        self._init_buf = bytearray(2)   # для чтения/записи регистров Control_status_1, Control_status_2
         # self.control_alarm_interrupt()
 
+    def init_fast(self, control: [int, None] = None, preserve_alarm_irq: bool = True) -> bool:
+        """Читает регистры Control_status_1 и Control_status_2 за одно обращение к шине и записывает только
+        те из них, требуемое значение которых отличается от текущего. Возвращает Истина, если запись была.
+        Генератор запускается (STOP = 0, TEST1 = 0).
+        control - требуемые значения полей TI_TP, AIE, TIE регистра Control_status_2 или None - без изменений.
+        Если preserve_alarm_irq в Истина, то поле AIE сохраняет текущее значение: прерывание будильника
+        не пропадает при перезапуске MCU. Флаги AF, TF не изменяются."""
+        buf = self._init_buf
+        self.read_buf_from_mem(0x00, buf)
+        cs1, cs2 = buf[0], 0x13 & buf[1]
+        new_cs1 = 0x5F & cs1    # TEST1 = STOP = 0
+        new_cs2 = cs2 if control is None else 0x13 & control
+        if preserve_alarm_irq:
+            new_cs2 = (0x11 & new_cs2) | (0x02 & cs2)
+        if new_cs1 == cs1 and new_cs2 == cs2:
+            return False
+        buf[0] = new_cs1
+        buf[1] = 0x0C | new_cs2     # AF = TF = 1 - без изменений
+        if new_cs2 == cs2:
+            self.write_reg(0x00, new_cs1, 1)
+        elif new_cs1 == cs1:
+            self.write_reg(0x01, buf[1], 1)
+        else:
+            self.write_buf_to_mem(0x00, buf)
+        return True
+
     # --- IRTC ---
     def read_raw_time(self) -> bytearray:
         """Считывает время по шине, из чипа RTC, в буфер. Возвращает буфер с данными."""
@@ -90,6 +152,17 @@ class PCF8563(DeviceEx, IRTCwAlarms, Iterator):
             _buf[ind] = _val
         return _buf
 
+    def _prepare_aligned(self, buf: bytearray):
+        """Останавливает генератор (STOP = 1, делитель частоты сбрасывается) и записывает время заранее"""
+        cs1 = self.read_reg(0x00, 1)[0]
+        self._aligned_cs1 = 0xDF & cs1
+        self.write_reg(0x00, 0x20 | cs1, 1)     # STOP = 1
+        self.write_raw_time(buf)
+
+    def _commit_aligned(self, buf: bytearray):
+        """Запускает генератор (STOP = 0). Счет времени начинается с записанного заранее значения."""
+        self.write_reg(0x00, self._aligned_cs1, 1)
+
     def get_stop_event(self, clear: bool = True) -> bool:
         """Возвращает Истина, если произошел сбой тактирования часов, что может говорить о неверном времени и
         необходимости его установки в верное значение!"""
@@ -98,18 +171,15 @@ class PCF8563(DeviceEx, IRTCwAlarms, Iterator):
         bvl = bool(0x80 & reg_val)
         if clear:   # очистка флага VL
             self.write_reg(0x02, 0x7F & reg_val, 1)
-        return bvl
+        return self._report_stop(bvl)
 
     def get_status(self, raw: bool = True) -> [int, tuple]:
         """Возвращает содержимое регистра состояния, если raw is True, иначе кортеж или именованный кортеж"""
         sreg = self.read_reg(0x01, 1)[0]   # читаю регистр  управления/состояния Control_status_2
         if raw: # возвращаю два байта из двух регистров управления/состояния
             return sreg
-        rng = range(4, -1, -1)
-        val_gen = (bool(sreg & (1 << i)) for i in rng)   # Control_status_2, один байт
         # timer_int alarm_flag timer_flag alarm_int_enabled timer_int_enabled
-        return status_pcf8563(timer_int=next(val_gen), alarm_flag=next(val_gen), timer_flag=next(val_gen),
-                              alarm_int_enabled=next(val_gen), timer_int_enabled=next(val_gen))
+        return PCF8563._status_decoder.decode(sreg)
 
     def set_status(self, value: [int, tuple]):
         """В регистре состояния, для записи, доступны флаги: TI_TP, AF, TF, AIE, TIE."""
@@ -132,8 +202,7 @@ class PCF8563(DeviceEx, IRTCwAlarms, Iterator):
         Установка в True/False доступна для флагов. ---"""
         _sts = self.get_status(raw=True)
         # номера битов в регистре состояния, значения которых нужно изменить!
-        bit_numb = range(4, -1, -1)
-        result = change_bit_by_flags(_sts, bit_numb, flags)
+        result = PCF8563._status_flags.apply(_sts, flags)
         self.set_status(result)
 
     def get_control(self, raw: bool = True) -> [int, tuple]:
@@ -175,7 +244,8 @@ class PCF8563(DeviceEx, IRTCwAlarms, Iterator):
         item = src[2]
         # print(f"DBG:src[2] 0x{src[2]:x}")
         alarm_disabled = disable_mask & item
-        _day_of_month = bcd_to_int(0x3F & item)
+        # 0x80 - признак дня месяца, смотри irtc.check_alarm_time
+        _day_of_month = 0x80 | bcd_to_int(0x3F & item)
         if alarm_disabled:
             _day_of_month = None
 
@@ -225,6 +295,116 @@ class PCF8563(DeviceEx, IRTCwAlarms, Iterator):
         af = bool(0x08 & _raw)
         return af,
 
+    def get_alarm_flag(self, alarm_id: int = 0, clear: bool = True) -> bool:
+        """Возвращает флаг срабатывания будильника AF и очищает его, если clear равен true! У PCF8563 один
+        будильник (alarm_id = 0), флаг таймера TF не изменяется."""
+        _raw = self.get_status(raw=True)
+        if clear and 0x08 & _raw:
+            self.set_status(0xF7 & _raw)
+        return bool(0x08 & _raw)
+
+    def enable_alarm(self, alarm_id: int = 0, enable: bool = True):
+        """Включает или отключает прерывание от будильника (флаг AIE) на выводе микросхемы INT.
+        Флаги AF, TF и прерывание таймера не изменяются."""
+        sts = self.get_status(raw=True)
+        new_sts = (0x13 & sts) | 0x0C   # TI_TP, AIE, TIE; AF = TF = 1 - без изменений
+        new_sts = (0x02 | new_sts) if enable else (0xFD & new_sts)
+        if (0x02 & sts) != (0x02 & new_sts):
+            self.set_status(new_sts)
+
+    def control_alarm_interrupt(self, irq_alarm_1_enable: bool = False, irq_alarm_0_enable: bool = False):
+        """Включает или отключает прерывание от будильника (флаг AIE) на выводе микросхемы INT.
+        У PCF8563 один будильник, прерывание включается, если любой из параметров в Истина.
+        Флаги AF, TF не изменяются."""
+        sts = (0x11 & self.get_status(raw=True)) | 0x0C     # TI_TP, TIE; AF = TF = 1 - без изменений
+        if irq_alarm_1_enable or irq_alarm_0_enable:
+            sts |= 0x02     # AIE
+        self.set_status(sts)
+
+    # --- таймер обратного отсчета ---
+    def start_timer(self, period: float, source_freq: [int, float, None] = None, interrupt: bool = True,
+                    pulse: bool = False) -> float:
+        """Запускает таймер обратного отсчета с периодом period секунд (от 1/4096 до 255 минут).
+        source_freq - частота тактирования таймера, Гц (4096, 64, 1, 1/60) или None для автоматического выбора.
+        interrupt - если Истина, то по окончании отсчета активизируется вывод INT (флаг TIE).
+        pulse - если Истина, то сигнал на выводе INT импульсный, иначе он повторяет флаг TF (флаг TI_TP).
+        Таймер повторяет отсчет автоматически. Возвращает действительный период таймера, сек."""
+        td, count = PCF8563.get_timer_source(period, source_freq)
+        buf = self._timer_buf
+        buf[0], buf[1] = td, count      # таймер остановлен, загрузка значения счетчика
+        self.write_buf_to_mem(0x0E, buf)
+        self._set_timer_int(interrupt, pulse)
+        self.write_reg(0x0E, 0x80 | td, 1)  # TE = 1
+        return count / PCF8563._timer_freqs[td]
+
+    def stop_timer(self):
+        """Останавливает таймер обратного отсчета и отключает его прерывание.
+        Частота тактирования 1/60 Гц при остановленном таймере снижает энергопотребление!"""
+        self.write_reg(0x0E, 0x03, 1)
+        self._set_timer_int(False, False)
+
+    def _set_timer_int(self, enable: bool, pulse: bool):
+        """Изменяет флаги TIE, TI_TP и сбрасывает флаг TF. Флаг AF сохраняется (запись 1 не изменяет его)."""
+        sts = (0x0A & self.get_status(raw=True)) | 0x08
+        if enable:
+            sts |= 0x01     # TIE
+        if pulse:
+            sts |= 0x10     # TI_TP
+        self.set_status(sts)
+
+    def get_timer_value(self) -> int:
+        """Возвращает текущее значение счетчика таймера обратного отсчета"""
+        return self.read_reg(0x0F, 1)[0]
+
+    def get_timer_flag(self, clear: bool = True) -> bool:
+        """Возвращает флаг окончания отсчета таймера (TF) и сбрасывает его, если clear в Истина"""
+        sts = self.get_status(raw=True)
+        flag = bool(0x04 & sts)
+        if flag and clear:
+            self.set_status((0x1B & sts) | 0x08)    # TF = 0, AF остается без изменений
+        return flag
+
+    def on_timer(self, callback, pin: [Pin, None] = None):
+        """Устанавливает функцию callback(clock), которая будет вызываться по окончании отсчета таймера.
+        pin - вывод MCU, подключенный к выводу INT микросхемы (активный уровень - низкий).
+        Функция вызывается вне обработчика прерывания (micropython.schedule), флаг TF сбрасывается автоматически.
+        Если callback is None, то обработчик прерывания отключается."""
+        self._timer_callback = callback
+        if pin is None:
+            return
+        if callback is None:
+            pin.irq(handler=None)
+            return
+        pin.irq(trigger=Pin.IRQ_FALLING, handler=self._timer_irq)
+
+    def _timer_irq(self, pin):
+        micropython.schedule(self._timer_dispatch, pin)
+
+    def _timer_dispatch(self, _):
+        if not self.get_timer_flag(clear=True):
+            return  # прерывание от будильника
+        callback = self._timer_callback
+        if callback is not None:
+            callback(self)
+
+    # --- CLKOUT ---
+    def set_clkout(self, freq: [int, None]):
+        """Включает на выводе CLKOUT сигнал с частотой freq Гц (32768, 1024, 32, 1).
+        Если freq is None, то выход CLKOUT отключается (высокоимпедансное состояние)."""
+        if freq is None:
+            self.write_reg(0x0D, 0x00, 1)
+            return
+        freqs = PCF8563._clkout_freqs
+        check_value(freq, freqs, f"Неверная частота CLKOUT: {freq}")
+        self.write_reg(0x0D, 0x80 | freqs.index(freq), 1)
+
+    def get_clkout(self) -> [int, None]:
+        """Возвращает частоту сигнала на выводе CLKOUT, Гц, или None, если выход отключен"""
+        val = self.read_reg(0x0D, 1)[0]
+        if 0x80 & val:
+            return PCF8563._clkout_freqs[0x03 & val]
+        return None
+
     def __next__(self) -> tuple:
         """For support iterating."""
         return self.get_time()
\ No newline at end of file
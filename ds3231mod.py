@@ -1,10 +1,14 @@
+import time
 from collections import namedtuple
+from machine import Pin
 
 from sensor_pack_2.irtc import (int_to_bcd, bcd_to_int, IRTCwAlarms, rtc_time,
-                                get_day_of_year, rtc_alarm_time, check_alarm_time, change_bit_by_flags)
+                                get_day_of_year, rtc_alarm_time, check_alarm_time, FlagSet,
+                                StatusDecoder)
 from sensor_pack_2 import bus_service   # , base_sensor
-from sensor_pack_2.base_sensor import DeviceEx, Iterator
+from sensor_pack_2.base_sensor import DeviceEx, Iterator, ITemperatureSensor
 from sensor_pack_2.base_sensor import check_value
+from sensor_pack_2.metrics import TEMPERATURE
 
 # состояние RTC:
 #   * OSF   -   Этот бит устанавливается в логическую 1 каждый раз, когда генератор останавливается.
@@ -13,16 +17,42 @@ from sensor_pack_2.base_sensor import check_value
 #   * A2F   -   Логическая 1 в бите флага сигнала тревоги 2 указывает, что время соответствует регистрам сигнала тревоги 2.
 #   * A1F   -   Логическая 1 в бите флага сигнала тревоги 1 указывает, что время соответствует регистрам сигнала тревоги 2.
 status_ds3231 = namedtuple("status_ds3231", "OSF EN32KHz BSY A2F A1F")
+# управление RTC (Control Register (0Eh)):
+#   * EOSC  -   Если в логическом 0, генератор работает. В 1 генератор останавливается при питании от батареи.
+#   * BBSQW -   Если в логической 1, прямоугольный сигнал на выводе INT/SQW формируется и при питании от батареи.
+#   * CONV  -   Запись 1 запускает принудительное измерение температуры.
+#   * RS    -   Частота прямоугольного сигнала (RS2 RS1): 0 - 1 Гц, 1 - 1.024 кГц, 2 - 4.096 кГц, 3 - 8.192 кГц.
+#   * INTCN -   Если в логической 1, вывод INT/SQW - выход прерывания от будильников, иначе прямоугольный сигнал.
+#   * A2IE  -   Разрешение прерывания от будильника 2.
+#   * A1IE  -   Разрешение прерывания от будильника 1.
+control_ds3231 = namedtuple("control_ds3231", "EOSC BBSQW CONV RS INTCN A2IE A1IE")
 # для внутреннего использования
 # start_addr - начальный адрес 'тревоги'
 # bytes_count - кол-во байт тревоги
 # _alarm_info = namedtuple("_alarm_info", "id start_addr, bytes_count")
 
-class DS3221(DeviceEx, IRTCwAlarms, Iterator):
+class DS3221(DeviceEx, IRTCwAlarms, ITemperatureSensor, Iterator):
     """Class for work with DS3231 clock from Maxim Integrated или как эта фирма сейчас называется!?
     Please read DS3231 datasheet!"""
     #           alarm 1 register masks            alarm 2 register masks
     _mask_alarms = (0x0E, 0x0C, 0x08, 0x00, 0x10), (0x06, 0x04, 0x00, 0x08)
+    # номера битов полей status_ds3231 в регистре состояния
+    _status_bits = 7, 3, 2, 1, 0
+    # кэш разобранных значений регистра состояния, общий для всех экземпляров класса
+    _status_decoder = StatusDecoder(status_ds3231, _status_bits)
+    # маски изменения флагов регистра состояния, общие для всех экземпляров класса
+    _status_flags = FlagSet(_status_bits)
+    # флаги для сброса 'Oscillator Stop Flag'
+    _clear_osf = status_ds3231(OSF=False, EN32KHz=None, BSY=None, A2F=None, A1F=None)
+    # номера битов флагов control_ds3231 (кроме RS) в регистре управления
+    _control_bits = 7, 6, 5, 2, 1, 0
+    _control_flags = FlagSet(_control_bits)
+    # биты регистра управления, хранимые в его копии (все, кроме CONV)
+    _creg_mask = 0xDF
+    # частоты прямоугольного сигнала на выводе INT/SQW, Гц, по значению поля RS
+    _sqw_freqs = 1, 1024, 4096, 8192
+    # период автоматического измерения температуры микросхемой, мс
+    _temp_conv_period_ms = 64_000
 
     @staticmethod
     def _get_alarm_mask(alarm_id: int):
@@ -47,19 +77,79 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
         else:
             return bcd_to_int(0x3F & value)     # day of month
 
-    def __init__(self, adapter: bus_service.I2cAdapter, address: int = 0x68):
+    def __init__(self, adapter: bus_service.I2cAdapter, address: int = 0x68, state: [int, None] = None,
+                 control: [int, control_ds3231, None] = None, preserve_alarm_irq: bool = False,
+                 status: [status_ds3231, None] = None):
+        """state - состояние драйвера, сохраненное методом get_state перед глубоким сном MCU, или None.
+        Если state не None, то обращений к шине при создании экземпляра нет, настройки микросхемы
+        (в том числе включенные прерывания будильников) не изменяются, а копия регистра управления
+        берется из state!
+        Иначе микросхема настраивается методом init_fast(control, preserve_alarm_irq, status)."""
         # super().__init__(adapter, address, False)
         IRTCwAlarms.__init__(self)
         DeviceEx.__init__(self, adapter, address, False)
         self._tbuf = bytearray(7)
         self._alarm_buf = bytearray(3)  # только три байта под буфер тревог. секунды не нужны!
+        self._temp_buf = bytearray(2)   # для чтения регистров температуры 0x11, 0x12
+        # последнее считанное значение температуры и время его чтения (time.ticks_ms)
+        self._temperature = None
+        self._temp_ticks = 0
+        self._init_buf = bytearray(2)   # для чтения регистров управления и состояния 0x0E, 0x0F
         # self._alrm_dis_bit = 7
         # содержимое регистра управления до инициализации!
         # если(!) оно равно 0x1C, то в результате потери питания было сброшено время,
         # поэтому нужно установить правильное время!
-        self._ctrl_on_init = self.get_control()
-        # off alarm interrupt
-        self.control_alarm_interrupt(False, False)
+        # None - неизвестно (пробуждение MCU из глубокого сна, питание RTC не пропадало) или время уже
+        # установлено (write_raw_time) либо событие остановки сброшено (get_stop_event(clear=True))
+        self._ctrl_on_init = None
+        # копия регистра управления (без бита CONV, который сбрасывается микросхемой) или None - неизвестно.
+        # Изменение полей регистра (set_control, control_alarm_interrupt, set_sqw) не читает его по шине
+        self._creg = None if state is None else DS3221._creg_mask & state
+        if state is None:
+            self.init_fast(control, preserve_alarm_irq, status)
+
+    def init_fast(self, control: [int, control_ds3231, None] = None, preserve_alarm_irq: bool = False,
+                  status: [status_ds3231, None] = None) -> bool:
+        """Читает регистры управления и состояния за одно обращение к шине, сравнивает их с требуемыми
+        значениями и записывает только отличающиеся регистры (оба - за одно обращение к шине).
+        Возвращает Истина, если запись была.
+        control - требуемое значение регистра управления (int или control_ds3231, поля в None не изменяются)
+        или None, тогда прерывания от будильников и прямоугольный сигнал отключаются (только поле RS
+        сохраняется, как и раньше при создании экземпляра).
+        Если preserve_alarm_irq в Истина, то поля INTCN, A2IE, A1IE сохраняют текущие значения: прерывание
+        включенного будильника не пропадает при перезапуске MCU.
+        status - требуемые флаги регистра состояния (status_ds3231, поля в None не изменяются) или None -
+        регистр состояния не изменяется. Флаг EN32KHz устанавливается и сбрасывается, флаги OSF, A2F, A1F
+        только сбрасываются (значение False), флаг BSY не изменяется."""
+        buf = self._init_buf
+        self.read_buf_from_mem(0x0E, buf)
+        creg, sreg = buf[0], buf[1]
+        if self._ctrl_on_init is None:
+            self._ctrl_on_init = creg
+        if control is None:
+            desired = 0x18 & creg   # BBSQW = INTCN = A2IE = A1IE = 0
+        elif isinstance(control, int):
+            desired = control
+        else:
+            desired = DS3221._merge_control(creg, control)
+        if preserve_alarm_irq:
+            desired = (0xF8 & desired) | (0x07 & creg)
+        self._creg = DS3221._creg_mask & desired
+        desired_s = sreg
+        if status is not None:
+            desired_s = DS3221._status_flags.apply(sreg, status)
+            # EN32KHz - как задано, OSF, A2F, A1F - только сброс, BSY - без изменений
+            desired_s = (0x08 & desired_s) | (0xF7 & sreg & desired_s)
+        if desired_s == sreg:
+            if desired == creg:
+                return False
+            self.write_reg(0x0E, desired, 1)
+        elif desired == creg:
+            self.write_reg(0x0F, desired_s, 1)
+        else:
+            buf[0], buf[1] = desired, desired_s
+            self.write_buf_to_mem(0x0E, buf)
+        return True
 
     def read_raw_time(self) -> bytearray:
         """Считывает время по шине, из чипа RTC, в буфер. Возвращает буфер с данными.
@@ -71,8 +161,10 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
     def write_raw_time(self, buf: bytes) -> int:
         """Записывает время из буфера src по шине, в чип RTC. Возвращает длину буфера в байтах.
         Для переопределения в классе-наследнике!"""
-        _buf = self._tbuf
-        return self.write_buf_to_mem(0, _buf)
+        result = self.write_buf_to_mem(0, buf)
+        # время установлено, признак его сброса при потере питания больше не действует
+        self._ctrl_on_init = None
+        return result
 
     def raw_to_time(self, buf: bytearray) -> rtc_time:
         """Преобразует содержимое буфера buf, заполненного методом read_raw_time, в именованный кортеж rtc_time.
@@ -125,9 +217,7 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
         sreg = self.read_reg(0x0F, 1)[0]
         if raw:
             return sreg
-        val_gen = (bool(sreg & (1 << i)) for i in (7, 3, 2, 1, 0))
-        return status_ds3231(OSF=next(val_gen), EN32KHz=next(val_gen),
-                             BSY=next(val_gen), A2F=next(val_gen), A1F=next(val_gen))
+        return DS3221._status_decoder.decode(sreg)
 
     #"""№ bit                Description
     #----------------------------------------------------
@@ -153,8 +243,7 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
         Установка в True/False доступна для флага EN32kHz.
         Установка флагов A2F, A1F в 1 приводит к непредсказуемым результатам в работе RTC!"""
         _sts = self.get_status(raw=True)
-        bit_numb = 7, 3, 2, 1, 0
-        result = change_bit_by_flags(_sts, bit_numb, flags)
+        result = DS3221._status_flags.apply(_sts, flags)
         self.set_status(result)
 
     def get_alarm_flags(self, raw: bool = True, clear: bool = True) -> [int, tuple[bool,...]]:
@@ -168,46 +257,170 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
         # return status_ds3231(OSF=None, EN32KHz=None, BSY=None, A2F=a2, A1F=a1)
         return bool(_raw & 0x02), bool(_raw & 0x01)
 
-    def get_control(self, raw: bool = True) -> [int, tuple]:
-        """Возвращает байт из регистра управления.
-        Returns byte from the control register."""
+    def get_alarm_flag(self, alarm_id: int = 0, clear: bool = True) -> bool:
+        """Возвращает флаг срабатывания будильника alarm_id (0 - A1F, 1 - A2F) и очищает только его, если clear
+        равен true!"""
+        mask = 1 << alarm_id
+        _raw = self.get_status(raw=True)
+        if clear and mask & _raw:
+            self.set_status(~mask & _raw)
+        return bool(mask & _raw)
+
+    def get_control(self, raw: bool = True) -> [int, control_ds3231]:
+        """Возвращает байт из регистра управления, если raw is True, иначе именованный кортеж типа control_ds3231.
+        Returns byte from the control register.
+        Всегда читает регистр по шине и обновляет его копию."""
+        creg = self.read_reg(0x0E, 1)[0]
+        self._creg = DS3221._creg_mask & creg
         if raw:
-            return self.read_reg(0x0E, 1)[0]
-        raise NotImplemented
+            return creg
+        return control_ds3231(EOSC=bool(0x80 & creg), BBSQW=bool(0x40 & creg), CONV=bool(0x20 & creg),
+                              RS=(0x18 & creg) >> 3, INTCN=bool(0x04 & creg), A2IE=bool(0x02 & creg),
+                              A1IE=bool(0x01 & creg))
 
-    def set_control(self, value: [int, tuple]):
+    def set_control(self, value: [int, control_ds3231]):
         """Записывает байт value в регистр управления.
+        Если value - именованный кортеж control_ds3231, то изменяются только поля, не равные None!
         Читайте документацию на микросхему (Control Register (0Eh))!"""
-        if isinstance(value, int):
-            return self.write_reg(0x0E, value, 1)
-        raise  NotImplemented
+        creg = value
+        if not isinstance(value, int):
+            creg = DS3221._merge_control(self._get_creg(), value)
+        result = self.write_reg(0x0E, creg, 1)
+        self._creg = DS3221._creg_mask & creg
+        return result
+
+    def _get_creg(self) -> int:
+        """Возвращает копию регистра управления. Регистр читается по шине, только если копия неизвестна."""
+        if self._creg is None:
+            return self.get_control(raw=True)
+        return self._creg
+
+    @staticmethod
+    def _merge_control(creg: int, value: control_ds3231) -> int:
+        """Возвращает значение регистра управления creg, измененное полями value, не равными None"""
+        flags = value.EOSC, value.BBSQW, value.CONV, value.INTCN, value.A2IE, value.A1IE
+        creg = DS3221._control_flags.apply(creg, flags)
+        if value.RS is not None:
+            check_value(value.RS, range(4), f"Неверное значение поля RS: {value.RS}")
+            creg = (0xE7 & creg) | (value.RS << 3)
+        return creg
+
+    def set_sqw(self, freq: [int, None], battery_backed: bool = False):
+        """Включает на выводе INT/SQW прямоугольный сигнал с частотой freq Гц (1, 1024, 4096, 8192).
+        Если battery_backed в Истина, то сигнал формируется и при питании от батареи (BBSQW).
+        Если freq is None, то вывод INT/SQW переключается в режим выхода прерывания от будильников (INTCN = 1)."""
+        creg = self._get_creg()
+        if freq is None:
+            creg |= 0x04
+        else:
+            freqs = DS3221._sqw_freqs
+            check_value(freq, freqs, f"Неверная частота SQW: {freq}")
+            creg = (0xA3 & creg) | (freqs.index(freq) << 3)    # INTCN = 0, BBSQW = 0
+            if battery_backed:
+                creg |= 0x40
+        self.set_control(creg)
+
+    def get_sqw(self) -> [int, None]:
+        """Возвращает частоту прямоугольного сигнала на выводе INT/SQW, Гц, или None, если вывод работает
+        в режиме выхода прерывания от будильников"""
+        creg = self._get_creg()
+        if 0x04 & creg:
+            return None
+        return DS3221._sqw_freqs[(0x18 & creg) >> 3]
+
+    def enable_32khz(self, enable: bool = True):
+        """Включает(enable в Истина) или выключает прямоугольный сигнал 32768 Гц на выводе 32kHz (EN32kHz)"""
+        self.set_status(status_ds3231(OSF=None, EN32KHz=enable, BSY=None, A2F=None, A1F=None))
 
     def get_stop_event(self, clear: bool = True) -> bool:
         """Возвращает Истина, если произошел сбой тактирования часов, что может говорить о неверном времени и
         необходимости его установки в верное значение!"""
         status = self.get_status(raw=False)
-        if clear:
-            # очистка флага 'Oscillator Stop Flag'
-            self.set_status(status_ds3231(OSF=False, EN32KHz=None, BSY=None, A2F=None, A1F=None))
         _x = 0x1C == self._get_ctrl_on_init()
-        return status.OSF or _x
-
-    #def get_temperature(self) -> float:
-    #    """возвращает температуру микросхемы часов в градусах Цельсия"""
-    #    hi, low = self.read_reg(0x11, 2)
-    #    return self.unpack("b", hi.to_bytes(1, sys.byteorder))[0] + 0.25 * (low >> 6)
+        if clear:
+            # очистка флага 'Oscillator Stop Flag' и признака сброса времени при потере питания
+            self.set_status(DS3221._clear_osf)
+            self._ctrl_on_init = None
+        return self._report_stop(status.OSF or _x)
+
+    # --- ITemperatureSensor ---
+    def is_temp_busy(self) -> bool:
+        """Возвращает Истина, если микросхема выполняет измерение температуры (бит BSY в регистре состояния или
+        бит CONV в регистре управления в 1)."""
+        ctrl, sts = self.read_reg(0x0E, 2)     # регистры управления и состояния за одно обращение к шине
+        return bool(0x20 & ctrl or 0x04 & sts)
+
+    def start_temp_conversion(self) -> bool:
+        """Запускает принудительное измерение температуры (бит CONV в регистре управления).
+        Возвращает Ложь, если микросхема уже выполняет измерение (бит BSY в 1). В этом случае новое
+        значение температуры будет доступно по окончании текущего измерения!"""
+        if 0x04 & self.get_status(raw=True):
+            return False
+        self.set_control(0x20 | self._get_creg())
+        return True
+
+    def wait_temp_conversion(self, timeout_ms: int = 250, poll_ms: int = 10) -> bool:
+        """Ожидает окончания измерения температуры. Между обращениями к шине выполняется пауза poll_ms мс.
+        Возвращает Истина, если измерение окончено, и Ложь по истечении timeout_ms мс."""
+        start = time.ticks_ms()
+        while self.is_temp_busy():
+            if time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                return False
+            time.sleep_ms(poll_ms)
+        return True
+
+    def enable_temp_meas(self, enable: bool = True):
+        """Микросхема измеряет температуру автоматически, раз в 64 секунды. При enable в Истина запускает
+        принудительное измерение температуры, дожидается его окончания и сбрасывает кэш температуры."""
+        if not enable:
+            return
+        self.start_temp_conversion()
+        self.wait_temp_conversion()
+        self._temperature = None
+
+    def get_temperature(self, force: bool = False) -> float:
+        """Возвращает температуру микросхемы часов в градусах Цельсия. Шаг 0.25 градуса.
+        Значение кэшируется до следующего автоматического измерения (64 сек.), поэтому повторные вызовы не
+        обращаются к шине. Если force в Истина, то выполняется принудительное измерение температуры."""
+        if force:
+            self.enable_temp_meas(True)
+        now = time.ticks_ms()
+        if self._temperature is not None and time.ticks_diff(now, self._temp_ticks) < DS3221._temp_conv_period_ms:
+            return self._temperature
+        buf = self._temp_buf
+        self.read_buf_from_mem(0x11, buf)
+        hi = buf[0]
+        if 0x80 & hi:   # дополнительный код
+            hi -= 0x100
+        self._temperature = hi + 0.25 * (buf[1] >> 6)
+        self._temp_ticks = now
+        self._observe(TEMPERATURE, self._temperature)
+        return self._temperature
+
+    def get_temperature_gen(self, count: [int, None] = None, period_ms: int = 64_000, force: bool = False):
+        """Генератор значений температуры. Выдает count значений (бесконечно, если count is None)
+        с периодом period_ms мс. Если force в Истина, то каждое значение измеряется принудительно."""
+        index = 0
+        while count is None or index < count:
+            if index:
+                time.sleep_ms(period_ms)
+            yield self.get_temperature(force)
+            index += 1
 
     def get_aging_offset(self) -> int:
         """Возвращает значение подстроечной емкости на выводах кварцевого резонатора. Для компенсации 'ухода' времени!
         Положительные значения добавляют емкость, замедляя частоту генератора. Счет времени пойдет медленнее!
         Отрицательные значения уменьшают емкость, увеличивая частоту генератора. Счет времени пойдет быстрее!
-        Для 'тонкой' настройки в очень небольшом диапазоне!"""
-        return self.read_reg(0x10, 1)[0]
+        Для 'тонкой' настройки в очень небольшом диапазоне! Диапазон значений -128..127, шаг около 0.1 ppm."""
+        val = self.read_reg(0x10, 1)[0]
+        if 0x80 & val:  # дополнительный код
+            return val - 0x100
+        return val
 
     def set_aging_offset(self, value: int):
         """Устанавливает значение подстроечной емкости на выводах кварцевого резонатора. Для компенсации 'ухода' времени!"""
         check_value(value, range(-128, 128), f"Неверное значение подстройки частоты: {value}")
-        self.write_reg(0x10, value, 1)
+        self.write_reg(0x10, 0xFF & value, 1)     # в регистре значение в дополнительном коде
 
     @staticmethod
     def _get_alarm_addr_by_id(alarm_id: int) -> int:
@@ -258,7 +471,7 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
             if 0x40 & item:     # dy_dt
                 _day_of_week = bcd_to_int(0x07 & item) - 1
             else:
-                _day_of_month = bcd_to_int(0x3F & item)
+                _day_of_month = 0x80 | bcd_to_int(0x3F & item)  # признак дня месяца, смотри irtc.check_alarm_time
 
         return rtc_alarm_time(date_day=_day_of_month if not _day_of_month is None else _day_of_week,
                               hour=_hour, min=_min)
@@ -292,19 +505,37 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
         Если вы не используете прерывание, вы должны вызвать метод get_alarm_flags в цикле для обнаружения
         срабатывания будильника!
         Enable or disable two clock alarms interrupt on chip pin INT/SQW.
-        If you dont use interrupt, you must call get_alarm_flags method in cycle for detect clock alarm!"""
-        cr = self.get_control()
-        cr &= 0x18  # BBSQW = INTCN = A2IE = A1IE = 0
+        If you dont use interrupt, you must call get_alarm_flags method in cycle for detect clock alarm!
+        Если копия регистра управления совпадает с требуемым значением, то обращений к шине нет."""
+        creg = self._get_creg()
+        cr = 0x18 & creg  # BBSQW = INTCN = A2IE = A1IE = 0
         if irq_alarm_1_enable:
             cr |= 0x06  # INTCN = A2IE = 1
         if irq_alarm_0_enable:
             cr |= 0x05  # INTCN = A1IE = 1
-        self.set_control(cr)
+        if cr != creg:
+            self.set_control(cr)
+
+    def enable_alarm(self, alarm_id: int = 0, enable: bool = True):
+        """Включает (INTCN = AxIE = 1) или отключает (AxIE = 0) прерывание будильника alarm_id на выводе INT/SQW.
+        Прерывание другого будильника не изменяется. Если копия регистра управления совпадает с требуемым
+        значением, то обращений к шине нет."""
+        creg = self._get_creg()
+        mask = 1 << alarm_id    # A1IE, A2IE
+        cr = (0x04 | mask | creg) if enable else (~mask & creg)
+        if cr != creg:
+            self.set_control(cr)
 
     def get_alarms_count(self) -> int:
         return 2
 
-    def _get_ctrl_on_init(self) -> int:
+    def get_state(self) -> int:
+        """Возвращает состояние драйвера (копию регистра управления, 0..255) для передачи в конструктор после
+        пробуждения MCU из глубокого сна. Смотри sensor_pack_2.sleepmgr.
+        Если копия известна, то обращений к шине нет."""
+        return self._get_creg()
+
+    def _get_ctrl_on_init(self) -> [int, None]:
         """Cодержимое регистра управления до инициализации!
         если(!) оно равно 0x1C, то в результате потери питания было сброшено время,
         поэтому нужно(!) установить правильное время!"""
@@ -313,3 +544,46 @@ class DS3221(DeviceEx, IRTCwAlarms, Iterator):
     def __next__(self) -> tuple:
         """For support iterating."""
         return self.get_time()
+
+
+class SqwTimebase:
+    """Счетчик фронтов прямоугольного сигнала с вывода INT/SQW (или 32kHz) RTC. Аппаратная шкала времени для MCU,
+    которая, в отличие от time.ticks_ms, не зависит от точности генератора MCU.
+    Частоту сигнала сначала настройте методом DS3221.set_sqw! Частоты 4096 и 8192 Гц могут оказаться
+    слишком высокими для обработки прерываний медленным MCU!"""
+
+    def __init__(self, pin: Pin, freq: int, trigger: int = Pin.IRQ_FALLING):
+        """pin - вывод MCU, подключенный к выводу SQW. freq - частота сигнала, Гц."""
+        if freq <= 0:
+            raise ValueError(f"Неверная частота: {freq}")
+        self._pin = pin
+        self._freq = freq
+        self._count = 0
+        pin.irq(trigger=trigger, handler=self._handler)
+
+    def _handler(self, pin):
+        self._count += 1
+
+    @property
+    def freq(self) -> int:
+        """Частота сигнала, Гц"""
+        return self._freq
+
+    def ticks(self) -> int:
+        """Возвращает количество фронтов сигнала с момента создания экземпляра класса"""
+        return self._count
+
+    def elapsed_us(self, start_ticks: int) -> int:
+        """Возвращает время, мкс, прошедшее с момента, когда ticks() вернул start_ticks.
+        Разрешение равно периоду сигнала SQW!"""
+        return 1_000_000 * (self._count - start_ticks) // self._freq
+
+    def wait(self, count: int):
+        """Ожидает count фронтов сигнала"""
+        target = self._count + count
+        while self._count < target:
+            time.sleep_us(0)
+
+    def deinit(self):
+        """Отключает обработчик прерывания"""
+        self._pin.irq(handler=None)
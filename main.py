@@ -5,6 +5,7 @@ from ds3231mod import DS3221, status_ds3231
 from PCF8563mod import PCF8563
 from sensor_pack_2.irtc import rtc_alarm_time   # , rtc_time
 from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.rtctz import TimeZone, LocalClock
 import time
 
 def show_header(info: str, width: int = 32):
@@ -53,14 +54,17 @@ if __name__ == '__main__':
     _stop_event = clock.get_stop_event(clear = True)
     if _stop_event:
         print("Была остановка счета времени!")
-        loc_time = time.localtime()
-        print(f"Установка времени в 'правильное' значение: {loc_time}")
-        clock.set_time(loc_time)
+        # RTC хранит время UTC! Часы MCU должны идти по UTC (например, после ntptime.settime())
+        utc_time = time.gmtime()
+        print(f"Установка времени UTC в 'правильное' значение: {utc_time}")
+        clock.set_time(utc_time)
         delay_ms(10)
 
+    # местное время для отображения: часовой пояс UTC+3 без перехода на летнее время.
+    # таблица переходов tzdata: TimeZone.from_file(имя файла, созданного tools/tzblob.py)
+    local_clock = LocalClock(clock, TimeZone(offset=3 * 3600))
     for _ in range(3):
-        _tm = clock.get_time()
-        print(f"Время из RTC: {_tm};")
+        print(f"Время UTC из RTC: {clock.get_time()}; местное время: {local_clock.get_time()}")
         delay_ms(1000)
 
     # sys.exit(0)
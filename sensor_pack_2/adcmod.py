@@ -3,8 +3,11 @@
 # MIT license
 
 # from sensor_pack_2.bus_service import mpy_bl
+import time
+from array import array
 from collections import namedtuple
 from sensor_pack_2.base_sensor import check_value
+from sensor_pack_2.irtc import rtc_time_to_seconds
 
 # разностный вход (bool, differential_input)
 # разрядность в битах (int, resolution)
@@ -40,6 +43,12 @@ adc_init_props = namedtuple("adc_init_props",
 # если low_limit в Истина, то "стрелка" АЦП на нижнем крае шкалы (underflow)
 # если hi_limit в Истина, то "стрелка" АЦП верхнем крае шкалы (overflow)
 raw_value_ex = namedtuple("raw_value_ex", "value low_limit hi_limit")
+# для метода read_block
+# start, end - время RTC (секунды с 2000-01-01, смотри irtc.rtc_time_to_seconds) до первого и после последнего
+# отсчета блока или None, если RTC не задан
+# start_us, end_us - значения time.ticks_us в момент чтения первого и последнего отсчета блока
+# count - количество отсчетов в блоке
+adc_block_info = namedtuple("adc_block_info", "start end start_us end_us count")
 
 # Типовое содержимое регистра конфигурации (все значения сырые/raw):
 # gain; коэффициент усиления для PGA-programmable gain amplifier (усилитель с программируемым усилением)
@@ -60,7 +69,45 @@ def _get_reg_raw_limits(adc_resolution: int, differential: bool) -> raw_value_ex
     return raw_value_ex(value=0, low_limit=0, hi_limit=2 ** adc_resolution - 1)
 
 
+class ConversionContext:
+    """Константы преобразования отсчетов АЦП, вычисляемые один раз при изменении настроек АЦП:
+    цена младшего разряда, 'сырые' предельные значения, пороги переполнения и множитель с фиксированной
+    точкой для целочисленного преобразования в микроВольты: uv = (raw * scale + half) >> shift.
+    Количество дробных бит shift выбирается наибольшим, при котором max(|raw|) * scale + half < 2**30, чтобы
+    произведение оставалось 'малым' целым MicroPython (без выделения памяти в куче) на 32-битных MCU.
+    half - половина младшего разряда результата, округление к ближайшему для отсчетов любого знака."""
+    # граница 'малых' целых MicroPython на 32-битных MCU
+    _small_int_limit = 1 << 30
+
+    def __init__(self, lsb: float, resolution: int, differential: bool, delta: int = 5):
+        """lsb - цена младшего разряда в Вольтах, resolution - разрядность отсчета в битах,
+        differential - Истина для дифференциального АЦП, delta - 'зазор' порогов переполнения."""
+        self.lsb = lsb
+        limits = _get_reg_raw_limits(resolution, differential)
+        self.low_limit = limits.low_limit
+        self.hi_limit = limits.hi_limit
+        max_raw = max(abs(self.low_limit), abs(self.hi_limit))
+        lsb_uv = lsb * 1_000_000
+        shift = 0
+        while shift < 30 and max_raw * int(0.5 + lsb_uv * (2 << shift)) + (1 << shift) < self._small_int_limit:
+            shift += 1
+        self.shift = shift
+        self.scale = int(0.5 + lsb_uv * (1 << shift))
+        self.half = (1 << shift) >> 1
+        self.set_delta(delta)
+
+    def set_delta(self, delta: int):
+        """Вычисляет пороги переполнения для 'зазора' delta"""
+        self.delta = delta
+        self.under_threshold = self.low_limit + delta
+        self.over_threshold = self.hi_limit - delta
+
+
 class ADC:
+    # единица измерения времени, возвращаемого get_conversion_cycle_time: Истина - мкс, Ложь - мс.
+    # Переопределить в классе - наследнике при необходимости!
+    conversion_time_in_us = True
+
     def __init__(self, init_props: adc_init_props, model: str = None):
         """reference_voltage - опорное напряжение в Вольтах;
         max_resolution - предельное разрешение АЦП в битах;
@@ -93,6 +140,9 @@ class ADC:
         self._low_pwr_mode = None
         # строковое имя модели АЦП
         self._model_name = model
+        # константы преобразования отсчетов для текущих настроек (ConversionContext). Вычисляются при первом
+        # обращении после изменения настроек (start_measurement)
+        self._context = None
 
     @property
     def model(self) -> str:
@@ -142,6 +192,20 @@ class ADC:
         _k = 2 if ipr.differential_mode else 1
         return _k * ipr.reference_voltage / (self.gain * 2 ** self.current_resolution)
 
+    def get_context(self) -> ConversionContext:
+        """Возвращает константы преобразования отсчетов для текущих настроек АЦП. Вычисляются один раз
+        после изменения настроек (start_measurement)"""
+        ctx = self._context
+        if ctx is None:
+            ctx = self._context = ConversionContext(self.get_lsb(), self.current_resolution,
+                                                    self.init_props.differential_mode)
+        return ctx
+
+    def get_cached_lsb(self) -> float:
+        """Возвращает цену младшего разряда в Вольтах, вычисленную методом get_lsb один раз после изменения
+        настроек АЦП"""
+        return self.get_context().lsb
+
     def get_conversion_cycle_time(self) -> int:
         """возвращает время преобразования в [мкc/мс] аналогового значения в цифровое в зависимости от
         текущих настроек АЦП. Переопредели для каждого АЦП!"""
@@ -166,13 +230,79 @@ class ADC:
         Переопределяется в классах - наследниках!
         delta - 'зазор'"""
         raw = self.get_raw_value()
-        limits = _get_reg_raw_limits(self.current_resolution, self.init_props.differential_mode)
-        return raw_value_ex(value=raw, low_limit=raw in range(limits.low_limit, 1 + delta + limits.low_limit),
-                            hi_limit=raw in range(limits.hi_limit - delta, 1 + limits.hi_limit))
+        ctx = self.get_context()
+        if ctx.delta != delta:
+            ctx.set_delta(delta)
+        return raw_value_ex(value=raw, low_limit=ctx.low_limit <= raw <= ctx.under_threshold,
+                            hi_limit=ctx.over_threshold <= raw <= ctx.hi_limit)
 
     def raw_value_to_real(self, raw_val: int) -> float:
         """Преобразует 'сырое' значение из регистра АЦП в значение в Вольтах"""
-        return raw_val * self.get_lsb()
+        return raw_val * self.get_context().lsb
+
+    def raw_value_to_uv(self, raw_val: int) -> int:
+        """Преобразует 'сырое' значение из регистра АЦП в значение в микроВольтах, только целочисленными
+        операциями (умножение и сдвиг), с округлением до 1 мкВ. Смотри ConversionContext."""
+        ctx = self.get_context()
+        return (raw_val * ctx.scale + ctx.half) >> ctx.shift
+
+    def read_block(self, count: int, into=None, clock=None) -> tuple:
+        """Читает count отсчетов текущего канала в непрерывном режиме (single_shot_mode в Ложь) в массив into
+        (array, например array('h'), длиной не меньше count) или в новый array('h'), если into is None.
+        Отсчеты читаются с периодом get_conversion_cycle_time, то есть каждое преобразование читается один раз.
+        clock - RTC (IRTC) для привязки блока к времени или None.
+        Возвращает кортеж (массив отсчетов, adc_block_info)."""
+        if self.single_shot_mode:
+            raise ValueError("Чтение блока возможно только в непрерывном режиме АЦП!")
+        if into is None:
+            into = array("h", [0] * count)
+        elif len(into) < count:
+            raise ValueError(f"Длина массива {len(into)} меньше {count}")
+        period = self.get_conversion_cycle_time()
+        if not self.conversion_time_in_us:
+            period *= 1000
+        start = None
+        if clock is not None:
+            start = rtc_time_to_seconds(clock.get_time())
+        get_raw = self.get_raw_value
+        ticks_us, ticks_diff, ticks_add = time.ticks_us, time.ticks_diff, time.ticks_add
+        start_us = end_us = ticks_us()
+        deadline = start_us
+        for index in range(count):
+            while ticks_diff(deadline, ticks_us()) > 0:
+                pass
+            end_us = ticks_us()
+            into[index] = get_raw()
+            deadline = ticks_add(deadline, period)
+        end = None
+        if clock is not None:
+            end = rtc_time_to_seconds(clock.get_time())
+        return into, adc_block_info(start=start, end=end, start_us=start_us, end_us=end_us, count=count)
+
+    def raw_block_to_uv(self, raw, out=None, count: [int, None] = None):
+        """Преобразует count (или все) 'сырые' отсчеты из массива raw в микроВольты, в массив out
+        (array('l') длиной не меньше count) или в новый array('l'), если out is None. Возвращает out.
+        Только целочисленные операции: uv = (raw * scale + half) >> shift (смотри ConversionContext)."""
+        n = len(raw) if count is None else count
+        if out is None:
+            out = array("l", [0] * n)
+        ctx = self.get_context()
+        scale, half, shift = ctx.scale, ctx.half, ctx.shift
+        for index in range(n):
+            out[index] = (raw[index] * scale + half) >> shift
+        return out
+
+    def raw_block_to_volts(self, raw, out=None, count: [int, None] = None):
+        """Преобразует count (или все) 'сырые' отсчеты из массива raw в Вольты, в массив out
+        (array('f') длиной не меньше count) или в новый array('f'), если out is None. Возвращает out.
+        Цена младшего разряда вычисляется один раз (get_cached_lsb)."""
+        n = len(raw) if count is None else count
+        if out is None:
+            out = array("f", [0] * n)
+        lsb = self.get_cached_lsb()
+        for index in range(n):
+            out[index] = raw[index] * lsb
+        return out
 
     def gain_raw_to_real(self, raw_gain: int) -> float:
         """Преобразует 'сырое' значение усиления в 'настоящее'.
@@ -191,6 +321,24 @@ class ADC:
         Переопределить в классе - наследнике!"""
         raise NotImplemented
 
+    def get_channel_raw_config(self, channel: int, differential: bool) -> int:
+        """Возвращает 'сырое' слово конфигурации АЦП (adc_properties_to_raw_config) для канала channel
+        (differential в Истина - дифференциальный канал) с текущими остальными настройками.
+        Текущий канал АЦП не изменяется, в АЦП ничего не записывается."""
+        self.check_channel_number(channel, differential)
+        curr = self._curr_channel, self._is_diff_channel
+        self._curr_channel, self._is_diff_channel = channel, differential
+        try:
+            return self.adc_properties_to_raw_config()
+        finally:
+            self._curr_channel, self._is_diff_channel = curr
+
+    def set_current_channel(self, channel: int, differential: bool):
+        """Запоминает канал channel как текущий без записи в АЦП. Вызывайте после записи в АЦП слова
+        конфигурации этого канала (get_channel_raw_config, set_raw_config)."""
+        self.check_channel_number(channel, differential)
+        self._curr_channel, self._is_diff_channel = channel, differential
+
     def get_current_channel(self) -> adc_channel_info:
         """Возвращает информацию о текущем активном канале АЦП"""
         return adc_channel_info(number=self._curr_channel, is_differential=self._is_diff_channel)
@@ -235,6 +383,7 @@ class ADC:
         self.raw_config_to_adc_properties(_raw_cfg)     # обновляю поля экземпляра класса
         # пересчет в реальное усиление
         self._real_gain = self.gain_raw_to_real(self._curr_raw_gain)
+        self._context = None    # настройки изменились
 
     def raw_config_to_adc_properties(self, raw_config: int):
         """Возвращает текущие настройки датчика из числа, возвращенного get_raw_config(!), в поля(!) класса.
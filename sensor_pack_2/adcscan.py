@@ -0,0 +1,115 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Многоканальный опрос АЦП по сигналу RTC (тревога или SQW DS3231). Отсчеты привязаны к времени RTC"""
+
+import time
+import micropython
+from array import array
+from machine import Pin
+from sensor_pack_2.adcmod import ADC, adc_channel_info
+
+
+class AdcScanner:
+    """Опрос списка каналов АЦП. 'Сырые' слова конфигурации каналов вычисляются один раз, при создании,
+    поэтому переключение канала - одна запись конфигурации без чтения ее обратно (без start_measurement).
+    Отсчеты сохраняются в заранее созданный массив каналы x выборки: отсчет канала ch выборки n
+    имеет индекс ch * samples + n (смотри get). Время каждой выборки (time.ticks_us) - в массиве ticks."""
+
+    def __init__(self, adc: ADC, channels: tuple, samples: int, data_rate_raw: int, gain_raw: int,
+                 single_shot: bool = True):
+        """adc - АЦП. channels - кортеж каналов: номеров (не дифференциальные каналы) или adc_channel_info.
+        samples - количество выборок (опросов всех каналов) в массиве.
+        data_rate_raw, gain_raw, single_shot - смотри ADC.start_measurement, общие для всех каналов."""
+        if not channels or samples < 1:
+            raise ValueError(f"Неверное количество каналов/выборок: {len(channels)}/{samples}")
+        self._adc = adc
+        self._channels = tuple(ch if isinstance(ch, adc_channel_info) else adc_channel_info(ch, False)
+                               for ch in channels)
+        self._samples = samples
+        first = self._channels[0]
+        # полная настройка АЦП один раз: проверка параметров, разрешение, усиление, константы преобразования
+        adc.start_measurement(single_shot, data_rate_raw, gain_raw, first.number, first.is_differential)
+        words = tuple(adc.get_channel_raw_config(ch.number, ch.is_differential) for ch in self._channels)
+        self._words = words
+        self._wait_us = adc.get_conversion_cycle_time() * (1 if adc.conversion_time_in_us else 1000)
+        self._data = array("h", [0] * (len(words) * samples))
+        self._ticks = array("L", [0] * samples)
+        self._index = 0     # номер следующей выборки
+        self._pin = None
+        self._clock = None
+        self._on_complete = None
+        self._scan_ref = self._scheduled_scan   # без выделения памяти в обработчике прерывания
+
+    def __len__(self) -> int:
+        """Возвращает количество сделанных выборок"""
+        return self._index
+
+    @property
+    def data(self) -> array:
+        """Массив отсчетов, смотри get"""
+        return self._data
+
+    @property
+    def ticks(self) -> array:
+        """Массив значений time.ticks_us в начале каждой выборки"""
+        return self._ticks
+
+    def is_full(self) -> bool:
+        return self._index >= self._samples
+
+    def reset(self):
+        """Начинает заполнение массива отсчетов сначала"""
+        self._index = 0
+
+    def get(self, channel_index: int, sample: int) -> int:
+        """Возвращает 'сырой' отсчет канала с индексом channel_index (в кортеже channels) выборки sample"""
+        return self._data[channel_index * self._samples + sample]
+
+    def scan(self) -> int:
+        """Опрашивает все каналы один раз (одна выборка). Возвращает номер выборки или -1, если массив заполнен.
+        После опроса текущий канал АЦП (get_current_channel) - последний в списке, он же настроен в АЦП."""
+        index = self._index
+        if index >= self._samples:
+            return -1
+        adc = self._adc
+        data, samples, wait_us = self._data, self._samples, self._wait_us
+        set_raw_config, get_raw = adc.set_raw_config, adc.get_raw_value
+        self._ticks[index] = time.ticks_us()
+        offs = index
+        for word in self._words:
+            set_raw_config(word)
+            time.sleep_us(wait_us)
+            data[offs] = get_raw()
+            offs += samples
+        last = self._channels[-1]
+        adc.set_current_channel(last.number, last.is_differential)
+        self._index = index + 1
+        return index
+
+    def attach(self, pin: Pin, clock=None, trigger: int = Pin.IRQ_FALLING, on_complete=None):
+        """Запускает выборку по фронту сигнала на выводе pin MCU, подключенном к выводу INT/SQW RTC.
+        clock - RTC с тревогами (IRTCwAlarms), флаги тревог которого сбрасываются после каждой выборки
+        (запуск по тревоге), или None (запуск по SQW, например DS3221.set_sqw(1)).
+        on_complete - функция on_complete(scanner), вызываемая после заполнения массива, или None.
+        Выборка выполняется вне обработчика прерывания, через micropython.schedule!"""
+        self._clock = clock
+        self._on_complete = on_complete
+        self._pin = pin
+        pin.irq(trigger=trigger, handler=self._irq)
+
+    def detach(self):
+        if self._pin is not None:
+            self._pin.irq(handler=None)
+            self._pin = None
+
+    def _irq(self, pin):
+        micropython.schedule(self._scan_ref, 0)
+
+    def _scheduled_scan(self, _):
+        if self.scan() < 0:
+            return
+        if self._clock is not None:
+            self._clock.get_alarm_flags(raw=True, clear=True)
+        if self.is_full() and self._on_complete is not None:
+            self._on_complete(self)
@@ -0,0 +1,107 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Вычисление времени срабатывания тревоги/'будильника' по шаблону rtc_alarm_time без перебора минут"""
+
+from sensor_pack_2.irtc import (rtc_time, rtc_alarm_time, get_days_in_month, rtc_time_to_seconds,
+                                seconds_to_rtc_time)
+
+# количество дней с 2000-01-01 до 2100-01-01. RTC хранят год двумя десятичными цифрами!
+_max_days = 36525
+
+
+def _next_minute_in_day(hour: [int, None], minute: [int, None], start: int) -> [int, None]:
+    """Возвращает первую минуту суток (0..1439), не меньшую start, совпадающую с hour и minute,
+    или None, если в этих сутках такой минуты нет. None в hour, minute - любое значение."""
+    if hour is None:
+        if minute is None:
+            return start if start < 1440 else None
+        h = start // 60
+        if start % 60 > minute:
+            h += 1
+        return 60 * h + minute if h < 24 else None
+    first = 60 * hour
+    if minute is None:
+        if start <= first:
+            return first
+        return start if start < first + 60 else None
+    first += minute
+    return first if start <= first else None
+
+
+def _next_day(date_day: [int, None], day: int, date_bit: int) -> int:
+    """Возвращает номер первых суток (с 2000-01-01), не меньший day, совпадающих с date_day.
+    Смотри irtc.check_alarm_time."""
+    if date_day is None:
+        return day
+    msk = 1 << date_bit
+    if not msk & date_day:
+        # день недели 0..6. 01.01.2000 - суббота(5)
+        return day + (date_day - (day + 5)) % 7
+    dom = date_day - msk
+    t = seconds_to_rtc_time(86400 * day)
+    year, month = t.year, t.month
+    if t.day > dom:
+        month += 1
+    # не во всех месяцах есть 29, 30 и 31 число! Количество итераций ограничено (29 февраля - раз в 4 года).
+    while True:
+        if month > 12:
+            year, month = year + 1, 1
+        if year > 2099:
+            return _max_days
+        if dom <= get_days_in_month(year, month):
+            return rtc_time_to_seconds((year, month, dom, 0, 0, 0)) // 86400
+        month += 1
+
+
+def get_next_fire_time(alarm: rtc_alarm_time, after: [int, rtc_time], date_bit: int = 7) -> [int, None]:
+    """Возвращает время следующего срабатывания тревоги alarm, строго после момента after.
+    Время - количество секунд с 2000-01-01 00:00:00 (смотри irtc.rtc_time_to_seconds).
+    Тревога срабатывает в нулевую секунду каждой минуты, совпадающей со всеми полями alarm, не равными None.
+    date_bit - номер бита-признака дня месяца в поле date_day.
+    Возвращает None, если тревога не сработает до 2100 года. Не более двух итераций на результат!"""
+    _after = after if isinstance(after, int) else rtc_time_to_seconds(after)
+    day, minute = divmod(_after // 60 + 1, 1440)
+    while True:
+        _day = _next_day(alarm.date_day, day, date_bit)
+        if _day >= _max_days:
+            return None
+        if _day != day:
+            minute = 0
+        _minute = _next_minute_in_day(alarm.hour, alarm.min, minute)
+        if _minute is not None:
+            return 60 * (1440 * _day + _minute)
+        day, minute = _day + 1, 0
+
+
+def get_fire_times(alarm: rtc_alarm_time, after: [int, rtc_time], count: int, date_bit: int = 7) -> list:
+    """Возвращает список из count (или меньше, если тревога перестанет срабатывать до 2100 года)
+    следующих времен срабатывания тревоги alarm после момента after. Смотри get_next_fire_time."""
+    result = []
+    _time = after
+    for _ in range(count):
+        _time = get_next_fire_time(alarm, _time, date_bit)
+        if _time is None:
+            break
+        result.append(_time)
+    return result
+
+
+def get_fire_times_batch(alarms, after: [int, rtc_time], count: int = 1, date_bit: int = 7) -> list:
+    """Для каждой тревоги из последовательности alarms возвращает список следующих времен срабатывания.
+    Смотри get_fire_times."""
+    _after = after if isinstance(after, int) else rtc_time_to_seconds(after)
+    return [get_fire_times(alarm, _after, count, date_bit) for alarm in alarms]
+
+
+def get_earliest(alarms, after: [int, rtc_time], date_bit: int = 7) -> [tuple, None]:
+    """Возвращает кортеж (индекс тревоги в alarms, время срабатывания) для тревоги, которая сработает раньше всех
+    после момента after, или None, если ни одна тревога не сработает до 2100 года.
+    Пригодится для планирования длительности сна MCU!"""
+    _after = after if isinstance(after, int) else rtc_time_to_seconds(after)
+    result = None
+    for index, alarm in enumerate(alarms):
+        _time = get_next_fire_time(alarm, _after, date_bit)
+        if _time is not None and (result is None or _time < result[1]):
+            result = index, _time
+    return result
@@ -0,0 +1,154 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Программный мультиплексор тревог/'будильников'. Неограниченное количество запланированных событий
+на основе одной аппаратной тревоги RTC"""
+
+import heapq
+from sensor_pack_2.irtc import (IRTC, IRTCwAlarms, rtc_time, rtc_alarm_time, rtc_time_to_seconds, seconds_to_rtc_time)
+from sensor_pack_2.alarmcalc import get_next_fire_time
+from sensor_pack_2.metrics import ALARM_MISSES
+
+
+class AlarmScheduler:
+    """Хранит запланированные события в двоичной куче (min-heap) по времени срабатывания и программирует в
+    аппаратную тревогу RTC только ближайшее из них. После срабатывания тревоги вызовите метод service, он вызовет
+    обработчики наступивших событий, перепланирует периодические события и запрограммирует следующую тревогу.
+    MCU может спать до следующего события и просыпаться по сигналу с вывода INT RTC.
+    Время событий - количество секунд с 2000-01-01 00:00:00 (смотри irtc.rtc_time_to_seconds).
+    Разрешение аппаратной тревоги - одна минута, поэтому событие считается наступившим с начала
+    минуты, в которой оно запланировано! Все события одной минуты обрабатываются за один вызов service."""
+
+    def __init__(self, clock: IRTCwAlarms, alarm_id: int = 0):
+        """clock - RTC с тревогами. alarm_id - номер аппаратной тревоги, используемой планировщиком."""
+        self._clock = clock
+        self._alarm_id = alarm_id
+        # куча из кортежей (время, порядковый номер, идентификатор события, период или шаблон, обработчик)
+        self._heap = []
+        self._seq = 0
+        # минута (секунды с 2000 года // 60), запрограммированная в RTC, или None
+        self._programmed = None
+        # Истина, если тревога отключена планировщиком (событий нет) и ее прерывание нужно включить снова
+        self._disarmed = False
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, event_id, at: [int, rtc_time], period: int = 0, callback=None):
+        """Добавляет событие event_id со временем срабатывания at (секунды с 2000 года или rtc_time).
+        period - период повторения события в секундах или 0 для однократного события.
+        callback - функция callback(event_id, event_time), вызываемая при наступлении события, или None.
+        После добавления событий вызовите метод program или service!"""
+        if period < 0:
+            raise ValueError(f"Неверный период события: {period}")
+        _at = at if isinstance(at, int) else rtc_time_to_seconds(at)
+        self._seq += 1
+        heapq.heappush(self._heap, (_at, self._seq, event_id, period, callback))
+
+    def add_pattern(self, event_id, pattern: rtc_alarm_time, after: [int, rtc_time], callback=None) -> [int, None]:
+        """Добавляет повторяющееся событие event_id, которое наступает в минуты, совпадающие с шаблоном pattern
+        (как у аппаратной тревоги, смотри irtc.check_alarm_time), после момента after (обычно текущее время).
+        callback - смотри метод add. Возвращает время первого срабатывания или None, если событие не наступит."""
+        first = get_next_fire_time(pattern, after)
+        if first is not None:
+            self._seq += 1
+            heapq.heappush(self._heap, (first, self._seq, event_id, pattern, callback))
+        return first
+
+    def remove(self, event_id) -> int:
+        """Удаляет все события с идентификатором event_id. Возвращает количество удаленных событий."""
+        heap = self._heap
+        new_heap = [item for item in heap if item[2] != event_id]
+        removed = len(heap) - len(new_heap)
+        if removed:
+            heapq.heapify(new_heap)
+            self._heap = new_heap
+        return removed
+
+    def next_time(self) -> [int, None]:
+        """Возвращает время ближайшего события (секунды с 2000 года) или None, если событий нет"""
+        heap = self._heap
+        return heap[0][0] if heap else None
+
+    def next_event(self) -> [tuple, None]:
+        """Возвращает кортеж (время, идентификатор) ближайшего события или None, если событий нет"""
+        heap = self._heap
+        return (heap[0][0], heap[0][2]) if heap else None
+
+    def resume(self, programmed: [int, None]):
+        """Сообщает планировщику, что тревога RTC уже запрограммирована на минуту времени programmed (секунды
+        с 2000 года), например до глубокого сна MCU (смотри sleepmgr.SleepManager). Тогда program не
+        программирует ее снова, если ближайшее событие наступает в ту же минуту.
+        Если programmed is None, то тревога считается отключенной."""
+        self._programmed = None if programmed is None else programmed // 60
+        self._disarmed = programmed is None
+
+    def program(self) -> [int, None]:
+        """Программирует в RTC тревогу ближайшего события. Если тревога уже запрограммирована на эту минуту,
+        обращения к шине не происходит. Если событий нет, то тревога отключается (set_alarm(None)), иначе
+        она сработала бы снова через месяц. Возвращает время ближайшего события или None, если событий нет."""
+        clock = self._clock
+        _next = self.next_time()
+        if _next is None:
+            if self._programmed is not None:
+                clock.set_alarm(None, self._alarm_id)
+                self._programmed = None
+                self._disarmed = True
+            return None
+        minute = _next // 60
+        if minute != self._programmed:
+            t = seconds_to_rtc_time(_next)
+            # 0x80 - признак дня месяца, смотри irtc.check_alarm_time
+            clock.set_alarm(rtc_alarm_time(date_day=0x80 | t.day, hour=t.hour, min=t.min), self._alarm_id)
+            self._programmed = minute
+        if self._disarmed:
+            clock.enable_alarm(self._alarm_id, True)
+            self._disarmed = False
+        return _next
+
+    def service(self, now: [int, rtc_time, None] = None) -> list:
+        """Обрабатывает наступившие события: сбрасывает флаг тревоги планировщика (флаги других тревог RTC
+        не изменяются), вызывает обработчики, перепланирует периодические события и программирует следующую тревогу.
+        now - текущее время (секунды с 2000 года или rtc_time) или None, тогда время читается из RTC.
+        Если now is None и флаг тревоги планировщика не установлен (например, сработала другая тревога),
+        то события не обрабатываются и возвращается пустой список.
+        Возвращает список идентификаторов наступивших событий в порядке их времени."""
+        clock = self._clock
+        fired_flag = clock.get_alarm_flag(self._alarm_id, clear=True)
+        if now is None:
+            if not fired_flag:
+                return []
+            now = clock.get_time()
+        _now = now if isinstance(now, int) else rtc_time_to_seconds(now)
+        # событие наступило, если наступила минута его срабатывания
+        limit = 60 * (1 + _now // 60)
+        heap = self._heap
+        fired = []
+        missed = 0  # событий и повторений, не обработанных в их минуту (метрика ALARM_MISSES)
+        while heap and heap[0][0] < limit:
+            event_time, _, event_id, period, callback = heapq.heappop(heap)
+            fired.append(event_id)
+            if event_time < limit - 60:
+                missed += 1
+            next_time = None
+            if not isinstance(period, int):
+                # шаблон rtc_alarm_time. пропущенные повторения не вызываются повторно
+                next_time = get_next_fire_time(period, limit - 1)
+            elif period:
+                # пропущенные повторения не вызываются повторно
+                next_time = event_time + period
+                if next_time < limit - 60:
+                    # повторения до текущей минуты
+                    missed += (limit - 60 - next_time - 1) // period + 1
+                if next_time < limit:
+                    next_time += period * ((limit - next_time - 1) // period + 1)
+            if next_time is not None:
+                self._seq += 1
+                heapq.heappush(heap, (next_time, self._seq, event_id, period, callback))
+            if callback is not None:
+                callback(event_id, event_time)
+        registry = IRTC.metrics     # общий реестр метрик, clock может быть и не наследником IRTC
+        if missed and registry is not None:
+            registry.inc(ALARM_MISSES, missed)
+        self.program()
+        return fired
@@ -5,6 +5,7 @@
 
 import math
 from machine import I2C, SPI, Pin
+from sensor_pack_2.metrics import BUS_READS, BUS_WRITES, BUS_ERRORS
 
 
 def mpy_bl(value: int) -> int:
@@ -17,9 +18,19 @@ def mpy_bl(value: int) -> int:
 
 class BusAdapter:
     """Посредник между шиной ввода/вывода и классом ввода/вывода устройства"""
+    # реестр метрик (sensor_pack_2.metrics.MetricsRegistry) или None. Общий для всех адаптеров:
+    # BusAdapter.metrics = registry
+    metrics = None
+
     def __init__(self, bus: [I2C, SPI]):
         self.bus = bus
 
+    def _count(self, counter_id: int):
+        """Увеличивает счетчик counter_id реестра метрик, если он подключен"""
+        m = self.metrics
+        if m is not None:
+            m.inc(counter_id)
+
     def get_bus_type(self) -> type:
         """Возвращает тип шины"""
         return type(self.bus)
@@ -104,23 +115,43 @@ class I2cAdapter(BusAdapter):
         if isinstance(value, (bytes, bytearray)):
             buf = value
 
-        return self.bus.writeto_mem(device_addr, reg_addr, buf)
+        return self.write_buf_to_memory(device_addr, reg_addr, buf)
 
     def read_register(self, device_addr: int, reg_addr: int, bytes_count: int) -> bytes:
         """считывает из регистра датчика значение.
         bytes_count - размер значения в байтах"""
-        return self.bus.readfrom_mem(device_addr, reg_addr, bytes_count)
+        self._count(BUS_READS)
+        try:
+            return self.bus.readfrom_mem(device_addr, reg_addr, bytes_count)
+        except OSError:
+            self._count(BUS_ERRORS)
+            raise
 
     def read(self, device_addr: int, n_bytes: int) -> bytes:
-        return self.bus.readfrom(device_addr, n_bytes)
+        self._count(BUS_READS)
+        try:
+            return self.bus.readfrom(device_addr, n_bytes)
+        except OSError:
+            self._count(BUS_ERRORS)
+            raise
 
     def read_to_buf(self, device_addr: int, buf: bytearray) -> bytes:
         """Читает из устройства на шине с адресом device_addr в буфер buf количество байт, равное длине(len) буфера!"""
-        self.bus.readfrom_into(device_addr, buf)
+        self._count(BUS_READS)
+        try:
+            self.bus.readfrom_into(device_addr, buf)
+        except OSError:
+            self._count(BUS_ERRORS)
+            raise
         return buf
     
     def write(self, device_addr: int, buf: bytes):
-        return self.bus.writeto(device_addr, buf)
+        self._count(BUS_WRITES)
+        try:
+            return self.bus.writeto(device_addr, buf)
+        except OSError:
+            self._count(BUS_ERRORS)
+            raise
 
     def read_buf_from_memory(self, device_addr: int, mem_addr, buf, address_size: int = 1):
         """Читает из устройства с адресом device_addr в буфер buf, начиная с адреса в устройстве mem_addr.
@@ -128,14 +159,24 @@ class I2cAdapter(BusAdapter):
         address_size - определяет размер адреса в байтах. (в ESP8266 этот аргумент не распознается и размер адреса
         всегда равен 1 (8 бит)).
         Расширение возможностей базового класса."""
-        self.bus.readfrom_mem_into(device_addr, mem_addr, buf)
+        self._count(BUS_READS)
+        try:
+            self.bus.readfrom_mem_into(device_addr, mem_addr, buf)
+        except OSError:
+            self._count(BUS_ERRORS)
+            raise
         return buf
 
     def write_buf_to_memory(self, device_addr: int, mem_addr, buf):
         """Записывает в устройство с адресом device_addr все байты из буфера buf.
         Запись начинается с адреса в устройстве: mem_addr.
         Расширение возможностей базового класса."""
-        return self.bus.writeto_mem(device_addr, mem_addr, buf)
+        self._count(BUS_WRITES)
+        try:
+            return self.bus.writeto_mem(device_addr, mem_addr, buf)
+        except OSError:
+            self._count(BUS_ERRORS)
+            raise
 
 
 class SpiAdapter(BusAdapter):
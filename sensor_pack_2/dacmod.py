@@ -49,4 +49,12 @@ class DAC:
         Если значение имеет тип int, то будет записано сырое значение, которое должно быть в диапазоне get_out_range!
         Если значение имеет тип float (0.0 .. 100.0 %) то в выходной регистр будет записано сырое значение,
         соответствующее value в % от get_out_range.stop - 1."""
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def set_output_block(self, values) -> int:
+        """записывает в выходной регистр ЦАП 'сырые' значения values (array, memoryview) одно за другим.
+        Переопределите в классе-наследнике, если ЦАП поддерживает запись нескольких значений за одно обращение к
+        шине (автоинкремент, буфер FIFO). Возвращает количество записанных значений."""
+        for value in values:
+            self.set_output(value)
+        return len(values)
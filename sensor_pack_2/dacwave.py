@@ -0,0 +1,135 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Генерация сигналов ЦАП по заранее вычисленным таблицам 'сырых' значений (синус, пила, произвольная форма)"""
+
+import math
+import micropython
+from array import array
+from machine import Pin, Timer
+from sensor_pack_2.dacmod import DAC, check_percent_rng
+
+
+def _new_table(dac: DAC, length: int) -> array:
+    """Возвращает массив для length 'сырых' значений ЦАП"""
+    if length < 2:
+        raise ValueError(f"Неверная длина таблицы: {length}")
+    if dac.resolution > 16:
+        return array("L" if dac.unipolar else "l", [0] * length)
+    return array("H" if dac.unipolar else "h", [0] * length)
+
+
+def make_table(dac: DAC, percents) -> array:
+    """Возвращает таблицу 'сырых' значений ЦАП для значений percents (0..100 % от выходного диапазона)"""
+    rng = dac.get_out_range()
+    table = _new_table(dac, len(percents))
+    _min, _max = rng.start, rng.stop - 1
+    span = _max - _min
+    for index, value in enumerate(percents):
+        check_percent_rng(value)
+        table[index] = _min + int(0.5 + 0.01 * value * span)
+    return table
+
+
+def make_sine_table(dac: DAC, length: int, amplitude: float = 50.0, offset: float = 50.0) -> array:
+    """Возвращает таблицу одного периода синуса из length 'сырых' значений.
+    amplitude, offset - амплитуда и постоянная составляющая в % от выходного диапазона ЦАП."""
+    k = 2 * math.pi / length
+    return make_table(dac, [offset + amplitude * math.sin(k * index) for index in range(length)])
+
+
+def make_ramp_table(dac: DAC, length: int, low: float = 0.0, high: float = 100.0) -> array:
+    """Возвращает таблицу одного периода пилы из length 'сырых' значений, от low до high (% от выходного
+    диапазона ЦАП)"""
+    step = (high - low) / (length - 1)
+    return make_table(dac, [low + step * index for index in range(length)])
+
+
+class WavePlayer:
+    """Воспроизведение таблицы 'сырых' значений через ЦАП. На один отсчет - одно обращение к таблице и одна
+    запись в ЦАП. Новая таблица (set_table) начинает воспроизводиться с начала следующего периода сигнала
+    (двойная буферизация), без разрыва текущего периода.
+    Отсчеты выдаются по таймеру MCU (start), по фронту сигнала SQW RTC (attach) или блоками (write_block)."""
+
+    def __init__(self, dac: DAC, table: array):
+        self._dac = dac
+        self._table = table
+        self._next_table = None
+        self._index = 0
+        self._timer = None
+        self._pin = None
+        self._periods = 0   # количество воспроизведенных периодов
+        self._step_ref = self._scheduled_step   # без выделения памяти в обработчике прерывания
+
+    @property
+    def table(self) -> array:
+        """Воспроизводимая таблица"""
+        return self._table
+
+    @property
+    def periods(self) -> int:
+        """Количество полностью воспроизведенных периодов сигнала"""
+        return self._periods
+
+    def set_table(self, table: array):
+        """Устанавливает таблицу, которая будет воспроизводиться с начала следующего периода сигнала"""
+        self._next_table = table
+
+    def _end_of_period(self):
+        self._index = 0
+        self._periods += 1
+        if self._next_table is not None:
+            self._table, self._next_table = self._next_table, None
+
+    def step(self):
+        """Записывает в ЦАП следующий отсчет таблицы"""
+        index = self._index
+        self._dac.set_output(self._table[index])
+        index += 1
+        if index == len(self._table):
+            self._end_of_period()
+        else:
+            self._index = index
+
+    def write_block(self, count: int) -> int:
+        """Записывает в ЦАП до count следующих отсчетов таблицы, не переходя через конец периода,
+        методом DAC.set_output_block (запись за одно обращение к шине, если ЦАП это поддерживает).
+        Возвращает количество записанных отсчетов."""
+        table, index = self._table, self._index
+        end = min(len(table), index + count)
+        self._dac.set_output_block(memoryview(table)[index:end])
+        if end == len(table):
+            self._end_of_period()
+        else:
+            self._index = end
+        return end - index
+
+    def _scheduled_step(self, _):
+        self.step()
+
+    def _irq(self, _):
+        # обращение к шине в обработчике прерывания запрещено, поэтому запись отсчета - через schedule
+        micropython.schedule(self._step_ref, 0)
+
+    def start(self, sample_rate: [int, float], timer_id: int = -1):
+        """Запускает воспроизведение с частотой отсчетов sample_rate, Гц, по таймеру MCU timer_id.
+        Частота сигнала равна sample_rate / len(table)."""
+        self.stop()
+        self._timer = Timer(timer_id)
+        self._timer.init(mode=Timer.PERIODIC, freq=sample_rate, callback=self._irq)
+
+    def attach(self, pin: Pin, trigger: int = Pin.IRQ_FALLING):
+        """Запускает воспроизведение по фронту сигнала на выводе pin MCU, подключенном к выводу SQW RTC
+        (например DS3221.set_sqw(1024)). Частота отсчетов равна частоте SQW."""
+        self.stop()
+        self._pin = pin
+        pin.irq(trigger=trigger, handler=self._irq)
+
+    def stop(self):
+        """Останавливает воспроизведение"""
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+        if self._pin is not None:
+            self._pin.irq(handler=None)
+            self._pin = None
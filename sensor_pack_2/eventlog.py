@@ -0,0 +1,145 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Журнал событий с метками времени. Метка времени события - time.ticks_us, привязка к времени RTC выполняется
+раз в секунду, пересчет в абсолютное время - только при записи журнала в файл"""
+
+import time
+import struct
+from array import array
+from sensor_pack_2.irtc import IRTC, rtc_time_to_seconds
+
+# формат блока журнала в файле (little endian):
+#   заголовок:  сигнатура b"RTEL", версия формата (H), количество записей в блоке (H)
+#   запись:     секунды с 2000-01-01 (I), микросекунды (I), идентификатор события (H), данные события (i)
+_block_header_fmt = "<4sHH"
+_record_fmt = "<IIHi"
+_record_size = struct.calcsize(_record_fmt)
+log_signature = b"RTEL"
+log_version = 1
+
+
+class EventLogger:
+    """Кольцевой буфер событий (time.ticks_us, идентификатор события, данные) на основе заранее созданных массивов.
+    Метод log не выделяет память и не обращается к шине, поэтому быстр. При переполнении буфера самые старые
+    события перезаписываются (смотри dropped).
+    Раз в секунду вызывайте метод anchor, он привязывает time.ticks_us к времени RTC. Абсолютное время событий
+    вычисляется только при записи журнала методом flush."""
+
+    def __init__(self, clock: IRTC, capacity: int = 256, anchors: int = 16):
+        """clock - RTC. capacity - емкость буфера событий. anchors - емкость буфера точек привязки к RTC.
+        Точки привязки должны охватывать все события в буфере, иначе время старых событий вычисляется
+        по самой старой точке привязки!"""
+        if capacity < 1 or anchors < 1:
+            raise ValueError(f"Неверная емкость буфера: {capacity}/{anchors}")
+        self._clock = clock
+        self._capacity = capacity
+        self._ticks = array("L", [0] * capacity)
+        self._ids = array("H", [0] * capacity)
+        self._payload = array("l", [0] * capacity)
+        self._head = 0      # индекс для следующей записи
+        self._count = 0     # количество событий в буфере
+        self._dropped = 0   # количество перезаписанных событий
+        # точки привязки: time.ticks_us и секунды с 2000 года
+        self._anchor_cap = anchors
+        self._a_ticks = array("L", [0] * anchors)
+        self._a_secs = array("L", [0] * anchors)
+        self._a_head = 0
+        self._a_count = 0
+        # буфер для записи блока журнала в файл
+        self._out_buf = bytearray(32 * _record_size)
+
+    def __len__(self) -> int:
+        """Возвращает количество событий в буфере"""
+        return self._count
+
+    @property
+    def dropped(self) -> int:
+        """Количество событий, перезаписанных из-за переполнения буфера"""
+        return self._dropped
+
+    def log(self, event_id: int, payload: int = 0):
+        """Записывает событие event_id (0..65535) с данными payload (32 бита со знаком) в буфер"""
+        i = self._head
+        self._ticks[i] = time.ticks_us()
+        self._ids[i] = event_id
+        self._payload[i] = payload
+        i += 1
+        if i == self._capacity:
+            i = 0
+        self._head = i
+        if self._count < self._capacity:
+            self._count += 1
+        else:
+            self._dropped += 1
+
+    def anchor(self, edge_ticks: [int, None] = None, force: bool = False) -> bool:
+        """Привязывает time.ticks_us к времени RTC, не чаще раза в секунду (если force в Ложь).
+        Без edge_ticks точность привязки - одна секунда! Для точной привязки передайте в edge_ticks значение
+        time.ticks_us, сохраненное в обработчике прерывания по фронту начала секунды (сигнал SQW 1 Гц).
+        Возвращает Истина, если точка привязки добавлена."""
+        now = time.ticks_us()
+        if self._a_count and not force:
+            last = self._a_head - 1 if self._a_head else self._anchor_cap - 1
+            if time.ticks_diff(now, self._a_ticks[last]) < 1_000_000:
+                return False
+        seconds = rtc_time_to_seconds(self._clock.get_time())
+        ticks = now
+        if edge_ticks is not None and 0 <= time.ticks_diff(now, edge_ticks) < 1_000_000:
+            ticks = edge_ticks
+        i = self._a_head
+        self._a_ticks[i] = ticks
+        self._a_secs[i] = seconds
+        i += 1
+        self._a_head = 0 if i == self._anchor_cap else i
+        if self._a_count < self._anchor_cap:
+            self._a_count += 1
+        return True
+
+    def _to_absolute(self, ticks: int) -> tuple[int, int]:
+        """Возвращает кортеж (секунды с 2000 года, микросекунды) для значения time.ticks_us"""
+        cap = self._anchor_cap
+        index = self._a_head
+        best = -1
+        for _ in range(self._a_count):  # от новых точек привязки к старым
+            index = index - 1 if index else cap - 1
+            best = index
+            if time.ticks_diff(ticks, self._a_ticks[index]) >= 0:
+                break
+        if best < 0:
+            raise ValueError("Нет точек привязки к RTC! Вызовите метод anchor.")
+        sec, usec = divmod(time.ticks_diff(ticks, self._a_ticks[best]), 1_000_000)
+        return self._a_secs[best] + sec, usec
+
+    def flush(self, stream) -> int:
+        """Записывает все события из буфера в поток stream (файл, открытый в двоичном режиме) блоком
+        в компактном двоичном формате и очищает буфер. Возвращает количество записанных событий.
+        Для декодирования на компьютере смотри tools/eventlog_decode.py.
+        Если точек привязки к RTC нет (смотри anchor), то возбуждается ValueError, в поток ничего не записывается."""
+        count = self._count
+        if not count:
+            return 0
+        if not self._a_count:
+            raise ValueError("Нет точек привязки к RTC! Вызовите метод anchor.")
+        stream.write(struct.pack(_block_header_fmt, log_signature, log_version, count))
+        out = self._out_buf
+        out_mv = memoryview(out)
+        cap = self._capacity
+        index = self._head - count
+        if index < 0:
+            index += cap
+        offs = 0
+        for _ in range(count):
+            sec, usec = self._to_absolute(self._ticks[index])
+            struct.pack_into(_record_fmt, out, offs, sec, usec, self._ids[index], self._payload[index])
+            offs += _record_size
+            if offs == len(out):
+                stream.write(out)
+                offs = 0
+            index += 1
+            if index == cap:
+                index = 0
+        if offs:
+            stream.write(out_mv[:offs])
+        self._count = 0
+        return count
@@ -1,5 +1,7 @@
+import time
 from collections import namedtuple
 from sensor_pack_2.base_sensor import check_value
+from sensor_pack_2.metrics import RTC_READS, RTC_WRITES, RTC_STOP_EVENTS, RTC_TEARS
 import micropython
 
 
@@ -38,7 +40,7 @@ def get_day_of_year(year: int, month: int, day: int, check: bool = False) -> int
             raise ValueError(f"Неверное значение или года: {year} или месяца: {month} или дня: {day}!")
     n1 = 275 * month // 9
     n2 = (month + 9) // 12
-    n3 = (1 + (year - 4 * year // 4 + 2) // 3)
+    n3 = (1 + (year - 4 * (year // 4) + 2) // 3)
     return n1 - (n2 * n3) + day - 30
 
 
@@ -59,6 +61,50 @@ rtc_alarm_time = namedtuple("rtc_alarm_time", _alarm_time_fields)
 _time_fields = "year month day hour min sec day_of_week day_of_year"
 rtc_time = namedtuple("rtc_time", _time_fields)
 
+# количество дней в месяцах не високосного года
+_days_in_month = 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31
+# количество дней в четырехлетнем цикле, первый год цикла - високосный (2000, 2004, ..., 2096)
+_days_in_4_years = 4 * 365 + 1
+
+
+def get_days_in_month(year: int, month: int) -> int:
+    """Возвращает количество дней в месяце month (1..12) года year (2000..2099)"""
+    if 2 == month and 0 == year % 4:
+        return 29
+    return _days_in_month[month - 1]
+
+
+def rtc_time_to_seconds(value: rtc_time) -> int:
+    """Возвращает количество секунд, прошедших с 2000-01-01 00:00:00 до момента value.
+    Поля day_of_week и day_of_year не используются!"""
+    year = value[0] - 2000
+    days = 365 * year + (year + 3) // 4 + get_day_of_year(value[0], value[1], value[2]) - 1
+    return 86400 * days + 3600 * value[3] + 60 * value[4] + value[5]
+
+
+def seconds_to_rtc_time(seconds: int) -> rtc_time:
+    """Обратное к rtc_time_to_seconds преобразование. seconds - количество секунд с 2000-01-01 00:00:00.
+    День недели 0..6, 0 - понедельник, как у time.localtime. 01.01.2000 - суббота(5)."""
+    days, sec = divmod(seconds, 86400)
+    cycle, rem = divmod(days, _days_in_4_years)
+    if rem < 366:
+        year_offs = 0
+    else:
+        year_offs = 1 + (rem - 366) // 365
+        rem = rem - 366 - 365 * (year_offs - 1)
+    year = 2000 + 4 * cycle + year_offs
+    day_of_year = 1 + rem
+    month = 1
+    dim = get_days_in_month(year, month)
+    while rem >= dim:
+        rem -= dim
+        month += 1
+        dim = get_days_in_month(year, month)
+    hour, sec = divmod(sec, 3600)
+    return rtc_time(year=year, month=month, day=1 + rem, hour=hour, min=sec // 60, sec=sec % 60,
+                    day_of_week=(days + 5) % 7, day_of_year=day_of_year)
+
+
 def check_alarm_time(_time: rtc_alarm_time, date_bit: int = 7):
     """Проверяет время тревоги на правильность. date_bit - номер бита-признака дня месяца.
     Если в поле date_day этот бит в 1, то это день месяца, иначе день недели!
@@ -115,8 +161,124 @@ def change_bit_by_flags(source: int, bit_numbers: [range, tuple[int,...]], flags
     return _src
 
 
+class FlagSet:
+    """Быстрая замена change_bit_by_flags для постоянного кортежа номеров битов.
+    Кортеж флагов преобразуется в пару масок (or_mask, and_mask) за один проход. Пары кэшируются по значению
+    кортежа флагов, поэтому изменение битов - две целочисленные операции: (source | or_mask) & and_mask.
+    Результат совпадает с change_bit_by_flags(source, bit_numbers, flags)."""
+    # наибольшее количество кэшированных пар масок. При переполнении кэш очищается
+    max_cached = 32
+
+    def __init__(self, bit_numbers: [range, tuple[int, ...]]):
+        """bit_numbers - номера битов, соответствующие элементам кортежей флагов, в порядке их следования."""
+        self._bit_numbers = tuple(bit_numbers)
+        self._cache = dict()
+
+    def get_masks(self, flags: tuple[[int, bool], ...]) -> tuple[int, int]:
+        """Возвращает кортеж (or_mask, and_mask) для флагов flags. Флаг None - бит не изменяется,
+        флаг, приводимый к Истина - бит устанавливается в 1, иначе - в 0."""
+        key = flags if isinstance(flags, tuple) else tuple(flags)
+        masks = self._cache.get(key)
+        if masks is None:
+            or_mask, and_mask = 0, -1
+            for bit, flag in zip(self._bit_numbers, key):
+                if flag is None:
+                    continue
+                if flag:
+                    or_mask |= 1 << bit
+                    and_mask |= 1 << bit
+                else:
+                    or_mask &= ~(1 << bit)
+                    and_mask &= ~(1 << bit)
+            if len(self._cache) >= self.max_cached:
+                self._cache.clear()
+            masks = or_mask, and_mask
+            self._cache[key] = masks
+        return masks
+
+    def apply(self, source: int, flags: tuple[[int, bool], ...]) -> int:
+        """Изменяет биты source в соответствии со значениями флагов flags. Возвращает результат, как int"""
+        or_mask, and_mask = self.get_masks(flags)
+        return (source | or_mask) & and_mask
+
+
+class StatusDecoder:
+    """Преобразует байт регистра состояния в именованный кортеж с флагами (bool).
+    Разобранные значения кэшируются (256 элементов, заполняются по мере обращения), поэтому повторное чтение
+    одного и того же значения регистра возвращает ОДИН И ТОТ ЖЕ(!) неизменяемый объект, без выделения памяти.
+    Объекты состояния можно сравнивать по идентичности (is), смотри метод same."""
+
+    def __init__(self, factory, bit_numbers: tuple[int, ...]):
+        """factory - тип именованного кортежа состояния, например status_ds3231.
+        bit_numbers - номера битов в регистре, соответствующие полям кортежа factory, в порядке их следования."""
+        self._factory = factory
+        self._bit_numbers = bit_numbers
+        # маска значащих битов. Значения регистра, отличающиеся только незначащими битами,
+        # отображаются в один и тот же объект!
+        _mask = 0
+        for bit in bit_numbers:
+            _mask |= 1 << bit
+        self._mask = _mask
+        self._cache = [None] * 256
+
+    def decode(self, raw: int):
+        """Возвращает именованный кортеж состояния для сырого значения регистра raw (0..255)"""
+        _raw = self._mask & raw
+        item = self._cache[_raw]
+        if item is None:
+            item = self._factory(*[bool(_raw & (1 << bit)) for bit in self._bit_numbers])
+            self._cache[_raw] = item
+        return item
+
+    @staticmethod
+    def same(first, second) -> bool:
+        """Возвращает Истина, если first и second - один и тот же объект состояния (flyweight).
+        Для объектов, полученных методом decode, это равносильно равенству значений всех флагов!"""
+        return first is second
+
+    def clear(self):
+        """Очищает кэш"""
+        _cache = self._cache
+        for index in range(len(_cache)):
+            _cache[index] = None
+
+
 class IRTC:
     """Интерфейс для RTC"""
+    # режим согласованного чтения времени (смотри get_time). Изменяйте у экземпляра: clock.consistent_read = True
+    consistent_read = False
+    # максимальное количество повторных чтений времени в режиме согласованного чтения.
+    # Значение меньше единицы действует как 1: хотя бы одно чтение для сравнения выполняется всегда
+    max_read_retries = 3
+    # статистика режима согласованного чтения: количество чтений времени, количество расхождений между
+    # последовательными чтениями (повторов), количество чтений, согласованность которых не достигнута.
+    # Атрибуты класса (нули) до первого увеличения, затем - атрибуты экземпляра
+    _read_count = 0
+    _tear_count = 0
+    _tear_unresolved = 0
+    # задержка фиксации времени в set_time_aligned относительно границы секунды, мкс. Смотри PCF8563!
+    aligned_commit_delay_us = 0
+    # реестр метрик (sensor_pack_2.metrics.MetricsRegistry) или None. Общий для всех драйверов: IRTC.metrics = registry
+    metrics = None
+
+    def _count(self, counter_id: int, n: int = 1):
+        """Увеличивает счетчик counter_id реестра метрик, если он подключен"""
+        m = self.metrics
+        if m is not None:
+            m.inc(counter_id, n)
+
+    def _observe(self, hist_id: int, value: [int, float]):
+        """Добавляет значение value в гистограмму hist_id реестра метрик, если он подключен"""
+        m = self.metrics
+        if m is not None:
+            m.observe(hist_id, value)
+
+    def _report_stop(self, event: bool) -> bool:
+        """Учитывает событие остановки генератора в метриках. Возвращает event. Для вызова из get_stop_event!"""
+        if event:
+            self._count(RTC_STOP_EVENTS)
+        return event
+
     def read_raw_time(self) -> bytearray:
         """Считывает время по шине, из чипа RTC, в буфер. Возвращает буфер с данными.
         Для переопределения в классе-наследнике!"""
@@ -139,14 +301,85 @@ class IRTC:
         raise NotImplemented
 
     def get_time(self) -> [None, rtc_time]:
-        """возвращает время"""
+        """возвращает время.
+        Если consistent_read в Истина, то время читается дважды, пока два последовательных чтения не совпадут
+        (не более max_read_retries повторов, но не менее одного). Это исключает 'разорванные' значения при переходе минуты/часа/суток
+        (например 23:59:59 -> 00:00:00) у микросхем без защелкивания регистров времени.
+        Статистику расхождений возвращает get_tear_stats."""
         _buf = self.read_raw_time()
+        self._count(RTC_READS)
+        if not self.consistent_read:
+            return self.raw_to_time(_buf)
+        self._read_count += 1
+        prev = self._get_aux_buf("_prev_tbuf", len(_buf))
+        for _ in range(max(1, self.max_read_retries)):
+            prev[:] = _buf
+            _buf = self.read_raw_time()
+            if prev == _buf:
+                break
+            self._tear_count += 1
+            self._count(RTC_TEARS)
+        else:
+            self._tear_unresolved += 1
         return self.raw_to_time(_buf)
 
+    def _get_aux_buf(self, name: str, size: int) -> bytearray:
+        """Возвращает вспомогательный буфер - атрибут экземпляра с именем name. Создается один раз, при первом
+        обращении."""
+        buf = getattr(self, name, None)
+        if buf is None or len(buf) != size:
+            buf = bytearray(size)
+            setattr(self, name, buf)
+        return buf
+
+    def get_tear_stats(self) -> tuple[int, int, int]:
+        """Возвращает кортеж (количество чтений времени, количество расхождений между последовательными чтениями,
+        количество чтений без достигнутой согласованности) в режиме согласованного чтения (consistent_read).
+        Счетчики - атрибуты класса (нули), пока не увеличены первый раз; после этого они становятся атрибутами
+        экземпляра, поэтому статистика у каждого экземпляра своя."""
+        return self._read_count, self._tear_count, self._tear_unresolved
+
+    def reset_tear_stats(self):
+        """Обнуляет статистику режима согласованного чтения"""
+        self._read_count = self._tear_count = self._tear_unresolved = 0
+
     def set_time(self, value: rtc_time):
         """устанавливает время"""
         _buf = self.time_to_raw(value)
         self.write_raw_time(_buf)
+        self._count(RTC_WRITES)
+
+    def set_time_aligned(self, value: [rtc_time, int], at_ticks_us: [int, None] = None) -> int:
+        """Устанавливает время value (rtc_time или секунды с 2000 года) точно в момент at_ticks_us (time.ticks_us),
+        обычно на границе секунды эталона, или сразу, если at_ticks_us is None.
+        Буфер времени подготавливается заранее, в нужный момент выполняется только запись по шине. Отсчет
+        долей секунды RTC начинается заново с момента записи (смотри _commit_aligned).
+        Возвращает опоздание записи относительно требуемого момента, мкс."""
+        src = value if not isinstance(value, int) else seconds_to_rtc_time(value)
+        raw = self.time_to_raw(src)
+        # копия: буфер time_to_raw может использоваться и для чтения времени
+        buf = self._get_aux_buf("_aligned_tbuf", len(raw))
+        buf[:] = raw
+        self._prepare_aligned(buf)
+        now = time.ticks_us()
+        deadline = now if at_ticks_us is None else time.ticks_add(at_ticks_us, self.aligned_commit_delay_us)
+        while time.ticks_diff(deadline, time.ticks_us()) > 0:
+            pass
+        late = time.ticks_diff(time.ticks_us(), deadline)
+        self._commit_aligned(buf)
+        self._count(RTC_WRITES)
+        return late
+
+    def _prepare_aligned(self, buf: bytearray):
+        """Подготовка к записи времени в set_time_aligned, до наступления требуемого момента.
+        Для переопределения в классе-наследнике!"""
+        pass
+
+    def _commit_aligned(self, buf: bytearray):
+        """Запись времени в set_time_aligned в требуемый момент. По умолчанию - запись буфера времени: у большинства
+        RTC (DS3231 и др.) запись регистра секунд сбрасывает счетчик долей секунды.
+        Для переопределения в классе-наследнике!"""
+        self.write_raw_time(buf)
 
     def get_stop_event(self, clear: bool = True) -> bool:
         """Возвращает Истина, если произошел сбой тактирования часов, что может говорить о неверном времени и
@@ -201,7 +434,11 @@ class IRTCwAlarms(IRTC):
         raise NotImplemented
 
     def set_alarm(self, alarm_time: [rtc_alarm_time, None], alarm_id: int = 0):
-        """устанавливает время срабатывания тревоги/'будильника'. alarm_id - номер 'будильника'"""
+        """устанавливает время срабатывания тревоги/'будильника'. alarm_id - номер 'будильника'.
+        Если alarm_time is None, то тревога отключается: ее прерывание запрещается (смотри enable_alarm)."""
+        if alarm_time is None:
+            self.enable_alarm(alarm_id, False)
+            return
         _buf = self.time_to_raw_alarm(alarm_time)
         self.write_raw_alarm(_buf, alarm_id)
 
@@ -233,3 +470,15 @@ class IRTCwAlarms(IRTC):
         Если clear в Истина, то сбрасывает флаг(и) тревог/будильника.
         _id - номер тревоги/будильника. От 0 до get_alarms_count() - 1."""
         raise NotImplemented
+
+    def get_alarm_flag(self, alarm_id: int = 0, clear: bool = True) -> bool:
+        """Возвращает Истина, если сработала тревога alarm_id. Если clear в Истина, то сбрасывает только ее флаг,
+        флаги других тревог не изменяются.
+        Для переопределения в классе-наследнике!"""
+        raise NotImplemented
+
+    def enable_alarm(self, alarm_id: int = 0, enable: bool = True):
+        """Включает или отключает прерывание (выход сигнала на вывод микросхемы) только тревоги alarm_id,
+        прерывания других тревог не изменяются.
+        Для переопределения в классе-наследнике!"""
+        raise NotImplemented
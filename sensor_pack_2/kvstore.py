@@ -0,0 +1,146 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Хранилище 'ключ-значение' в ОЗУ RTC с питанием от батареи (например MCP7940). Без записи во flash память MCU!"""
+
+import struct
+from sensor_pack_2.base_sensor import DeviceEx, check_value
+
+
+def _make_crc8_table(poly: int) -> bytes:
+    table = bytearray(256)
+    for index in range(256):
+        crc = index
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if 0x80 & crc else (crc << 1) & 0xFF
+        table[index] = crc
+    return bytes(table)
+
+
+# таблица CRC-8, полином 0x31 (x^8 + x^5 + x^4 + 1, Dallas/Maxim, Sensirion)
+_crc8_table = _make_crc8_table(0x31)
+
+
+def crc8(buf, start: int = 0, end: [int, None] = None, crc: int = 0xFF) -> int:
+    """Возвращает CRC-8 (полином 0x31, начальное значение crc) байт buf[start:end], без создания среза"""
+    table = _crc8_table
+    for index in range(start, len(buf) if end is None else end):
+        crc = table[crc ^ buf[index]]
+    return crc
+
+
+class RtcKVStore:
+    """Хранилище значений фиксированного размера в памяти устройства (ОЗУ RTC). Ключ - номер ячейки 0..len() - 1.
+    Каждая ячейка хранит две копии записи: ключ(1 байт), порядковый номер записи(1 байт), значение, CRC-8(1 байт).
+    Новое значение записывается на место старой (или поврежденной) копии, поэтому сбой питания во время записи
+    не разрушает последнее записанное значение (атомарная запись). При чтении выбирается самая новая копия
+    с правильной контрольной суммой. Обе копии читаются за одно обращение к шине!"""
+
+    def __init__(self, device: DeviceEx, base_addr: int, mem_size: int, value_size: int = 4):
+        """device - устройство, в памяти которого хранятся значения (метод read_buf_from_mem/write_buf_to_mem).
+        base_addr - адрес начала области памяти в устройстве, mem_size - размер области памяти, байт.
+        value_size - размер значения в байтах (1..32).
+        Например, для MCP7940: RtcKVStore(clock, 0x20, 64) дает 4 ячейки по 4 байта."""
+        check_value(value_size, range(1, 33), f"Неверный размер значения: {value_size}")
+        self._device = device
+        self._base_addr = base_addr
+        self._value_size = value_size
+        self._record_size = 3 + value_size
+        self._slot_size = 2 * self._record_size
+        self._slots = mem_size // self._slot_size
+        if not self._slots:
+            raise ValueError(f"Недостаточно памяти: {mem_size} байт")
+        self._slot_buf = bytearray(self._slot_size)    # обе копии записи
+        self._slot_mv = memoryview(self._slot_buf)
+        self._rec_buf = bytearray(self._record_size)   # для записи
+        self._int_buf = bytearray(4)
+
+    def __len__(self) -> int:
+        """Возвращает количество ячеек"""
+        return self._slots
+
+    @property
+    def value_size(self) -> int:
+        """Размер значения в байтах"""
+        return self._value_size
+
+    def _check_key(self, key: int):
+        check_value(key, range(self._slots), f"Неверный ключ: {key}")
+
+    def _get_addr(self, key: int) -> int:
+        return self._base_addr + key * self._slot_size
+
+    def _read_slot(self, key: int) -> tuple:
+        """Читает обе копии записи ячейки key. Возвращает смещение самой новой правильной копии в буфере ячейки,
+        смещение копии для следующей записи (старой или поврежденной) и порядковый номер самой новой записи
+        в виде кортежа. Если правильных копий нет, то первое смещение равно -1."""
+        buf = self._slot_buf
+        self._device.read_buf_from_mem(self._get_addr(key), buf)
+        rs = self._record_size
+        newest = -1
+        for offs in (0, rs):
+            if buf[offs] != key or crc8(buf, offs, offs + rs - 1) != buf[offs + rs - 1]:
+                continue
+            # порядковые номера сравниваются по модулю 256
+            if newest < 0 or 0 < (0xFF & (buf[offs + 1] - buf[newest + 1])) < 0x80:
+                newest = offs
+        if newest < 0:
+            return -1, 0, 0
+        return newest, rs - newest, buf[newest + 1]
+
+    def get(self, key: int, buf=None):
+        """Возвращает значение ячейки key или None, если правильного значения нет.
+        Если buf is None, то возвращается срез memoryview внутреннего буфера (действителен до следующего
+        обращения к хранилищу!), иначе значение копируется в buf, который и возвращается."""
+        self._check_key(key)
+        offs = self._read_slot(key)[0]
+        if offs < 0:
+            return None
+        value = self._slot_mv[offs + 2:offs + 2 + self._value_size]
+        if buf is None:
+            return value
+        buf[:] = value
+        return buf
+
+    def put(self, key: int, value):
+        """Записывает значение value (bytes, bytearray, memoryview длиной не более value_size) в ячейку key.
+        Недостающие байты заполняются нулями. Запись выполняется за одно обращение к шине."""
+        self._check_key(key)
+        vs = self._value_size
+        if len(value) > vs:
+            raise ValueError(f"Длина значения {len(value)} больше {vs}")
+        newest, target, seq = self._read_slot(key)
+        if newest < 0:
+            target = 0
+        rec = self._rec_buf
+        rec[0] = key
+        rec[1] = 0xFF & (seq + 1)
+        for index in range(vs):
+            rec[2 + index] = value[index] if index < len(value) else 0
+        rec[-1] = crc8(rec, 0, len(rec) - 1)
+        self._device.write_buf_to_mem(self._get_addr(key) + target, rec)
+
+    def get_int(self, key: int, default: [int, None] = None) -> [int, None]:
+        """Возвращает значение ячейки key как 32-х битное целое со знаком или default, если значения нет"""
+        value = self.get(key)
+        if value is None:
+            return default
+        buf = self._int_buf
+        for index in range(4):
+            buf[index] = value[index] if index < len(value) else 0
+        return struct.unpack("<i", buf)[0]
+
+    def put_int(self, key: int, value: int):
+        """Записывает в ячейку key 32-х битное целое со знаком (value_size должен быть не меньше 4)"""
+        if self._value_size < 4:
+            raise ValueError(f"Размер значения {self._value_size} меньше 4 байт")
+        struct.pack_into("<i", self._int_buf, 0, value)
+        self.put(key, self._int_buf)
+
+    def erase(self, key: int):
+        """Стирает обе копии записи ячейки key"""
+        self._check_key(key)
+        buf = self._slot_buf
+        for index in range(len(buf)):
+            buf[index] = 0
+        self._device.write_buf_to_mem(self._get_addr(key), buf)
@@ -0,0 +1,153 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Метрики качества часов и шины: счетчики и гистограммы с фиксированными корзинами в заранее созданных
+массивах. Обновление метрики - одна операция с элементом массива, без выделения памяти.
+Подключение ко всем драйверам сразу:
+    registry = MetricsRegistry()
+    IRTC.metrics = registry         # sensor_pack_2.irtc
+    BusAdapter.metrics = registry   # sensor_pack_2.bus_service"""
+
+import json
+import struct
+from array import array
+
+# идентификаторы стандартных счетчиков
+RTC_READS = 0           # чтений времени RTC
+RTC_WRITES = 1          # установок времени RTC
+RTC_STOP_EVENTS = 2     # обнаруженных событий остановки генератора RTC (get_stop_event)
+RTC_TEARS = 3           # расхождений между последовательными чтениями времени (IRTC.consistent_read)
+ALARM_MISSES = 4        # событий планировщика, обработанных с опозданием или пропущенных
+BUS_READS = 5           # операций чтения по шине
+BUS_WRITES = 6          # операций записи по шине
+BUS_ERRORS = 7          # ошибок шины (OSError)
+_std_counters = ("rtc_reads", "rtc_writes", "rtc_stop_events", "rtc_tears", "alarm_misses",
+                 "bus_reads", "bus_writes", "bus_errors")
+
+# идентификаторы стандартных гистограмм
+DRIFT_PPM = 0           # 'уход' RTC относительно эталона, ppm
+TEMPERATURE = 1         # температура микросхемы RTC, градусов Цельсия
+_std_histograms = (("drift_ppm", (-20, -10, -5, -2, -1, -0.5, 0, 0.5, 1, 2, 5, 10, 20)),
+                   ("temperature", (-20, -10, 0, 10, 20, 30, 40, 50, 60, 70)))
+
+# формат двоичного снимка (little endian): сигнатура b"MTR1", количество счетчиков (B), количество гистограмм (B),
+# значения счетчиков (i), для каждой гистограммы: количество корзин (B), значения корзин (I).
+# Имена и границы корзин в двоичный снимок не входят, смотри to_json.
+_signature = b"MTR1"
+
+
+class MetricsRegistry:
+    """Реестр метрик: счетчики (int со знаком) и гистограммы. Стандартные метрики (RTC_READS, DRIFT_PPM и др.)
+    регистрируются при создании реестра. Метрика идентифицируется номером, который возвращают методы
+    counter и histogram; обновление метрики по номеру не ищет ее имя."""
+
+    def __init__(self, max_counters: int = 16, max_histograms: int = 4, max_buckets: int = 16):
+        """max_counters, max_histograms - наибольшее количество счетчиков и гистограмм.
+        max_buckets - наибольшее количество корзин гистограммы (границ + 1)."""
+        self._counters = array("l", [0] * max_counters)
+        self._counter_names = []
+        self._max_buckets = max_buckets
+        self._buckets = array("L", [0] * (max_histograms * max_buckets))
+        self._hist_names = []
+        self._hist_bounds = []
+        for name in _std_counters:
+            self.counter(name)
+        for name, bounds in _std_histograms:
+            self.histogram(name, bounds)
+
+    def counter(self, name: str) -> int:
+        """Регистрирует счетчик name (если его нет) и возвращает его номер"""
+        names = self._counter_names
+        if name in names:
+            return names.index(name)
+        if len(names) == len(self._counters):
+            raise ValueError(f"Нет места для счетчика: {name}")
+        names.append(name)
+        return len(names) - 1
+
+    def histogram(self, name: str, bounds: tuple) -> int:
+        """Регистрирует гистограмму name с возрастающими границами корзин bounds (если ее нет) и возвращает ее номер.
+        Значение v попадает в корзину i, если bounds[i - 1] <= v < bounds[i]; корзин на одну больше, чем границ."""
+        names = self._hist_names
+        if name in names:
+            return names.index(name)
+        if len(names) == len(self._buckets) // self._max_buckets:
+            raise ValueError(f"Нет места для гистограммы: {name}")
+        if len(bounds) >= self._max_buckets:
+            raise ValueError(f"Слишком много границ корзин: {len(bounds)}")
+        names.append(name)
+        self._hist_bounds.append(tuple(bounds))
+        return len(names) - 1
+
+    def inc(self, counter_id: int, n: int = 1):
+        """Увеличивает счетчик counter_id на n"""
+        self._counters[counter_id] += n
+
+    def set(self, counter_id: int, value: int):
+        """Устанавливает значение счетчика counter_id (для метрик-'датчиков')"""
+        self._counters[counter_id] = value
+
+    def get(self, counter_id: int) -> int:
+        return self._counters[counter_id]
+
+    def observe(self, hist_id: int, value: [int, float]):
+        """Добавляет значение value в гистограмму hist_id"""
+        index = 0
+        for bound in self._hist_bounds[hist_id]:
+            if value < bound:
+                break
+            index += 1
+        self._buckets[hist_id * self._max_buckets + index] += 1
+
+    def get_buckets(self, hist_id: int) -> list:
+        """Возвращает список значений корзин гистограммы hist_id"""
+        base = hist_id * self._max_buckets
+        return list(self._buckets[base:base + 1 + len(self._hist_bounds[hist_id])])
+
+    def reset(self):
+        """Обнуляет все метрики"""
+        for index in range(len(self._counters)):
+            self._counters[index] = 0
+        for index in range(len(self._buckets)):
+            self._buckets[index] = 0
+
+    def snapshot(self) -> dict:
+        """Возвращает снимок метрик: {имя счетчика: значение, имя гистограммы: {"bounds": ..., "counts": ...}}"""
+        result = {}
+        for index, name in enumerate(self._counter_names):
+            result[name] = self._counters[index]
+        for index, name in enumerate(self._hist_names):
+            result[name] = {"bounds": list(self._hist_bounds[index]), "counts": self.get_buckets(index)}
+        return result
+
+    def to_json(self) -> str:
+        """Возвращает снимок метрик в формате JSON"""
+        return json.dumps(self.snapshot())
+
+    def get_export_size(self) -> int:
+        """Возвращает размер двоичного снимка в байтах"""
+        size = 6 + 4 * len(self._counter_names)
+        for bounds in self._hist_bounds:
+            size += 1 + 4 * (1 + len(bounds))
+        return size
+
+    def export(self, buf: [bytearray, None] = None):
+        """Записывает двоичный снимок метрик в buf (длиной не меньше get_export_size) или в новый bytearray.
+        Возвращает buf."""
+        if buf is None:
+            buf = bytearray(self.get_export_size())
+        n_cnt, n_hist = len(self._counter_names), len(self._hist_names)
+        struct.pack_into("<4sBB", buf, 0, _signature, n_cnt, n_hist)
+        offs = 6
+        for index in range(n_cnt):
+            struct.pack_into("<i", buf, offs, self._counters[index])
+            offs += 4
+        for hist_id in range(n_hist):
+            count = 1 + len(self._hist_bounds[hist_id])
+            buf[offs] = count
+            offs += 1
+            base = hist_id * self._max_buckets
+            for index in range(count):
+                struct.pack_into("<I", buf, offs, self._buckets[base + index])
+                offs += 4
+        return buf
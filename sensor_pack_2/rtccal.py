@@ -0,0 +1,193 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Автоматическая подстройка частоты генератора RTC (регистр aging offset) по эталонному источнику времени"""
+
+import time
+import json
+from collections import namedtuple
+from machine import Pin
+from sensor_pack_2.irtc import IRTC, rtc_time_to_seconds
+from sensor_pack_2.metrics import DRIFT_PPM
+
+# результат одного окна измерения 'ухода' часов
+# drift_ppm - уход частоты RTC относительно эталона, ppm. Больше нуля - часы спешат, меньше нуля - отстают
+# temperature - температура микросхемы RTC, градусов Цельсия, или None
+# offset - значение регистра подстройки, которое действовало во время измерения
+# new_offset - новое значение регистра подстройки
+drift_estimate = namedtuple("drift_estimate", "drift_ppm temperature offset new_offset")
+
+
+def wait_rtc_edge(clock: IRTC, timeout_ms: int = 1500, poll_us: int = 500) -> [tuple, None]:
+    """Ожидает смены секунды в RTC. Возвращает кортеж (секунды с 2000 года, time.ticks_us момента смены секунды)
+    или None по истечении timeout_ms. Точность определения момента смены секунды - около poll_us мкс плюс
+    время чтения времени по шине."""
+    buf = clock.read_raw_time()
+    first = 0x7F & buf[0]   # байт секунд. Старший бит у некоторых RTC - флаг!
+    start = time.ticks_ms()
+    while True:
+        time.sleep_us(poll_us)
+        buf = clock.read_raw_time()
+        ticks = time.ticks_us()
+        if first != 0x7F & buf[0]:
+            return rtc_time_to_seconds(clock.raw_to_time(buf)), ticks
+        if time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+            return None
+
+
+class PpsReference:
+    """Эталон времени по секундным импульсам (PPS) GPS приемника. Каждый импульс - ровно одна секунда.
+    Абсолютное время не требуется, для измерения 'ухода' достаточно счета импульсов!"""
+
+    def __init__(self, pin: Pin, trigger: int = Pin.IRQ_RISING):
+        self._pin = pin
+        self._count = 0
+        self._ticks = 0
+        pin.irq(trigger=trigger, handler=self._handler)
+
+    def _handler(self, pin):
+        self._ticks = time.ticks_us()
+        self._count += 1
+
+    def get_reference(self) -> [tuple, None]:
+        """Возвращает кортеж (секунды, time.ticks_us) последнего импульса или None, если импульсов не было"""
+        count = self._count
+        if not count:
+            return None
+        return count, self._ticks
+
+
+class HostReference:
+    """Эталон времени от внешнего источника (компьютер, сервер). Метки времени передаются методом update."""
+
+    def __init__(self):
+        self._ref = None
+
+    def update(self, seconds: int, ticks_us: [int, None] = None):
+        """seconds - эталонное время, целое количество секунд (с любой точкой отсчета!).
+        ticks_us - значение time.ticks_us в момент начала этой секунды. Если None, то текущее."""
+        self._ref = seconds, time.ticks_us() if ticks_us is None else ticks_us
+
+    def get_reference(self) -> [tuple, None]:
+        """Возвращает кортеж (секунды, time.ticks_us) последней метки времени или None"""
+        return self._ref
+
+
+class AgingCalibrator:
+    """Измеряет 'уход' RTC относительно эталона в окне заданной длительности, вычисляет новое значение регистра
+    подстройки частоты генератора (aging offset) и записывает его в RTC (замкнутый контур).
+    Найденные значения регистра запоминаются для диапазонов(корзин) температуры и могут сохраняться в файл.
+    clock - RTC с методами get_aging_offset, set_aging_offset и, необязательно, get_temperature (DS3221).
+    reference - эталон времени с методом get_reference (PpsReference, HostReference).
+    window_s - длительность окна измерения, секунд. Чем оно больше, тем точнее оценка!
+    ppm_per_lsb - изменение частоты RTC, ppm, при увеличении регистра подстройки на единицу.
+    Для DS3231 около -0.1 ppm (положительные значения замедляют генератор).
+    offset_range - допустимый диапазон значений регистра подстройки.
+    temp_bin - ширина диапазона(корзины) температуры, градусов Цельсия.
+    gain - коэффициент усиления контура (0..1]. Меньшие значения - медленнее, но устойчивее подстройка."""
+
+    def __init__(self, clock: IRTC, reference, window_s: int = 3600, ppm_per_lsb: float = -0.1,
+                 offset_range: range = range(-128, 128), temp_bin: int = 5, gain: float = 0.8):
+        if window_s < 10 or temp_bin < 1 or not 0 < gain <= 1:
+            raise ValueError(f"Неверный параметр! window_s: {window_s}; temp_bin: {temp_bin}; gain: {gain}")
+        self._clock = clock
+        self._reference = reference
+        self._window_us = 1_000_000 * window_s
+        self._ppm_per_lsb = ppm_per_lsb
+        self._offset_range = offset_range
+        self._temp_bin = temp_bin
+        self._gain = gain
+        # начало окна: (эталонное время, мкс; разность RTC - эталон, мкс)
+        self._start = None
+        # найденные значения регистра подстройки: номер корзины температуры -> значение регистра
+        self._curve = dict()
+
+    def _has_temperature(self) -> bool:
+        return hasattr(self._clock, "get_temperature")
+
+    def _get_bin(self, temperature: [float, None]) -> [int, None]:
+        if temperature is None:
+            return None
+        return int(temperature // self._temp_bin)
+
+    def observe(self) -> [tuple, None]:
+        """Сравнивает RTC с эталоном в момент смены секунды RTC.
+        Возвращает кортеж (эталонное время, мкс; разность RTC - эталон, мкс) или None, если эталона нет."""
+        edge = wait_rtc_edge(self._clock)
+        ref = self._reference.get_reference()
+        if edge is None or ref is None:
+            return None
+        rtc_sec, edge_ticks = edge
+        ref_sec, ref_ticks = ref
+        ref_us = 1_000_000 * ref_sec + time.ticks_diff(edge_ticks, ref_ticks)
+        return ref_us, 1_000_000 * rtc_sec - ref_us
+
+    def restart(self):
+        """Начинает новое окно измерения"""
+        self._start = None
+
+    def update(self) -> [drift_estimate, None]:
+        """Вызывайте периодически (например раз в несколько минут). Возвращает drift_estimate, если окно измерения
+        закончилось и регистр подстройки был скорректирован, иначе None."""
+        obs = self.observe()
+        if obs is None:
+            return None
+        if self._start is None:
+            self._start = obs
+            return None
+        elapsed_us = obs[0] - self._start[0]
+        if elapsed_us < self._window_us:
+            return None
+        drift_ppm = 1_000_000 * (obs[1] - self._start[1]) / elapsed_us
+        self._start = obs
+        return self._correct(drift_ppm)
+
+    def _correct(self, drift_ppm: float) -> drift_estimate:
+        clock = self._clock
+        registry = IRTC.metrics     # общий реестр метрик, clock может быть и не наследником IRTC
+        if registry is not None:
+            registry.observe(DRIFT_PPM, drift_ppm)
+        temperature = clock.get_temperature() if self._has_temperature() else None
+        offset = clock.get_aging_offset()
+        # изменение частоты RTC, требуемое для компенсации ухода: -drift_ppm
+        delta = round(-self._gain * drift_ppm / self._ppm_per_lsb)
+        rng = self._offset_range
+        new_offset = min(max(offset + delta, rng.start), rng.stop - 1)
+        if new_offset != offset:
+            clock.set_aging_offset(new_offset)
+            # после изменения частоты генератора, измерение начинается заново
+            self._start = None
+        t_bin = self._get_bin(temperature)
+        if t_bin is not None:
+            self._curve[t_bin] = new_offset
+        return drift_estimate(drift_ppm=drift_ppm, temperature=temperature, offset=offset, new_offset=new_offset)
+
+    def apply_curve(self) -> [int, None]:
+        """Записывает в RTC значение регистра подстройки, найденное ранее для текущей температуры.
+        Возвращает записанное значение или None, если для текущей температуры значения нет."""
+        if not self._has_temperature():
+            return None
+        offset = self._curve.get(self._get_bin(self._clock.get_temperature()))
+        if offset is not None and offset != self._clock.get_aging_offset():
+            self._clock.set_aging_offset(offset)
+            self._start = None
+        return offset
+
+    @property
+    def curve(self) -> dict:
+        """Найденные значения регистра подстройки: номер корзины температуры -> значение регистра.
+        Корзина b содержит температуры от b * temp_bin до (b + 1) * temp_bin градусов Цельсия."""
+        return self._curve
+
+    def save(self, file_name: str):
+        """Сохраняет найденные значения регистра подстройки в файл (JSON)"""
+        with open(file_name, "w") as f:
+            json.dump({"temp_bin": self._temp_bin, "curve": [[k, v] for k, v in self._curve.items()]}, f)
+
+    def load(self, file_name: str):
+        """Загружает значения регистра подстройки из файла, созданного методом save"""
+        with open(file_name) as f:
+            data = json.load(f)
+        if data["temp_bin"] != self._temp_bin:
+            raise ValueError(f"Неверная ширина корзины температуры в файле: {data['temp_bin']}")
+        self._curve = {k: v for k, v in data["curve"]}
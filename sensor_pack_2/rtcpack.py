@@ -0,0 +1,140 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Компактное двоичное представление rtc_time и rtc_alarm_time для хранения и передачи по UART/радио.
+Все форматы - little endian."""
+
+import struct
+from array import array
+try:
+    import uctypes
+except ImportError:     # CPython, смотри _byte_view
+    uctypes = None
+from sensor_pack_2.irtc import rtc_time, rtc_alarm_time, rtc_time_to_seconds, seconds_to_rtc_time
+
+# размеры упакованных значений, байт
+time32_size = 4     # секунды с 2000-01-01 00:00:00
+time40_size = 5     # сотые доли секунды с 2000-01-01 00:00:00 (хватает на 348 лет)
+alarm_size = 3      # date_day, hour, min; 0xFF - поле запрещено (None)
+# значение поля упакованной тревоги, соответствующее None
+_alarm_none = 0xFF
+# тип элемента TimestampArray - 4 байта без знака. "L" - 8 байт на 64-битных платформах!
+_ts_typecode = "I" if 4 == struct.calcsize("I") else "L"
+
+
+def _to_seconds(value: [int, rtc_time]) -> int:
+    return value if isinstance(value, int) else rtc_time_to_seconds(value)
+
+
+def pack_time32_into(value: [int, rtc_time], buf, offset: int = 0) -> int:
+    """Записывает время value (rtc_time или секунды с 2000 года) в buf по смещению offset, 4 байта.
+    Возвращает смещение за упакованным значением."""
+    struct.pack_into("<I", buf, offset, _to_seconds(value))
+    return offset + time32_size
+
+
+def unpack_time32_from(buf, offset: int = 0, as_tuple: bool = False) -> [int, rtc_time]:
+    """Возвращает время, упакованное функцией pack_time32_into: секунды с 2000 года или rtc_time,
+    если as_tuple в Истина"""
+    seconds = struct.unpack_from("<I", buf, offset)[0]
+    return seconds_to_rtc_time(seconds) if as_tuple else seconds
+
+
+def pack_time40_into(value: [int, rtc_time], centiseconds: int, buf, offset: int = 0) -> int:
+    """Записывает время value (rtc_time или секунды с 2000 года) с сотыми долями секунды centiseconds (0..99)
+    в buf по смещению offset, 5 байт. Возвращает смещение за упакованным значением."""
+    if not 0 <= centiseconds < 100:
+        raise ValueError(f"Неверное значение сотых долей секунды: {centiseconds}")
+    total = 100 * _to_seconds(value) + centiseconds
+    struct.pack_into("<IB", buf, offset, 0xFFFF_FFFF & total, total >> 32)
+    return offset + time40_size
+
+
+def unpack_time40_from(buf, offset: int = 0) -> tuple[int, int]:
+    """Возвращает кортеж (секунды с 2000 года, сотые доли секунды), упакованный функцией pack_time40_into"""
+    low, high = struct.unpack_from("<IB", buf, offset)
+    return divmod((high << 32) | low, 100)
+
+
+def pack_alarm_into(value: rtc_alarm_time, buf, offset: int = 0) -> int:
+    """Записывает время тревоги value в buf по смещению offset, 3 байта. Поля в None записываются как 0xFF.
+    Возвращает смещение за упакованным значением."""
+    for index in range(alarm_size):
+        item = value[index]
+        buf[offset + index] = _alarm_none if item is None else item
+    return offset + alarm_size
+
+
+def unpack_alarm_from(buf, offset: int = 0) -> rtc_alarm_time:
+    """Возвращает время тревоги, упакованное функцией pack_alarm_into"""
+    items = [None if _alarm_none == buf[offset + index] else buf[offset + index] for index in range(alarm_size)]
+    return rtc_alarm_time(*items)
+
+
+def _byte_view(data: array):
+    """Возвращает изменяемое байтовое представление массива data, без копирования"""
+    if uctypes is None:
+        return memoryview(data).cast("B")
+    return uctypes.bytearray_at(uctypes.addressof(data), len(data) * struct.calcsize(_ts_typecode))
+
+
+class TimestampArray:
+    """Контейнер для множества меток времени (секунды с 2000 года) в виде массива 32-битных целых без знака
+    заранее заданной емкости. 4 байта на метку времени вместо кортежа rtc_time из 8 элементов. Упакованные
+    метки можно передать (as_bytes) или загрузить (load) одной операцией, без преобразования каждой из них."""
+
+    def __init__(self, capacity: int):
+        """capacity - емкость контейнера (максимальное количество меток времени)"""
+        if capacity < 1:
+            raise ValueError(f"Неверная емкость: {capacity}")
+        if time32_size != struct.calcsize(_ts_typecode):
+            raise ValueError(f"Нет 32-битного типа элемента массива: {_ts_typecode}")
+        self._data = array(_ts_typecode, [0] * capacity)
+        self._raw = _byte_view(self._data)
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: int) -> int:
+        """Возвращает метку времени index в секундах с 2000 года"""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(f"Неверный индекс: {index}")
+        return self._data[index]
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def append(self, value: [int, rtc_time]):
+        """Добавляет метку времени value (rtc_time или секунды с 2000 года)"""
+        if self._len == len(self._data):
+            raise IndexError("Контейнер заполнен!")
+        self._data[self._len] = _to_seconds(value)
+        self._len += 1
+
+    def get_time(self, index: int) -> rtc_time:
+        """Возвращает метку времени index в виде rtc_time"""
+        return seconds_to_rtc_time(self[index])
+
+    def clear(self):
+        self._len = 0
+
+    def as_bytes(self) -> memoryview:
+        """Возвращает memoryview байтов меток времени без копирования, для передачи методом write потока
+        (UART, файл). На MCU (little endian) это 4 байта на метку, как у pack_time32_into.
+        Действителен до следующего изменения контейнера!"""
+        return memoryview(self._raw)[:time32_size * self._len]
+
+    def load(self, buf, offset: int = 0, count: [int, None] = None) -> int:
+        """Загружает count (или сколько поместится) упакованных меток времени из buf по смещению offset,
+        заменяя содержимое контейнера. Возвращает количество загруженных меток."""
+        avail = (len(buf) - offset) // time32_size
+        n = min(avail if count is None else count, len(self._data))
+        size = time32_size * n
+        # копирование одной операцией. Порядок байт MCU - little endian, как у pack_time32_into
+        self._raw[:size] = memoryview(buf)[offset:offset + size]
+        self._len = n
+        return n
@@ -0,0 +1,204 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Резервирование часов реального времени: два RTC (например DS3231 и PCF8563 на одной шине) с взаимной
+проверкой, выбором верного источника, фоновой синхронизацией и мгновенным переключением при ошибках шины"""
+
+import time
+from sensor_pack_2.irtc import IRTC, rtc_time, rtc_time_to_seconds
+from sensor_pack_2.base_sensor import Iterator
+
+
+class RedundantClock(IRTC, Iterator):
+    """RTC из двух RTC. Время читается только из активных часов, поэтому задержка чтения как у одних часов.
+    Раз в check_period_ms (или при вызове check) времена обоих часов сравниваются. Если они различаются более
+    чем на max_diff секунд, то неверными считаются часы с событием остановки (get_stop_event), а если таких нет
+    или они у обоих, то менее точные часы (secondary). Неверные часы синхронизируются методом service.
+    При ошибке шины (OSError) активные часы сразу заменяются резервными, неисправные часы проверяются
+    методом service."""
+
+    def __init__(self, primary: IRTC, secondary: IRTC, max_diff: int = 2, check_period_ms: int = 60_000):
+        """primary - более точные часы (например DS3231 с термокомпенсацией), secondary - резервные часы.
+        max_diff - допустимое расхождение часов в секундах.
+        check_period_ms - период взаимной проверки часов в мс или 0, тогда проверка только методом check."""
+        self._clocks = primary, secondary
+        self._max_diff = max_diff
+        self._check_period_ms = check_period_ms
+        self._active = 0
+        # флаги по индексу часов: часы неисправны (ошибка шины), часы требуют синхронизации
+        self._failed = [False, False]
+        self._need_sync = [False, False]
+        self._last_check = time.ticks_ms()
+        # статистика
+        self._failovers = 0
+        self._mismatches = 0
+
+    @property
+    def active(self) -> int:
+        """Индекс активных часов: 0 - primary, 1 - secondary"""
+        return self._active
+
+    @property
+    def failovers(self) -> int:
+        """Количество переключений на резервные часы из-за ошибок шины"""
+        return self._failovers
+
+    @property
+    def mismatches(self) -> int:
+        """Количество обнаруженных расхождений времени часов"""
+        return self._mismatches
+
+    def get_clock(self, index: int) -> IRTC:
+        return self._clocks[index]
+
+    def is_failed(self, index: int) -> bool:
+        return self._failed[index]
+
+    def _fail(self, index: int):
+        """Отмечает часы index как неисправные и, если они активны, переключается на другие часы"""
+        self._failed[index] = True
+        self._need_sync[index] = True
+        other = 1 - index
+        if self._active == index and not self._failed[other]:
+            self._active = other
+            self._failovers += 1
+
+    def _read(self, index: int) -> [rtc_time, None]:
+        """Читает время часов index. При ошибке шины возвращает None и отмечает часы как неисправные"""
+        try:
+            return self._clocks[index].get_time()
+        except OSError:
+            self._fail(index)
+            return None
+
+    def _has_stop_event(self, index: int) -> [bool, None]:
+        try:
+            return self._clocks[index].get_stop_event(clear=False)
+        except OSError:
+            self._fail(index)
+            return None
+
+    def get_time(self) -> rtc_time:
+        """Возвращает время активных часов. Периодически выполняет взаимную проверку часов.
+        Если неисправны оба часов, то возбуждается OSError."""
+        if self._check_period_ms and time.ticks_diff(time.ticks_ms(), self._last_check) >= self._check_period_ms:
+            self.check()
+        for _ in range(2):
+            index = self._active
+            value = self._read(index)
+            if value is not None:
+                return value
+            if self._active == index:
+                break
+        raise OSError("Оба RTC неисправны!")
+
+    def set_time(self, value: rtc_time):
+        """Устанавливает время обоих часов. Часы с ошибкой шины будут синхронизированы методом service."""
+        ok = False
+        for index in range(2):
+            if self._set_clock(index, value) is not None:
+                ok = True
+        if not ok:
+            raise OSError("Оба RTC неисправны!")
+
+    def set_time_aligned(self, value: [rtc_time, int], at_ticks_us: [int, None] = None) -> int:
+        """Устанавливает время value (rtc_time или секунды с 2000 года) обоих часов в момент at_ticks_us
+        методом set_time_aligned каждых часов. Первыми записываются часы с меньшей задержкой фиксации
+        (aligned_commit_delay_us), вторые - сразу после них, поэтому их опоздание больше.
+        Часы с ошибкой шины будут синхронизированы методом service.
+        Возвращает наибольшее опоздание записи, мкс."""
+        clocks = self._clocks
+        order = (0, 1) if clocks[0].aligned_commit_delay_us <= clocks[1].aligned_commit_delay_us else (1, 0)
+        late = None
+        for index in order:
+            result = self._set_clock(index, value, at_ticks_us, True)
+            if result is not None:
+                late = result if late is None else max(late, result)
+        if late is None:
+            raise OSError("Оба RTC неисправны!")
+        return late
+
+    def _set_clock(self, index: int, value: [rtc_time, int], at_ticks_us: [int, None] = None,
+                   aligned: bool = False) -> [int, None]:
+        """Устанавливает время часов index (set_time или, если aligned в Истина, set_time_aligned) и сбрасывает
+        их событие остановки. Возвращает опоздание записи, мкс (0 для set_time), или None при ошибке шины."""
+        clock = self._clocks[index]
+        late = 0
+        try:
+            if aligned:
+                late = clock.set_time_aligned(value, at_ticks_us)
+            else:
+                clock.set_time(value)
+            clock.get_stop_event(clear=True)
+        except OSError:
+            self._fail(index)
+            return None
+        self._failed[index] = False
+        self._need_sync[index] = False
+        return late
+
+    def check(self) -> bool:
+        """Взаимная проверка часов. Возвращает Истина, если времена часов совпадают (с точностью до max_diff).
+        Расхождение отмечает неверные часы для синхронизации методом service, при необходимости
+        активными становятся верные часы."""
+        self._last_check = time.ticks_ms()
+        if self._failed[0] or self._failed[1]:
+            return False
+        stops = self._has_stop_event(0), self._has_stop_event(1)
+        times = self._read(0), self._read(1)
+        if None in stops or None in times:
+            return False
+        if abs(rtc_time_to_seconds(times[0]) - rtc_time_to_seconds(times[1])) <= self._max_diff \
+                and not (stops[0] or stops[1]):
+            return True
+        self._mismatches += 1
+        # неверные часы: с событием остановки, иначе менее точные
+        wrong = 0 if stops[0] and not stops[1] else 1
+        self._need_sync[wrong] = True
+        self._active = 1 - wrong
+        return False
+
+    def service(self) -> int:
+        """Фоновая работа, вызывайте периодически (например в главном цикле): синхронизирует неверные часы по
+        активным и проверяет неисправные часы. Возвращает количество синхронизированных часов."""
+        synced = 0
+        for index in range(2):
+            if not self._need_sync[index]:
+                continue
+            source = self._active
+            if source == index:
+                # активные часы неверны/неисправны, а других нет
+                continue
+            value = self._read(source)
+            if value is None:
+                break
+            if self._set_clock(index, value) is not None:
+                synced += 1
+                if 0 == index:
+                    self._active = 0    # более точные часы снова верны
+        return synced
+
+    def get_stop_event(self, clear: bool = True) -> bool:
+        """Возвращает Истина, если событие остановки есть у обоих часов (верного времени нет).
+        Если событие остановки только у активных часов, то активными становятся другие часы."""
+        if self.check():
+            return False
+        index = self._active
+        stop = self._has_stop_event(index)
+        if stop is None:
+            return True
+        if stop and clear:
+            self._clocks[index].get_stop_event(clear=True)
+        return stop
+
+    def get_status(self, raw: bool = True) -> [int, tuple]:
+        """Возвращает состояние активных часов"""
+        return self._clocks[self._active].get_status(raw)
+
+    def get_control(self, raw: bool = True) -> [int, tuple]:
+        """Возвращает содержимое регистра управления активных часов"""
+        return self._clocks[self._active].get_control(raw)
+
+    def __next__(self) -> rtc_time:
+        """For support iterating."""
+        return self.get_time()
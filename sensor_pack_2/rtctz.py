@@ -0,0 +1,182 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Часовой пояс и летнее время. RTC хранит время UTC, местное время вычисляется по таблице переходов,
+заранее созданной на компьютере из базы tzdata (смотри tools/tzblob.py)"""
+
+import struct
+from array import array
+from sensor_pack_2.irtc import (IRTC, IRTCwAlarms, rtc_time, rtc_alarm_time, rtc_time_to_seconds,
+                                seconds_to_rtc_time)
+from sensor_pack_2.alarmcalc import get_next_fire_time
+from sensor_pack_2.base_sensor import Iterator
+
+# формат таблицы переходов (little endian):
+#   заголовок:  сигнатура b"TZT1", количество переходов (H), смещение UTC до первого перехода в секундах (i)
+#   переход:    момент перехода, секунды UTC с 2000-01-01 (I), смещение UTC после перехода в секундах (i)
+_header_fmt = "<4sHi"
+_header_size = struct.calcsize(_header_fmt)
+_transition_fmt = "<Ii"
+_transition_size = struct.calcsize(_transition_fmt)
+tz_signature = b"TZT1"
+
+
+class TimeZone:
+    """Часовой пояс с таблицей переходов (летнее/зимнее время). Поиск смещения UTC - двоичный, O(log n),
+    без выделения памяти: таблица хранится в двух массивах array."""
+
+    def __init__(self, blob: [bytes, None] = None, offset: int = 0):
+        """blob - таблица переходов (содержимое файла, созданного tools/tzblob.py) или None, тогда часовой
+        пояс без переходов со смещением UTC offset секунд (например 3 * 3600 для UTC+3)."""
+        if blob is None:
+            self._initial = offset
+            self._times = array("L")
+            self._offsets = array("l")
+            return
+        signature, count, initial = struct.unpack_from(_header_fmt, blob, 0)
+        if tz_signature != signature or len(blob) < _header_size + count * _transition_size:
+            raise ValueError("Неверная таблица переходов часового пояса!")
+        self._initial = initial
+        self._times = array("L", [0] * count)
+        self._offsets = array("l", [0] * count)
+        for index in range(count):
+            self._times[index], self._offsets[index] = struct.unpack_from(
+                _transition_fmt, blob, _header_size + index * _transition_size)
+
+    @staticmethod
+    def from_file(name: str) -> "TimeZone":
+        """Загружает таблицу переходов из файла name"""
+        with open(name, "rb") as f:
+            return TimeZone(f.read())
+
+    def __len__(self) -> int:
+        """Возвращает количество переходов в таблице"""
+        return len(self._times)
+
+    def _find(self, utc_seconds: int) -> int:
+        """Возвращает индекс последнего перехода, не позднее utc_seconds, или -1"""
+        times = self._times
+        lo, hi = 0, len(times)
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if times[mid] <= utc_seconds:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def utc_offset(self, utc_seconds: int) -> int:
+        """Возвращает смещение местного времени относительно UTC в секундах в момент utc_seconds
+        (секунды UTC с 2000 года)"""
+        index = self._find(utc_seconds)
+        return self._initial if index < 0 else self._offsets[index]
+
+    def next_transition(self, utc_seconds: int) -> [int, None]:
+        """Возвращает момент следующего после utc_seconds перехода (секунды UTC с 2000 года) или None.
+        В этот момент нужно перепрограммировать периодические тревоги, заданные в местном времени!"""
+        index = 1 + self._find(utc_seconds)
+        return self._times[index] if index < len(self._times) else None
+
+    def to_local(self, utc_seconds: int) -> int:
+        """Преобразует секунды UTC в секунды местного времени (с 2000 года)"""
+        return utc_seconds + self.utc_offset(utc_seconds)
+
+    def to_utc(self, local_seconds: int) -> int:
+        """Преобразует секунды местного времени в секунды UTC (с 2000 года). Для несуществующего (при переводе
+        часов вперед) и неоднозначного (при переводе часов назад) местного времени результат - одно из
+        возможных значений!"""
+        utc = local_seconds - self.utc_offset(local_seconds)
+        return local_seconds - self.utc_offset(utc)
+
+
+def _convert_alarm(alarm: [rtc_alarm_time, None], after: int, convert) -> [rtc_alarm_time, None]:
+    """Переводит тревогу alarm в другую шкалу времени. after - текущее время в шкале alarm,
+    convert - функция перевода секунд в новую шкалу. Значение поля date_day (день недели/месяца)
+    и поля в None сохраняют свой смысл."""
+    if alarm is None:
+        return None
+    fire = get_next_fire_time(alarm, after)
+    if fire is None:
+        raise ValueError(f"Тревога не наступит: {alarm}")
+    t = seconds_to_rtc_time(convert(fire))
+    date_day = alarm.date_day
+    if date_day is not None:
+        # 0x80 - признак дня месяца, смотри irtc.check_alarm_time
+        date_day = 0x80 | t.day if 0x80 & date_day else t.day_of_week
+    return rtc_alarm_time(date_day=date_day, hour=None if alarm.hour is None else t.hour,
+                          min=None if alarm.min is None else t.min)
+
+
+class LocalClock(IRTCwAlarms, Iterator):
+    """RTC в местном времени поверх RTC, хранящего время UTC. Тревоги задаются в местном времени и
+    программируются в RTC в UTC. Периодическая тревога (поля в None) переводится по смещению UTC на момент
+    ее ближайшего срабатывания, поэтому после перехода на летнее/зимнее время (TimeZone.next_transition)
+    ее нужно установить снова!"""
+
+    def __init__(self, clock: IRTC, tz: TimeZone):
+        """clock - RTC со временем UTC, tz - часовой пояс"""
+        IRTCwAlarms.__init__(self)
+        self._clock = clock
+        self._tz = tz
+
+    @property
+    def timezone(self) -> TimeZone:
+        return self._tz
+
+    def get_utc_seconds(self) -> int:
+        """Возвращает время UTC в секундах с 2000 года"""
+        return rtc_time_to_seconds(self._clock.get_time())
+
+    def get_time(self) -> rtc_time:
+        """Возвращает местное время"""
+        return seconds_to_rtc_time(self._tz.to_local(self.get_utc_seconds()))
+
+    def set_time(self, value: rtc_time):
+        """Устанавливает местное время value (в RTC записывается время UTC)"""
+        self._clock.set_time(seconds_to_rtc_time(self._tz.to_utc(rtc_time_to_seconds(value))))
+
+    def set_time_aligned(self, value: [rtc_time, int], at_ticks_us: [int, None] = None) -> int:
+        """Устанавливает местное время value (rtc_time или секунды с 2000 года) в момент at_ticks_us методом
+        set_time_aligned RTC (в RTC записывается время UTC). Возвращает опоздание записи, мкс."""
+        local = value if isinstance(value, int) else rtc_time_to_seconds(value)
+        return self._clock.set_time_aligned(self._tz.to_utc(local), at_ticks_us)
+
+    def set_alarm(self, alarm_time: [rtc_alarm_time, None], alarm_id: int = 0):
+        """Устанавливает время тревоги в местном времени"""
+        utc = self.get_utc_seconds()
+        self._clock.set_alarm(_convert_alarm(alarm_time, self._tz.to_local(utc), self._tz.to_utc), alarm_id)
+
+    def get_alarm(self, alarm_id: int = 0) -> [rtc_alarm_time, None]:
+        """Возвращает время тревоги в местном времени"""
+        return _convert_alarm(self._clock.get_alarm(alarm_id), self.get_utc_seconds(), self._tz.to_local)
+
+    def get_stop_event(self, clear: bool = True) -> bool:
+        return self._clock.get_stop_event(clear)
+
+    def get_status(self, raw: bool = True) -> [int, tuple]:
+        return self._clock.get_status(raw)
+
+    def set_status(self, stat: [int, tuple]):
+        self._clock.set_status(stat)
+
+    def get_control(self, raw: bool = True) -> [int, tuple]:
+        return self._clock.get_control(raw)
+
+    def set_control(self, value: [int, tuple]):
+        self._clock.set_control(value)
+
+    def get_alarms_count(self) -> int:
+        return self._clock.get_alarms_count()
+
+    def get_alarm_flags(self, raw: bool = True, clear: bool = True) -> [int, tuple[bool, ...]]:
+        return self._clock.get_alarm_flags(raw, clear)
+
+    def get_alarm_flag(self, alarm_id: int = 0, clear: bool = True) -> bool:
+        return self._clock.get_alarm_flag(alarm_id, clear)
+
+    def enable_alarm(self, alarm_id: int = 0, enable: bool = True):
+        self._clock.enable_alarm(alarm_id, enable)
+
+    def __next__(self) -> rtc_time:
+        """For support iterating."""
+        return self.get_time()
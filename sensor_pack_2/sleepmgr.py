@@ -0,0 +1,160 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Цикл 'проснулся - поработал - уснул' на основе тревоги RTC и глубокого сна MCU (machine.deepsleep).
+Состояние драйвера и расписание сохраняются в памяти RTC MCU (machine.RTC().memory) или в ОЗУ микросхемы RTC
+с питанием от батареи (sensor_pack_2.kvstore.RtcKVStore), поэтому после пробуждения драйвер не инициализирует
+микросхему заново, а тревога и ее прерывание сохраняются."""
+
+import time
+import struct
+import machine
+from sensor_pack_2.irtc import IRTCwAlarms, rtc_time, rtc_alarm_time, rtc_time_to_seconds, seconds_to_rtc_time
+from sensor_pack_2.kvstore import crc8
+
+# причина пробуждения/запуска MCU
+WAKE_COLD = 0   # включение питания или сброс, сохраненного состояния нет
+WAKE_ALARM = 1  # тревога RTC
+WAKE_OTHER = 2  # пробуждение из глубокого сна без флагов тревог RTC (таймер MCU, другой вывод)
+
+# формат сохраняемого состояния (little endian): сигнатура (3s), версия (B), состояние драйвера (H, 0xFFFF - нет),
+# идентификатор следующего события планировщика (H, 0xFFFF - нет),
+# время следующего пробуждения, секунды с 2000 года (I), количество пробуждений (I),
+# задержка 'пробуждение - начало работы', мс (H), CRC-8 (B)
+_state_fmt = "<3sBHHIIHB"
+state_size = struct.calcsize(_state_fmt)
+_signature = b"SLP"
+_version = 2
+_no_state = 0xFFFF
+
+
+class SleepManager:
+    """Управление глубоким сном MCU с пробуждением по тревоге RTC. Порядок работы:
+        mgr = SleepManager()    # читает сохраненное состояние
+        clock = DS3221(adapter, state=mgr.driver_state)     # без обращений к шине после пробуждения
+        mgr.attach(clock)
+        reason = mgr.get_wake_reason()
+        ...     # работа
+        mgr.sleep(wake_at)      # программирует тревогу, сохраняет состояние и усыпляет MCU
+    Вывод INT RTC должен быть подключен к выводу MCU, пробуждающему его из глубокого сна (смотри документацию
+    на порт MicroPython, например esp32.wake_on_ext0)."""
+
+    def __init__(self, storage=None, key: int = 0):
+        """storage - хранилище состояния: None - память RTC MCU (machine.RTC().memory), или RtcKVStore
+        со значениями не короче state_size байт (например RtcKVStore(clock, 0x20, 64, value_size=state_size)
+        для ОЗУ MCP7940). key - ключ (номер ячейки) в RtcKVStore."""
+        self._storage = storage
+        self._key = key
+        self._buf = bytearray(state_size)
+        self._clock = None
+        self._scheduler = None
+        self._reason = None
+        # состояние драйвера RTC (смотри DS3221.get_state) или None
+        self.driver_state = None
+        # время следующего пробуждения, запрограммированное в RTC, секунды с 2000 года, или None
+        self.next_wake = None
+        # идентификатор события планировщика, запланированного на next_wake (int 0..0xFFFE), или None
+        self.next_event = None
+        self.wake_count = 0
+        # задержка 'пробуждение - начало работы' предыдущего пробуждения, мс
+        self.last_latency_ms = 0
+        self._resumed = machine.DEEPSLEEP_RESET == machine.reset_cause() and self._load()
+
+    @property
+    def resumed(self) -> bool:
+        """Истина, если MCU проснулся из глубокого сна и сохраненное состояние прочитано"""
+        return self._resumed
+
+    def _load(self) -> bool:
+        """Читает сохраненное состояние. Возвращает Истина, если оно правильное."""
+        if self._storage is None:
+            data = machine.RTC().memory()
+        else:
+            data = self._storage.get(self._key)
+        if data is None or len(data) < state_size or crc8(data, 0, state_size - 1) != data[state_size - 1]:
+            return False
+        signature, version, drv, event, next_wake, count, latency, _ = struct.unpack_from(_state_fmt, data, 0)
+        if _signature != signature or _version != version:
+            return False
+        self.driver_state = None if _no_state == drv else drv
+        self.next_event = None if _no_state == event else event
+        self.next_wake = next_wake or None
+        self.wake_count = count
+        self.last_latency_ms = latency
+        return True
+
+    def _save(self):
+        buf = self._buf
+        drv = _no_state if self.driver_state is None else self.driver_state
+        event = self.next_event
+        if not isinstance(event, int) or not 0 <= event < _no_state:
+            event = _no_state
+        struct.pack_into(_state_fmt, buf, 0, _signature, _version, drv, event, self.next_wake or 0,
+                         self.wake_count, min(0xFFFF, self.last_latency_ms), 0)
+        buf[state_size - 1] = crc8(buf, 0, state_size - 1)
+        if self._storage is None:
+            machine.RTC().memory(buf)
+        else:
+            self._storage.put(self._key, buf)
+
+    def attach(self, clock: IRTCwAlarms, scheduler=None):
+        """clock - RTC с тревогами. scheduler - планировщик событий (sensor_pack_2.alarmsched.AlarmScheduler)
+        или None. Если он задан, то время пробуждения по умолчанию - время его ближайшего события, а после
+        пробуждения планировщик не программирует тревогу, уже запрограммированную до сна (AlarmScheduler.resume).
+        События планировщика (обработчики - функции) не сохраняются: добавьте их до вызова attach."""
+        self._clock = clock
+        self._scheduler = scheduler
+        if scheduler is not None and self._resumed:
+            scheduler.resume(self.next_wake)
+
+    def get_wake_reason(self) -> int:
+        """Возвращает причину пробуждения: WAKE_COLD, WAKE_ALARM или WAKE_OTHER.
+        При первом вызове читает флаги тревог RTC и сбрасывает их, если планировщик не задан (смотри attach).
+        Иначе флаг своей тревоги сбрасывает метод service планировщика."""
+        if self._reason is None:
+            flags = self._clock.get_alarm_flags(raw=False, clear=self._scheduler is None)
+            if any(flags):
+                self._reason = WAKE_ALARM
+            else:
+                self._reason = WAKE_OTHER if self._resumed else WAKE_COLD
+        return self._reason
+
+    def mark_ready(self) -> int:
+        """Вызовите, когда MCU готов к работе после пробуждения. Возвращает задержку 'пробуждение - начало работы'
+        в мс (time.ticks_ms считается с момента пробуждения/запуска MCU), она сохраняется до следующего
+        пробуждения (last_latency_ms)."""
+        self.last_latency_ms = time.ticks_ms()
+        return self.last_latency_ms
+
+    def sleep(self, wake_at: [int, rtc_time, None] = None, alarm_id: int = 0, max_sleep_ms: [int, None] = None):
+        """Программирует тревогу alarm_id RTC на время wake_at (секунды с 2000 года или rtc_time; разрешение -
+        одна минута), включает ее прерывание, сохраняет состояние и усыпляет MCU (machine.deepsleep).
+        Если wake_at is None, то используется время ближайшего события планировщика (смотри attach).
+        max_sleep_ms - наибольшая длительность сна (таймер MCU) или None.
+        Если тревога на ту же минуту уже запрограммирована, то она не программируется снова."""
+        clock = self._clock
+        if wake_at is None:
+            if self._scheduler is None:
+                raise ValueError("Время пробуждения не задано!")
+            wake_at = self._scheduler.program()
+            event = self._scheduler.next_event()
+            self.next_event = None if event is None else event[1]
+        else:
+            self.next_event = None
+            wake_at = wake_at if isinstance(wake_at, int) else rtc_time_to_seconds(wake_at)
+            if self.next_wake is None or wake_at // 60 != self.next_wake // 60:
+                t = seconds_to_rtc_time(wake_at)
+                # 0x80 - признак дня месяца, смотри irtc.check_alarm_time
+                clock.set_alarm(rtc_alarm_time(date_day=0x80 | t.day, hour=t.hour, min=t.min), alarm_id)
+        if wake_at is not None and not self._resumed:
+            # после пробуждения прерывание тревоги уже включено
+            clock.control_alarm_interrupt(1 == alarm_id, 0 == alarm_id)
+        self.next_wake = wake_at
+        self.wake_count += 1
+        get_state = getattr(clock, "get_state", None)
+        self.driver_state = None if get_state is None else get_state()
+        self._save()
+        if max_sleep_ms is None:
+            machine.deepsleep()
+        else:
+            machine.deepsleep(max_sleep_ms)
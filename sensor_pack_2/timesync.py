@@ -0,0 +1,226 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Синхронизация RTC с эталонными источниками времени: компьютер по последовательному порту, GPS приемник
+(NMEA + PPS), сервер NTP. Время записывается в RTC точно на границе секунды эталона.
+Время - секунды с 2000-01-01 00:00:00 UTC (смотри irtc.rtc_time_to_seconds) плюс микросекунды. Все вычисления -
+в целых числах, секунды и микросекунды раздельно."""
+
+import time
+import struct
+from collections import namedtuple
+from machine import Pin
+from sensor_pack_2.irtc import IRTC, rtc_time_to_seconds
+from sensor_pack_2.rtccal import wait_rtc_edge
+
+# отсчет эталонного времени: в момент ticks_us (time.ticks_us) эталонное время было seconds + usec / 10**6
+# latency_us - погрешность (задержка/неопределенность) отсчета, мкс
+sync_sample = namedtuple("sync_sample", "seconds usec ticks_us latency_us")
+# результат синхронизации:
+# source - индекс источника в списке SyncService
+# offset_us - смещение RTC относительно эталона до синхронизации, мкс. Больше нуля - RTC спешит
+# latency_us - погрешность отсчета эталонного времени, мкс
+# written - Истина, если время было записано в RTC
+# residual_us - смещение RTC относительно эталона после синхронизации, мкс, или None
+sync_report = namedtuple("sync_report", "source offset_us latency_us written residual_us")
+
+# секунд от 1900-01-01 (эпоха NTP) до 2000-01-01
+_ntp_to_2000 = 3_155_673_600
+
+
+def ref_at(sample: sync_sample, ticks: int) -> tuple[int, int]:
+    """Возвращает эталонное время в момент ticks (time.ticks_us) в виде кортежа (секунды, микросекунды)"""
+    sec, usec = divmod(sample.usec + time.ticks_diff(ticks, sample.ticks_us), 1_000_000)
+    return sample.seconds + sec, usec
+
+
+class HostSerialSource:
+    """Эталон времени - компьютер, подключенный по последовательному порту (UART, USB CDC).
+    Протокол: MCU передает b"T\\n", компьютер отвечает строкой "<секунды с 2000 года> <микросекунды>\\n"
+    (смотри tools/timehost.py). Эталонное время относится к середине интервала запрос - ответ."""
+
+    def __init__(self, stream):
+        """stream - поток с методами write, readline (machine.UART с timeout=0, sys.stdin/stdout)"""
+        self._stream = stream
+
+    def get_sample(self, timeout_ms: int = 1000) -> [sync_sample, None]:
+        stream = self._stream
+        t0 = time.ticks_us()
+        stream.write(b"T\n")
+        start = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            line = stream.readline()
+            if not line:
+                continue
+            t1 = time.ticks_us()
+            try:
+                seconds, usec = (int(item) for item in line.split())
+            except ValueError:
+                continue
+            rtt = time.ticks_diff(t1, t0)
+            return sync_sample(seconds, usec, time.ticks_add(t0, rtt // 2), rtt // 2)
+        return None
+
+
+def _nmea_checksum_ok(line: bytes) -> bool:
+    star = line.find(b"*")
+    if not line.startswith(b"$") or star < 0:
+        return False
+    crc = 0
+    for index in range(1, star):
+        crc ^= line[index]
+    try:
+        return crc == int(line[star + 1:star + 3], 16)
+    except ValueError:
+        return False
+
+
+def parse_rmc(line: bytes) -> [tuple, None]:
+    """Разбирает предложение NMEA RMC ($GPRMC, $GNRMC и т.п.). Возвращает кортеж (секунды с 2000 года,
+    микросекунды) или None, если предложение неверное или данные недостоверны"""
+    if not _nmea_checksum_ok(line):
+        return None
+    fields = line[:line.find(b"*")].split(b",")
+    if len(fields) < 10 or not fields[0].endswith(b"RMC") or b"A" != fields[2]:
+        return None
+    hms, dmy = fields[1], fields[9]
+    if len(hms) < 6 or len(dmy) != 6:
+        return None
+    t = 2000 + int(dmy[4:6]), int(dmy[2:4]), int(dmy[0:2]), int(hms[0:2]), int(hms[2:4]), int(hms[4:6])
+    usec = 0
+    if len(hms) > 7:    # доли секунды после точки
+        frac = hms[7:]
+        usec = int(frac) * 10 ** (6 - len(frac))
+    return rtc_time_to_seconds(t), usec
+
+
+class GpsSource:
+    """Эталон времени - GPS приемник: предложения NMEA RMC по UART и, необязательно, секундные импульсы PPS.
+    С PPS время предложения RMC относится к фронту последнего импульса (так работает большинство приемников),
+    погрешность - задержка обработки прерывания. Без PPS погрешность - время передачи предложения (до 100 мс
+    и более)."""
+
+    def __init__(self, uart, pps_pin: [Pin, None] = None, trigger: int = Pin.IRQ_RISING):
+        """uart - UART приемника (метод readline, timeout=0). pps_pin - вывод MCU, подключенный к выходу PPS."""
+        self._uart = uart
+        self._pps_ticks = None
+        if pps_pin is not None:
+            pps_pin.irq(trigger=trigger, handler=self._pps_handler)
+        self._has_pps = pps_pin is not None
+
+    def _pps_handler(self, pin):
+        self._pps_ticks = time.ticks_us()
+
+    def get_sample(self, timeout_ms: int = 2000) -> [sync_sample, None]:
+        start = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            line = self._uart.readline()
+            if not line:
+                continue
+            now = time.ticks_us()
+            rmc = parse_rmc(line.strip())
+            if rmc is None:
+                continue
+            if not self._has_pps:
+                return sync_sample(rmc[0], rmc[1], now, 100_000)
+            pps = self._pps_ticks
+            # предложение должно относиться к последнему импульсу
+            if pps is not None and 0 <= time.ticks_diff(now, pps) < 1_000_000:
+                return sync_sample(rmc[0], 0, pps, 0)
+        return None
+
+
+class NtpSource:
+    """Эталон времени - сервер NTP (SNTP, RFC 4330). Сокет передается извне, поэтому его можно заменить
+    объектом-имитатором с методами sendto и recv."""
+
+    def __init__(self, sock, address):
+        """sock - UDP сокет с установленным таймаутом (sock.settimeout). address - адрес сервера
+        (результат socket.getaddrinfo(host, 123)[0][-1])"""
+        self._sock = sock
+        self._address = address
+        self._buf = bytearray(48)
+
+    def get_sample(self, timeout_ms: int = 1000) -> [sync_sample, None]:
+        """timeout_ms не используется, таймаут задается сокету!"""
+        buf = self._buf
+        for index in range(48):
+            buf[index] = 0
+        buf[0] = 0x1B   # LI = 0, VN = 3, Mode = 3 (клиент)
+        t0 = time.ticks_us()
+        try:
+            self._sock.sendto(buf, self._address)
+            data = self._sock.recv(48)
+        except OSError:
+            return None
+        t3 = time.ticks_us()
+        if len(data) < 48:
+            return None
+        # время приема запроса (T2) и передачи ответа (T3) сервером
+        rx_sec, rx_frac, tx_sec, tx_frac = struct.unpack_from("!IIII", data, 32)
+        if not tx_sec:
+            return None
+        tx_usec = (tx_frac * 1_000_000) >> 32
+        server_us = (tx_sec - rx_sec) * 1_000_000 + tx_usec - ((rx_frac * 1_000_000) >> 32)
+        # задержка сети в одну сторону
+        delay = (time.ticks_diff(t3, t0) - server_us) // 2
+        sec, usec = divmod(tx_usec + max(0, delay), 1_000_000)
+        return sync_sample(tx_sec - _ntp_to_2000 + sec, usec, t3, max(0, delay))
+
+
+class SyncService:
+    """Синхронизация RTC с первым ответившим источником из списка (в порядке приоритета).
+    Смещение RTC измеряется по моменту смены его секунды (rtccal.wait_rtc_edge). Если оно больше
+    threshold_us, то время записывается в RTC на границе секунды эталона, после чего измеряется
+    остаточное смещение."""
+
+    def __init__(self, clock: IRTC, sources, threshold_us: int = 10_000):
+        """clock - RTC со временем UTC (драйвер или RedundantClock; для LocalClock передайте его RTC UTC).
+        sources - список/кортеж источников с методом get_sample(timeout_ms).
+        threshold_us - допустимое смещение RTC, мкс."""
+        self._clock = clock
+        self._sources = sources
+        self._threshold_us = threshold_us
+        self.last_report = None
+
+    def get_sample(self, timeout_ms: int = 1000) -> tuple[int, [sync_sample, None]]:
+        """Возвращает кортеж (индекс источника, отсчет эталонного времени) от первого ответившего источника"""
+        for index, source in enumerate(self._sources):
+            sample = source.get_sample(timeout_ms)
+            if sample is not None:
+                return index, sample
+        return -1, None
+
+    def measure_offset(self, sample: sync_sample) -> [int, None]:
+        """Возвращает смещение RTC относительно эталона в мкс (больше нуля - RTC спешит) или None"""
+        edge = wait_rtc_edge(self._clock)
+        if edge is None:
+            return None
+        ref_sec, ref_usec = ref_at(sample, edge[1])
+        return (edge[0] - ref_sec) * 1_000_000 - ref_usec
+
+    def write_at_boundary(self, sample: sync_sample, margin_us: int = 200_000) -> tuple[int, int]:
+        """Записывает в RTC время эталона на ближайшей границе его секунды (не ранее чем через margin_us)
+        методом IRTC.set_time_aligned. Возвращает кортеж (записанное время - секунды с 2000 года,
+        опоздание записи, мкс)."""
+        now = time.ticks_us()
+        sec, usec = ref_at(sample, now)
+        target = sec + 1 + (1 if 1_000_000 - usec < margin_us else 0)
+        deadline = time.ticks_add(now, (target - sec) * 1_000_000 - usec)
+        return target, self._clock.set_time_aligned(target, deadline)
+
+    def sync(self, timeout_ms: int = 1000, force: bool = False) -> [sync_report, None]:
+        """Синхронизирует RTC. Возвращает sync_report или None, если ни один источник не ответил.
+        Если force в Истина, то время записывается в RTC при любом смещении."""
+        index, sample = self.get_sample(timeout_ms)
+        if sample is None:
+            return None
+        offset = self.measure_offset(sample)
+        written = force or offset is None or abs(offset) > self._threshold_us
+        residual = offset
+        if written:
+            self.write_at_boundary(sample)
+            residual = self.measure_offset(sample)
+        self.last_report = sync_report(source=index, offset_us=offset, latency_us=sample.latency_us,
+                                       written=written, residual_us=residual)
+        return self.last_report
@@ -0,0 +1,36 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Скорость преобразования отсчетов АЦП, отсчетов/с: как раньше (get_lsb на каждый отсчет) и с константами
+ConversionContext (raw_value_to_uv, raw_block_to_uv, raw_block_to_volts).
+Запуск на компьютере: python tests/bench_adc_block.py"""
+
+from array import array
+from host_env import measure_us, make_sim_adc
+
+_count = 20
+_block = 256
+
+
+def run():
+    adc = make_sim_adc()
+    raw = array("h", [(index * 257) % 65536 - 32768 for index in range(_block)])
+    uv = array("l", [0] * _block)
+    volts = array("f", [0] * _block)
+
+    def before():
+        # каждый отсчет: вычисление цены младшего разряда и умножение с плавающей точкой
+        for index in range(_block):
+            volts[index] = raw[index] * adc.get_lsb()
+
+    def single_uv():
+        for index in range(_block):
+            uv[index] = adc.raw_value_to_uv(raw[index])
+
+    for name, func in (("до (get_lsb на отсчет)", before), ("raw_value_to_uv", single_uv),
+                       ("raw_block_to_uv", lambda: adc.raw_block_to_uv(raw, uv)),
+                       ("raw_block_to_volts", lambda: adc.raw_block_to_volts(raw, volts))):
+        rate = 1_000_000 * _block / measure_us(func, _count)
+        print(f"{name}: {rate:.0f} отсчетов/с")
+
+
+run()
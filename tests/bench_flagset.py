@@ -0,0 +1,22 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Время изменения битов флагами: change_bit_by_flags и FlagSet.apply.
+Запуск на компьютере: python tests/bench_flagset.py; на MicroPython - вместе с host_env.py."""
+
+from host_env import measure_us
+from sensor_pack_2.irtc import FlagSet, change_bit_by_flags
+
+_count = 20_000
+
+
+def run():
+    bits = 7, 3, 2, 1, 0    # DS3221._status_bits
+    flags = False, None, None, None, None   # DS3221._clear_osf
+    flag_set = FlagSet(bits)
+    old = measure_us(lambda: change_bit_by_flags(0x88, bits, flags), _count)
+    new = measure_us(lambda: flag_set.apply(0x88, flags), _count)
+    print(f"change_bit_by_flags: {old:.3f} мкс")
+    print(f"FlagSet.apply: {new:.3f} мкс, быстрее в {old / new:.1f} раз")
+
+
+run()
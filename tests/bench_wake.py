@@ -0,0 +1,54 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Задержка 'пробуждение - начало работы': создание DS3221, планировщика и определение причины пробуждения
+при холодном запуске и после глубокого сна (SleepManager), время и количество обращений к шине.
+Запуск на компьютере: python tests/bench_wake.py"""
+
+from host_env import SimI2C, measure_us
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.alarmsched import AlarmScheduler
+from sensor_pack_2.sleepmgr import SleepManager
+from ds3231mod import DS3221
+
+_count = 2_000
+_wake_at = 769_573_920     # секунды с 2000 года
+
+
+def _cold(adapter):
+    # как раньше: инициализация микросхемы, программирование тревоги и ее прерывания
+    clock = DS3221(adapter)
+    scheduler = AlarmScheduler(clock)
+    scheduler.add(1, at=_wake_at, period=600)
+    scheduler.program()
+    clock.control_alarm_interrupt(False, True)
+    clock.get_alarm_flags(raw=True, clear=True)
+
+
+def _resumed(adapter, mgr):
+    clock = DS3221(adapter, state=mgr.driver_state)
+    scheduler = AlarmScheduler(clock)
+    scheduler.add(1, at=_wake_at, period=600)
+    mgr.attach(clock, scheduler)
+    mgr._reason = None
+    mgr.get_wake_reason()
+    scheduler.program()
+
+
+def _run(name, func, bus):
+    reads, writes = bus.reads, bus.writes
+    func()
+    ops = bus.reads - reads + bus.writes - writes
+    print(f"{name}: {measure_us(func, _count):.1f} мкс, обращений к шине: {ops}")
+
+
+def run():
+    bus = SimI2C()
+    adapter = I2cAdapter(bus)
+    _run("холодный запуск", lambda: _cold(adapter), bus)
+    mgr = SleepManager()
+    mgr._resumed = True     # состояние, сохраненное перед сном
+    mgr.driver_state, mgr.next_wake = 0x05, _wake_at
+    _run("пробуждение", lambda: _resumed(adapter, mgr), bus)
+
+
+run()
@@ -0,0 +1,11 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Тесты запускаются на компьютере: python -m pytest -q tests"""
+
+import pytest
+import host_env
+
+
+@pytest.fixture
+def bus() -> host_env.SimI2C:
+    return host_env.SimI2C()
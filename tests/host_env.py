@@ -0,0 +1,185 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Окружение для запуска тестов и измерений производительности на компьютере (CPython): заменители модулей
+micropython и machine, функции time.ticks_* и имитатор шины I2C с памятью регистров микросхем.
+На MicroPython модули не заменяются."""
+
+import sys
+import time
+
+_ticks_mask = 0x3FFFFFFF
+
+
+class SimI2C:
+    """Имитатор шины I2C. Память регистров каждой микросхемы - bytearray(256) (смотри chip).
+    Если адрес микросхемы находится в множестве failed, то обращение к ней возбуждает OSError."""
+
+    def __init__(self):
+        self.memory = dict()
+        self.failed = set()
+        self.reads = 0
+        self.writes = 0
+
+    def chip(self, address: int) -> bytearray:
+        """Возвращает память регистров микросхемы с адресом address"""
+        return self.memory.setdefault(address, bytearray(256))
+
+    def _check(self, address: int):
+        if address in self.failed:
+            raise OSError(19)   # ENODEV
+
+    def readfrom_mem(self, address: int, reg: int, n: int) -> bytes:
+        self._check(address)
+        self.reads += 1
+        return bytes(self.chip(address)[reg:reg + n])
+
+    def readfrom_mem_into(self, address: int, reg: int, buf):
+        self._check(address)
+        self.reads += 1
+        buf[:] = self.chip(address)[reg:reg + len(buf)]
+
+    def writeto_mem(self, address: int, reg: int, buf):
+        self._check(address)
+        self.writes += 1
+        mem = self.chip(address)
+        mem[reg:reg + len(buf)] = bytes(buf)
+
+
+class _Pin:
+    IN, OUT, PULL_UP = 0, 1, 2
+    IRQ_FALLING, IRQ_RISING = 4, 8
+
+    def __init__(self, *args, **kwargs):
+        self._value = 1
+        self.handler = None
+
+    def irq(self, trigger=None, handler=None):
+        self.handler = handler
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+
+class _Timer:
+    ONE_SHOT, PERIODIC = 0, 1
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def init(self, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
+
+
+class _RTC:
+    _memory = b""
+
+    def memory(self, data=None):
+        if data is None:
+            return _RTC._memory
+        _RTC._memory = bytes(data)
+
+
+def _install_machine():
+    machine = ModuleType("machine")
+    machine.Pin, machine.Timer, machine.RTC = _Pin, _Timer, _RTC
+    machine.I2C, machine.SPI = SimI2C, object
+    machine.DEEPSLEEP_RESET = 4
+    machine.reset_cause = lambda: machine.DEEPSLEEP_RESET
+
+    def deepsleep(ms=None):
+        raise SystemExit
+
+    machine.deepsleep = deepsleep
+    sys.modules["machine"] = machine
+
+
+def _install_micropython():
+    mp = ModuleType("micropython")
+    mp.viper = mp.native = lambda func: func
+    mp.const = lambda value: value
+    mp.schedule = lambda func, arg: func(arg)
+    mp.alloc_emergency_exception_buf = lambda size: None
+    sys.modules["micropython"] = mp
+
+
+def _install_ticks():
+    def ticks_diff(a, b):
+        d = (a - b) & _ticks_mask
+        return d - (_ticks_mask + 1) if d > (_ticks_mask >> 1) else d
+
+    time.ticks_us = lambda: int(time.perf_counter() * 1_000_000) & _ticks_mask
+    time.ticks_ms = lambda: int(time.perf_counter() * 1_000) & _ticks_mask
+    time.ticks_diff = ticks_diff
+    time.ticks_add = lambda a, b: (a + b) & _ticks_mask
+    time.sleep_ms = lambda ms: time.sleep(ms / 1_000)
+    time.sleep_us = lambda us: time.sleep(us / 1_000_000)
+
+
+if "micropython" != sys.implementation.name:
+    import os
+    from types import ModuleType
+    # корень репозитория - для импорта драйверов
+    _root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _root not in sys.path:
+        sys.path.insert(0, _root)
+    if "micropython" not in sys.modules:
+        _install_micropython()
+    if "machine" not in sys.modules:
+        _install_machine()
+    if not hasattr(time, "ticks_us"):
+        _install_ticks()
+
+
+def measure_us(func, count: int) -> float:
+    """Возвращает среднее время вызова функции func без аргументов, мкс (count вызовов)"""
+    start = time.ticks_us()
+    for _ in range(count):
+        func()
+    return time.ticks_diff(time.ticks_us(), start) / count
+
+
+def make_sim_adc():
+    """Возвращает 16-битный дифференциальный АЦП без шины (опорное напряжение 2.048 В) в непрерывном режиме"""
+    from sensor_pack_2.adcmod import ADC, adc_init_props
+
+    class _SimADC(ADC):
+        """16-битный дифференциальный АЦП без шины, опорное напряжение 2.048 В"""
+
+        def __init__(self):
+            super().__init__(adc_init_props(2.048, 16, 4, 2, True))
+
+        def check_gain_raw(self, gain_raw: int) -> int:
+            return gain_raw
+
+        def check_data_rate_raw(self, data_rate_raw: int) -> int:
+            return data_rate_raw
+
+        def get_resolution(self, raw_data_rate: int) -> int:
+            return 16
+
+        def adc_properties_to_raw_config(self) -> int:
+            return 0
+
+        def set_raw_config(self, value: int):
+            pass
+
+        def get_raw_config(self) -> int:
+            return 0
+
+        def raw_config_to_adc_properties(self, raw_config: int):
+            pass
+
+        def gain_raw_to_real(self, raw_gain: int) -> float:
+            return 1.0
+
+        def get_conversion_cycle_time(self) -> int:
+            return 1000
+
+    adc = _SimADC()
+    adc.start_measurement(False, 0, 0, 0, False)
+    return adc
@@ -0,0 +1,33 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Целочисленное преобразование отсчетов АЦП (ConversionContext) в микроВольты: округление до 1 мкВ
+и произведение в пределах 'малых' целых MicroPython (< 2**30)"""
+
+from array import array
+from host_env import make_sim_adc
+from sensor_pack_2.adcmod import ConversionContext
+
+
+def test_block_conversion_matches_lsb():
+    adc = make_sim_adc()
+    lsb = adc.get_lsb()
+    raw = array("h", [-32768, -12345, -3, -1, 0, 1, 777, 32767])
+    uv = adc.raw_block_to_uv(raw)
+    volts = adc.raw_block_to_volts(raw)
+    for index, value in enumerate(raw):
+        # цена разряда 62.5 мкВ - множитель точный, ошибка только от округления
+        assert abs(uv[index] - value * lsb * 1_000_000) <= 0.5
+        assert uv[index] == adc.raw_value_to_uv(value)
+        assert abs(volts[index] - value * lsb) <= 1e-7 * abs(value * lsb)
+        # преобразование в Вольты не округляется до 1 мкВ
+        assert adc.raw_value_to_real(value) == value * lsb
+
+
+def test_product_fits_small_int():
+    for lsb, resolution, differential in ((62.5e-6, 16, True), (4.096 / 4096, 12, False),
+                                          (2.5 / (1 << 23) / 128, 24, True), (3.3 / 1024, 10, False)):
+        ctx = ConversionContext(lsb, resolution, differential)
+        max_raw = max(abs(ctx.low_limit), abs(ctx.hi_limit))
+        assert max_raw * ctx.scale + ctx.half < 1 << 30
+        # следующий дробный бит уже не помещается
+        assert max_raw * int(0.5 + lsb * 1_000_000 * (2 << ctx.shift)) + (1 << ctx.shift) >= 1 << 30
@@ -0,0 +1,35 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""AdcScanner: слова конфигурации каналов и текущий канал АЦП после опроса"""
+
+from host_env import make_sim_adc
+from sensor_pack_2.adcmod import adc_channel_info
+from sensor_pack_2.adcscan import AdcScanner
+
+
+def _make_adc():
+    class _ChannelADC(type(make_sim_adc())):
+        """Слово конфигурации - номер канала и признак дифференциального канала, запись запоминается"""
+
+        def adc_properties_to_raw_config(self) -> int:
+            return self._curr_channel << 1 | bool(self._is_diff_channel)
+
+        def set_raw_config(self, value: int):
+            self.written = value
+
+        def get_raw_value(self) -> int:
+            return self.written
+
+    return _ChannelADC()
+
+
+def test_scan_keeps_channel_consistent():
+    adc = _make_adc()
+    scanner = AdcScanner(adc, (2, adc_channel_info(1, True), 0), 2, 0, 0, single_shot=False)
+    # слова конфигурации вычислены без изменения текущего канала
+    assert adc_channel_info(2, False) == adc.get_current_channel()
+    assert 0 == scanner.scan()
+    assert [4, 3, 0] == [scanner.get(ch, 0) for ch in range(3)]
+    # в АЦП настроен последний канал, и текущий канал АЦП - он же
+    assert adc_channel_info(0, False) == adc.get_current_channel()
+    assert adc.written == adc.adc_properties_to_raw_config()
@@ -0,0 +1,76 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""AlarmScheduler на имитаторе шины: DS3231 (0x68), тревога 1 (alarm_id = 0)"""
+
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.irtc import rtc_time, rtc_time_to_seconds, seconds_to_rtc_time
+from sensor_pack_2.alarmsched import AlarmScheduler
+from sensor_pack_2.irtc import IRTC
+from sensor_pack_2.metrics import MetricsRegistry, ALARM_MISSES
+from ds3231mod import DS3221
+
+_t0 = rtc_time_to_seconds(rtc_time(2024, 5, 17, 12, 30, 15, 4, 138))
+
+
+def _make(bus):
+    clock = DS3221(I2cAdapter(bus))
+    clock.set_time(seconds_to_rtc_time(_t0))
+    clock.control_alarm_interrupt(True, True)
+    return clock, AlarmScheduler(clock)
+
+
+def test_other_alarm_flag_preserved(bus):
+    clock, scheduler = _make(bus)
+    scheduler.add(1, at=_t0 + 60)
+    scheduler.program()
+    mem = bus.chip(0x68)
+    mem[0x0F] |= 0x02   # сработала тревога 2, не принадлежащая планировщику
+    assert [] == scheduler.service()
+    assert 0x02 == 0x03 & mem[0x0F]
+    mem[0x0F] |= 0x01
+    assert [1] == scheduler.service(now=_t0 + 60)
+    assert 0x02 == 0x03 & mem[0x0F]
+
+
+def test_disarm_after_last_event(bus):
+    clock, scheduler = _make(bus)
+    scheduler.add(1, at=_t0 + 60)
+    scheduler.program()
+    mem = bus.chip(0x68)
+    assert 0x07 == 0x07 & mem[0x0E]
+    assert [1] == scheduler.service(now=_t0 + 60)
+    # событий нет: прерывание тревоги 1 отключено, тревоги 2 - нет
+    assert 0x06 == 0x07 & mem[0x0E]
+    writes = bus.writes
+    assert scheduler.program() is None
+    assert writes == bus.writes
+    # новое событие: тревога программируется и ее прерывание включается снова
+    scheduler.add(2, at=_t0 + 600)
+    assert _t0 + 600 == scheduler.program()
+    assert 0x07 == 0x07 & mem[0x0E]
+
+
+class _DuckClock:
+    """Часы с тревогой, не наследник IRTC"""
+
+    def get_alarm_flag(self, alarm_id: int = 0, clear: bool = True) -> bool:
+        return True
+
+    def set_alarm(self, alarm_time, alarm_id: int = 0):
+        pass
+
+    def enable_alarm(self, alarm_id: int = 0, enable: bool = True):
+        pass
+
+
+def test_misses_counted_for_duck_typed_clock():
+    registry = MetricsRegistry()
+    IRTC.metrics = registry
+    try:
+        scheduler = AlarmScheduler(_DuckClock())
+        scheduler.add(1, at=_t0, period=60)
+        # обработка через 3 минуты: событие и два повторения пропущены
+        assert [1] == scheduler.service(now=_t0 + 180)
+        assert 3 == registry.get(ALARM_MISSES)
+    finally:
+        IRTC.metrics = None
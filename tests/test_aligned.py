@@ -0,0 +1,53 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""set_time_aligned оберток RedundantClock и LocalClock, синхронизация SyncService.write_at_boundary"""
+
+import time
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.irtc import rtc_time, rtc_time_to_seconds, seconds_to_rtc_time
+from sensor_pack_2.rtcredundant import RedundantClock
+from sensor_pack_2.rtctz import TimeZone, LocalClock
+from sensor_pack_2.timesync import SyncService, sync_sample
+from ds3231mod import DS3221
+from PCF8563mod import PCF8563
+
+_t0 = rtc_time_to_seconds(rtc_time(2024, 5, 17, 12, 30, 15, 4, 138))
+
+
+def _redundant(bus) -> RedundantClock:
+    adapter = I2cAdapter(bus)
+    return RedundantClock(DS3221(adapter), PCF8563(adapter), check_period_ms=0)
+
+
+def test_redundant_writes_both_clocks(bus):
+    clock = _redundant(bus)
+    assert 0 <= clock.set_time_aligned(_t0)
+    for index in range(2):
+        assert _t0 == rtc_time_to_seconds(clock.get_clock(index).get_time())
+    assert 0 == 0x20 & bus.chip(0x51)[0]     # генератор PCF8563 запущен (STOP = 0)
+
+
+def test_redundant_one_clock_failed(bus):
+    clock = _redundant(bus)
+    bus.failed.add(0x51)
+    clock.set_time_aligned(seconds_to_rtc_time(_t0))
+    assert clock.is_failed(1)
+    assert _t0 == rtc_time_to_seconds(clock.get_clock(0).get_time())
+
+
+def test_local_clock_writes_utc(bus):
+    utc_clock = DS3221(I2cAdapter(bus))
+    clock = LocalClock(utc_clock, TimeZone(offset=3 * 3600))
+    clock.set_time_aligned(_t0)
+    assert _t0 - 3 * 3600 == rtc_time_to_seconds(utc_clock.get_time())
+    assert _t0 == rtc_time_to_seconds(clock.get_time())
+
+
+def test_sync_service_over_redundant_clock(bus):
+    clock = _redundant(bus)
+    sample = sync_sample(seconds=_t0, usec=950_000, ticks_us=time.ticks_us(), latency_us=0)
+    target, late = SyncService(clock, ()).write_at_boundary(sample, margin_us=10_000)
+    assert _t0 + 1 == target
+    assert 0 <= late
+    for index in range(2):
+        assert target == rtc_time_to_seconds(clock.get_clock(index).get_time())
@@ -0,0 +1,34 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""BQ32000.set_status изменяет только регистр своего флага"""
+
+from sensor_pack_2.bus_service import I2cAdapter
+from BQ32000mod import BQ32000, status_bq32000
+
+
+def _make(bus, seconds: int, minutes: int) -> BQ32000:
+    mem = bus.chip(0x68)
+    mem[0], mem[1] = seconds, minutes
+    return BQ32000(I2cAdapter(bus))
+
+
+def test_clear_of_writes_minutes_register_only(bus):
+    clock = _make(bus, 0x59, 0x80 | 0x12)
+    writes = bus.writes
+    assert clock.get_stop_event(clear=True)
+    assert 0x59 == bus.chip(0x68)[0] and 0x12 == bus.chip(0x68)[1]
+    assert writes + 1 == bus.writes
+    assert not clock.get_stop_event(clear=True)
+    assert writes + 1 == bus.writes
+
+
+def test_stop_touches_seconds_register_only(bus):
+    clock = _make(bus, 0x30, 0x80 | 0x12)
+    clock.set_status(status_bq32000(STOP=True, OF=None))
+    assert 0x80 | 0x30 == bus.chip(0x68)[0] and 0x80 | 0x12 == bus.chip(0x68)[1]
+    assert status_bq32000(STOP=True, OF=True) == clock.get_status(raw=False)
+    clock.set_status(0x00)
+    assert 0x30 == bus.chip(0x68)[0] and 0x12 == bus.chip(0x68)[1]
+    writes = bus.writes
+    clock.set_status(status_bq32000(STOP=False, OF=False))
+    assert writes == bus.writes
@@ -0,0 +1,34 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""EventLogger.flush: без точек привязки к RTC в поток ничего не записывается"""
+
+import io
+import os
+import sys
+import pytest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.eventlog import EventLogger
+from sensor_pack_2.irtc import rtc_time
+from ds3231mod import DS3221
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from eventlog_decode import decode
+
+
+def test_flush_without_anchor_writes_nothing(bus):
+    clock = DS3221(I2cAdapter(bus))
+    clock.set_time(rtc_time(2024, 5, 17, 12, 30, 15, 4, 138))
+    log = EventLogger(clock, capacity=64)
+    for index in range(40):
+        log.log(index, -index)
+    stream = io.BytesIO()
+    with pytest.raises(ValueError):
+        log.flush(stream)
+    assert b"" == stream.getvalue()
+    assert 40 == len(log)
+    log.anchor()
+    assert 40 == log.flush(stream)
+    stream.seek(0)
+    events = list(decode(stream))
+    assert [(index, -index) for index in range(40)] == [item[1:] for item in events]
+    assert 2024 == events[0][0].year
@@ -0,0 +1,37 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""FlagSet.apply дает тот же результат, что и change_bit_by_flags"""
+
+import itertools
+import pytest
+from sensor_pack_2.irtc import FlagSet, change_bit_by_flags
+from ds3231mod import DS3221
+from PCF8563mod import PCF8563
+from MCP7940mod import MCP7940
+from BQ32000mod import BQ32000
+
+_bit_tuples = (DS3221._status_bits, DS3221._control_bits, PCF8563._status_bits, MCP7940._status_bits,
+               BQ32000._status_bits)
+
+
+@pytest.mark.parametrize("bit_numbers", _bit_tuples)
+def test_same_as_change_bit_by_flags(bit_numbers):
+    flag_set = FlagSet(bit_numbers)
+    for flags in itertools.product((None, False, True), repeat=len(bit_numbers)):
+        for source in range(256):
+            assert change_bit_by_flags(source, bit_numbers, flags) == flag_set.apply(source, flags)
+
+
+def test_driver_flag_sets():
+    assert DS3221._status_flags.get_masks(DS3221._clear_osf) == FlagSet(DS3221._status_bits).get_masks(
+        DS3221._clear_osf)
+    for cls in (DS3221, PCF8563, MCP7940, BQ32000):
+        assert cls._status_bits == cls._status_flags._bit_numbers
+
+
+def test_cache_is_bounded():
+    flag_set = FlagSet(range(8))
+    for flags in itertools.product((None, False, True), repeat=8):
+        flag_set.apply(0, flags)
+    assert len(flag_set._cache) <= FlagSet.max_cached
+    assert 0xF0 == flag_set.apply(0x0F, (False,) * 4 + (True,) * 4)
@@ -0,0 +1,40 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""DS3221.init_fast: записываются только отличающиеся регистры управления и состояния"""
+
+from sensor_pack_2.bus_service import I2cAdapter
+from ds3231mod import DS3221, status_ds3231
+
+
+def _status(**kwargs) -> status_ds3231:
+    fields = dict(OSF=None, EN32KHz=None, BSY=None, A2F=None, A1F=None)
+    fields.update(kwargs)
+    return status_ds3231(**fields)
+
+
+def test_no_writes_when_unchanged(bus):
+    mem = bus.chip(0x68)
+    mem[0x0E], mem[0x0F] = 0x05, 0x89     # прерывание тревоги 1 включено; OSF, EN32kHz, A1F
+    writes = bus.writes
+    DS3221(I2cAdapter(bus), preserve_alarm_irq=True, status=_status(EN32KHz=True))
+    assert writes == bus.writes and 0x89 == mem[0x0F]
+
+
+def test_status_only(bus):
+    mem = bus.chip(0x68)
+    mem[0x0E], mem[0x0F] = 0x00, 0x8D     # OSF, EN32kHz, BSY, A1F
+    writes = bus.writes
+    clock = DS3221(I2cAdapter(bus), status=_status(OSF=False, EN32KHz=False, A2F=True))
+    assert writes + 1 == bus.writes
+    assert 0x05 == mem[0x0F]    # BSY, A1F сохранены, A2F не устанавливается
+    assert not clock.init_fast(status=_status(OSF=False, EN32KHz=False))
+    assert writes + 1 == bus.writes
+
+
+def test_control_and_status_in_one_write(bus):
+    mem = bus.chip(0x68)
+    mem[0x0E], mem[0x0F] = 0x1C, 0x88
+    writes = bus.writes
+    DS3221(I2cAdapter(bus), status=_status(OSF=False))
+    assert writes + 1 == bus.writes
+    assert 0x18 == mem[0x0E] and 0x08 == mem[0x0F]
@@ -0,0 +1,22 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""IRTC.get_time в режиме согласованного чтения (consistent_read) на имитаторе шины: DS3231 (0x68)"""
+
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.irtc import rtc_time
+from ds3231mod import DS3221
+
+_t0 = rtc_time(2024, 5, 17, 12, 30, 15, 4, 138)
+
+
+def test_zero_retries_still_compares(bus):
+    clock = DS3221(I2cAdapter(bus))
+    clock.set_time(_t0)
+    clock.consistent_read, clock.max_read_retries = True, 0
+    reads = bus.reads
+    assert _t0[:6] == tuple(clock.get_time())[:6]
+    # одно чтение и одно чтение для сравнения, расхождений нет
+    assert reads + 2 == bus.reads
+    assert (1, 0, 0) == clock.get_tear_stats()
+    # статистика у каждого экземпляра своя
+    assert (0, 0, 0) == DS3221(I2cAdapter(bus)).get_tear_stats()
@@ -0,0 +1,25 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""TimestampArray: 4 байта на метку времени, формат pack_time32_into"""
+
+from sensor_pack_2.rtcpack import TimestampArray, pack_time32_into, time32_size
+
+
+def test_as_bytes_matches_pack_time32():
+    stamps = TimestampArray(3)
+    expected = bytearray(time32_size * 2)
+    for index, value in enumerate((769_573_920, 0xFFFFFFFF)):
+        stamps.append(value)
+        pack_time32_into(value, expected, time32_size * index)
+    assert expected == bytes(stamps.as_bytes())
+
+
+def test_load_roundtrip():
+    buf = bytearray(1 + time32_size * 4)
+    for index in range(4):
+        pack_time32_into(1000 + index, buf, 1 + time32_size * index)
+    stamps = TimestampArray(3)
+    assert 3 == stamps.load(buf, offset=1)
+    assert [1000, 1001, 1002] == [stamps[index] for index in range(len(stamps))]
+    assert 2 == stamps.load(buf, offset=1, count=2)
+    assert 1001 == stamps[-1]
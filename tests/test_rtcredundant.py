@@ -0,0 +1,68 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""RedundantClock на имитаторе шины: DS3231 (0x68) и PCF8563 (0x51)"""
+
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.irtc import rtc_time, rtc_time_to_seconds, seconds_to_rtc_time
+from sensor_pack_2.rtcredundant import RedundantClock
+from ds3231mod import DS3221
+from PCF8563mod import PCF8563
+
+_t0 = rtc_time_to_seconds(rtc_time(2024, 5, 17, 12, 30, 15, 4, 138))
+
+
+def _make(bus, ds_power_loss: bool = False, ds_offset: int = 0) -> RedundantClock:
+    adapter = I2cAdapter(bus)
+    pcf = PCF8563(adapter)
+    pcf.set_time(seconds_to_rtc_time(_t0))
+    DS3221(adapter).set_time(seconds_to_rtc_time(_t0 + ds_offset))
+    if ds_power_loss:
+        # значение регистра управления после включения питания, время сброшено
+        bus.chip(0x68)[0x0E] = 0x1C
+    return RedundantClock(DS3221(adapter), pcf, check_period_ms=0)
+
+
+def test_clocks_agree(bus):
+    clock = _make(bus)
+    assert clock.check()
+    assert 0 == clock.active
+    assert _t0 == rtc_time_to_seconds(clock.get_time())
+
+
+def test_power_loss_resync_is_stable(bus):
+    clock = _make(bus, ds_power_loss=True, ds_offset=-1000)
+    assert not clock.check()
+    assert 1 == clock.active
+    assert 1 == clock.service()
+    assert 0 == clock.active
+    # после синхронизации событие остановки DS3231 сброшено, переключений больше нет
+    for _ in range(3):
+        assert clock.check()
+        assert 0 == clock.service()
+        assert 0 == clock.active
+    assert 1 == clock.mismatches
+    assert _t0 == rtc_time_to_seconds(clock.get_clock(0).get_time())
+
+
+def test_secondary_resynced_on_mismatch(bus):
+    clock = _make(bus)
+    clock.get_clock(1).set_time(seconds_to_rtc_time(_t0 + 100))
+    assert not clock.check()
+    assert 0 == clock.active
+    assert 1 == clock.service()
+    assert clock.check()
+    assert _t0 == rtc_time_to_seconds(clock.get_clock(1).get_time())
+
+
+def test_failover_on_bus_error(bus):
+    clock = _make(bus)
+    bus.failed.add(0x68)
+    assert _t0 == rtc_time_to_seconds(clock.get_time())
+    assert 1 == clock.active
+    assert 1 == clock.failovers
+    assert clock.is_failed(0)
+    # микросхема снова отвечает: service синхронизирует ее и делает активной
+    bus.failed.clear()
+    assert 1 == clock.service()
+    assert 0 == clock.active
+    assert not clock.is_failed(0)
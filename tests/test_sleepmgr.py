@@ -0,0 +1,63 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""SleepManager: сохранение состояния драйвера и планировщика в памяти RTC MCU, пробуждение по тревоге"""
+
+import machine
+import pytest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.irtc import rtc_time, rtc_time_to_seconds, seconds_to_rtc_time
+from sensor_pack_2.alarmsched import AlarmScheduler
+from sensor_pack_2.sleepmgr import SleepManager, WAKE_COLD, WAKE_ALARM
+from ds3231mod import DS3221
+
+_t0 = rtc_time_to_seconds(rtc_time(2024, 5, 17, 12, 30, 15, 4, 138))
+
+
+def _boot(adapter):
+    mgr = SleepManager()
+    clock = DS3221(adapter, state=mgr.driver_state)
+    scheduler = AlarmScheduler(clock)
+    scheduler.add(7, at=_t0 + 120, period=600)
+    mgr.attach(clock, scheduler)
+    return mgr, clock, scheduler
+
+
+def test_cold_boot_then_alarm_wake(bus):
+    machine.RTC().memory(b"")
+    adapter = I2cAdapter(bus)
+    DS3221(adapter).set_time(seconds_to_rtc_time(_t0))
+    mgr, clock, _ = _boot(adapter)
+    assert not mgr.resumed
+    assert WAKE_COLD == mgr.get_wake_reason()
+    with pytest.raises(SystemExit):
+        mgr.sleep()
+    assert 0x05 == 0x07 & bus.chip(0x68)[0x0E]  # INTCN = A1IE = 1
+    # тревога 1 сработала, MCU проснулся
+    bus.chip(0x68)[0x0F] |= 0x01
+    reads, writes = bus.reads, bus.writes
+    mgr, clock, scheduler = _boot(adapter)
+    assert bus.reads == reads and bus.writes == writes    # без обращений к шине
+    assert mgr.resumed
+    assert 7 == mgr.next_event
+    assert _t0 + 120 == mgr.next_wake
+    assert 0x05 == clock.get_state()
+    assert WAKE_ALARM == mgr.get_wake_reason()
+    assert _t0 + 120 == scheduler.program()
+    # флаги тревог: одно чтение; тревога и ее прерывание не программируются заново
+    assert bus.reads == reads + 1 and bus.writes == writes
+    # флаг тревоги планировщика сбрасывает service
+    assert 0x01 == 0x03 & bus.chip(0x68)[0x0F]
+    assert [7] == scheduler.service(now=_t0 + 125)
+    assert 0 == 0x03 & bus.chip(0x68)[0x0F]
+    assert _t0 + 720 == scheduler.next_time()
+
+
+def test_control_shadow_skips_reads(bus):
+    adapter = I2cAdapter(bus)
+    clock = DS3221(adapter, state=0x04)
+    reads, writes = bus.reads, bus.writes
+    clock.control_alarm_interrupt(False, True)
+    assert bus.reads == reads and bus.writes == writes + 1
+    clock.control_alarm_interrupt(False, True)
+    assert bus.reads == reads and bus.writes == writes + 1
+    assert 0x05 == clock.get_state() == bus.chip(0x68)[0x0E]
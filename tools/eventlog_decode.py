@@ -0,0 +1,48 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Декодер журнала событий, записанного методом sensor_pack_2.eventlog.EventLogger.flush.
+Запускается на компьютере (CPython 3), а не на MCU!
+Использование: python eventlog_decode.py <файл журнала> > events.csv"""
+
+import sys
+import struct
+import datetime
+
+_block_header_fmt = "<4sHH"
+_record_fmt = "<IIHi"
+_epoch_2000 = datetime.datetime(2000, 1, 1)
+
+
+def decode(stream):
+    """Генератор кортежей (datetime, идентификатор события, данные) из двоичного потока журнала"""
+    header_size = struct.calcsize(_block_header_fmt)
+    record_size = struct.calcsize(_record_fmt)
+    while True:
+        header = stream.read(header_size)
+        if not header:
+            return
+        if len(header) < header_size:
+            raise ValueError("Неполный заголовок блока журнала!")
+        signature, version, count = struct.unpack(_block_header_fmt, header)
+        if b"RTEL" != signature or 1 != version:
+            raise ValueError(f"Неверный формат журнала: {signature}, версия {version}")
+        data = stream.read(count * record_size)
+        if len(data) < count * record_size:
+            raise ValueError("Неполный блок журнала!")
+        for sec, usec, event_id, payload in struct.iter_unpack(_record_fmt, data):
+            yield _epoch_2000 + datetime.timedelta(seconds=sec, microseconds=usec), event_id, payload
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(__doc__)
+        return 1
+    with open(argv[1], "rb") as f:
+        print("time,event_id,payload")
+        for moment, event_id, payload in decode(f):
+            print(f"{moment.isoformat()},{event_id},{payload}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
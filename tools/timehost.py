@@ -0,0 +1,29 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Источник эталонного времени для sensor_pack_2.timesync.HostSerialSource. Запускается на компьютере
+(CPython 3, пакет pyserial), а не на MCU! Синхронизируйте часы компьютера по NTP.
+Использование: python timehost.py <последовательный порт, например /dev/ttyACM0 или COM3> [скорость]"""
+
+import sys
+import time
+
+# 2000-01-01 00:00:00 UTC в секундах Unix
+_epoch_2000 = 946_684_800
+
+
+def main(argv):
+    if len(argv) not in (2, 3):
+        print(__doc__)
+        return 1
+    import serial
+    with serial.Serial(argv[1], int(argv[2]) if len(argv) == 3 else 115200) as port:
+        while True:
+            if port.readline().strip() != b"T":
+                continue
+            now_ns = time.time_ns()
+            sec, usec = divmod(now_ns // 1000, 1_000_000)
+            port.write(f"{sec - _epoch_2000} {usec}\n".encode())
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,68 @@
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Создает таблицу переходов часового пояса для sensor_pack_2.rtctz.TimeZone из базы tzdata.
+Запускается на компьютере (CPython 3.9+), а не на MCU!
+Использование: python tzblob.py <часовой пояс, например Europe/Berlin> <выходной файл> [последний год]"""
+
+import sys
+import struct
+import datetime
+from zoneinfo import ZoneInfo
+
+_header_fmt = "<4sHi"
+_transition_fmt = "<Ii"
+# 2000-01-01 00:00:00 UTC в секундах Unix
+_epoch_2000 = 946_684_800
+
+
+def _offset(tz: ZoneInfo, unix_seconds: int) -> int:
+    return int(datetime.datetime.fromtimestamp(unix_seconds, tz).utcoffset().total_seconds())
+
+
+def get_transitions(zone: str, last_year: int = 2099) -> tuple[int, list]:
+    """Возвращает кортеж (смещение UTC на 2000-01-01, список (секунды UTC с 2000 года, новое смещение UTC))"""
+    tz = ZoneInfo(zone)
+    stop = int(datetime.datetime(last_year + 1, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+    initial = prev = _offset(tz, _epoch_2000)
+    transitions = []
+    t = _epoch_2000
+    while t < stop:
+        t_next = t + 86400
+        off = _offset(tz, t_next)
+        if off != prev:
+            # двоичный поиск момента перехода с точностью до секунды
+            lo, hi = t, t_next
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if _offset(tz, mid) == prev:
+                    lo = mid
+                else:
+                    hi = mid
+            transitions.append((hi - _epoch_2000, off))
+            prev = off
+        t = t_next
+    return initial, transitions
+
+
+def make_blob(zone: str, last_year: int = 2099) -> bytes:
+    initial, transitions = get_transitions(zone, last_year)
+    out = bytearray(struct.pack(_header_fmt, b"TZT1", len(transitions), initial))
+    for item in transitions:
+        out += struct.pack(_transition_fmt, *item)
+    return bytes(out)
+
+
+def main(argv):
+    if len(argv) not in (3, 4):
+        print(__doc__)
+        return 1
+    blob = make_blob(argv[1], int(argv[3]) if len(argv) == 4 else 2099)
+    with open(argv[2], "wb") as f:
+        f.write(blob)
+    print(f"{argv[1]}: {(len(blob) - struct.calcsize(_header_fmt)) // struct.calcsize(_transition_fmt)} переходов, "
+          f"{len(blob)} байт")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))